@@ -1,18 +1,39 @@
+import logging
+from typing import Dict, List, Optional
+import pandas as pd
 from fastapi import FastAPI,Request
 import uvicorn
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, JSONResponse
+from pydantic import BaseModel
 
 from src.forest.constant.application import APP_HOST, APP_PORT
+from src.forest.constant.training_pipeline import SCHEMA_FILE_PATH, TARGET_COLUMN
+from src.forest.utils.main_utils import read_yaml_file
 from src.forest.pipeline.train_pipeline import TrainPipeline
 from src.forest.pipeline.prediction_pipeline import PredictionPipeline
+from src.forest.pipeline.model_registry import model_registry
+from src.forest.pipeline.micro_batcher import micro_batcher
+from src.forest.pipeline.job_manager import job_manager
+from src.forest.pipeline.prediction_cache import prediction_cache
+from src.forest.pipeline.model_watcher import model_watcher
+from src.forest.entity.parallel_scorer import close_scorers
+from src.forest.metrics import CONTENT_TYPE, metrics_registry
 
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 TEMPLATES = Jinja2Templates(directory='templates')
 
+_schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+FEATURE_COLUMNS = [name for column in _schema_config["columns"] for name in column if name != TARGET_COLUMN]
+
+
+class PredictRowsRequest(BaseModel):
+    records: List[Dict[str, float]]
+
 origins = ["*"]
 
 app.add_middleware(
@@ -23,38 +44,128 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def load_model_registry():
+    try:
+        model_registry.load()
+    except Exception as e:
+        logger.error(f"Model registry could not be loaded at startup: {e}")
+    await micro_batcher.start()
+    model_watcher.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    model_watcher.stop()
+    await micro_batcher.stop()
+    job_manager.shutdown()
+    close_scorers()
+
 @app.get("/", status_code=200)
 @app.post("/")
 async def index(request: Request):
     return TEMPLATES.TemplateResponse(name='index.html', context={"request": request})
 
+
+def _run_training_job(job):
+    train_pipeline = TrainPipeline()
+
+    train_pipeline.run_pipeline(on_stage=job.set_stage)
+
+    job.set_stage("load_model_registry")
+    model_registry.load()
+
+    artifacts = model_registry.artifacts()
+    return {
+        "model_path": artifacts.model_path,
+        "scaler_path": artifacts.scaler_path,
+        "model_version": model_registry.active_version,
+    }
+
+
+def _run_prediction_job(job, chunk_size=None):
+    active_model = model_registry.get()
+    if active_model is None:
+        prediction_pipeline = PredictionPipeline()
+    else:
+        prediction_pipeline = PredictionPipeline(model=active_model, cache=prediction_cache)
+
+    result = {"model_version": None if active_model is None else active_model.version}
+    if chunk_size is None:
+        prediction_pipeline.initiate_prediction(on_stage=job.set_stage)
+    else:
+        result.update(prediction_pipeline.initiate_streaming_prediction(chunk_size=chunk_size,
+                                                                        on_stage=job.set_stage) or {})
+
+    result["predictions_path"] = prediction_pipeline.output_file_path
+    return result
+
+
 @app.get("/train")
 async def trainRouteClient():
     try:
-        train_pipeline = TrainPipeline()
-
-        train_pipeline.run_pipeline()
+        job = job_manager.submit("train", _run_training_job, coalesce_key="train")
 
-        return Response("<h1>Training successful !!<h1>")
+        return job.to_dict()
 
     except Exception as e:
         return Response(f"Error Occurred! {e}")
 
 
 @app.get("/predict")
-async def predictRouteClient():
+async def predictRouteClient(chunk_size: Optional[int] = None):
     try:
-        prediction_pipeline = PredictionPipeline()
+        job = job_manager.submit("predict", lambda job: _run_prediction_job(job, chunk_size=chunk_size))
 
-        prediction_pipeline.initiate_prediction()
-
-        return Response(
-            "<h1>Prediction successful and predictions are stored in s3 bucket !!<h1>"
-        )
+        return job.to_dict()
 
     except Exception as e:
         return Response(f"Error Occurred! {e}")
 
 
+@app.get("/jobs/{job_id}")
+async def jobStatusRouteClient(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job {job_id} not found"})
+    return job.to_dict()
+
+
+@app.post("/predict/rows")
+async def predictRowsRouteClient(request: PredictRowsRequest):
+    if not request.records:
+        return JSONResponse(status_code=400, content={"error": "No records provided"})
+
+    missing_columns = sorted({column for record in request.records for column in FEATURE_COLUMNS if column not in record})
+    if missing_columns:
+        return JSONResponse(status_code=422, content={"error": f"Missing feature columns: {missing_columns}"})
+
+    try:
+        frame = pd.DataFrame.from_records(request.records, columns=FEATURE_COLUMNS)
+        result = await micro_batcher.submit(frame)
+        return {
+            "predictions": result.predictions,
+            "model_version": result.model_version,
+            "queue_time_ms": round(result.queue_time_ms, 3),
+            "batch_rows": result.batch_rows,
+        }
+
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"error": f"Error Occurred! {e}"})
+
+
+@app.get("/model")
+async def modelInfoRouteClient():
+    return {
+        "active_version": model_registry.active_version,
+        "versions": model_registry.versions(),
+        "prediction_cache": prediction_cache.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metricsRouteClient():
+    return Response(content=metrics_registry.render(), media_type=CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host=APP_HOST, port=APP_PORT)
@@ -0,0 +1,119 @@
+"""
+Script to benchmark sharded batch scoring throughput against the number of worker processes.
+It loads the saved model and scaler once, builds a batch of the requested size by
+repeating the prediction data, and times ParallelBatchScorer for each worker count.
+
+Usage:
+    python scripts/benchmark_parallel_scoring.py --data_path data/prediction_data.csv
+    python scripts/benchmark_parallel_scoring.py --data_path data/prediction_data.csv --rows 2000000 --workers 1 2 4 8 16 32
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import project modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.forest.constant.application import SCALER_FILE_PATH
+from src.forest.entity.parallel_scorer import ParallelBatchScorer
+from src.forest.pipeline.model_registry import ModelRegistry
+
+
+def build_batch(data_path: str, rows: int) -> pd.DataFrame:
+    """
+    Repeat the rows of the prediction file until the batch holds `rows` rows
+    :param data_path: Path to CSV with feature columns
+    :param rows: Number of rows in the benchmark batch
+    :return: DataFrame with `rows` rows
+    """
+    df = pd.read_csv(data_path)
+    repeats = int(np.ceil(rows / len(df)))
+    return pd.concat([df] * repeats, ignore_index=True).iloc[:rows]
+
+
+def run_benchmark(data_path: str, rows: int, workers: list, model_path: str = None,
+                  scaler_path: str = SCALER_FILE_PATH) -> list:
+    """
+    Time ParallelBatchScorer for each worker count
+    :param model_path: Pickled model to score with, the published model version when omitted
+    :return: List of (n_workers, seconds, rows_per_second, speedup) tuples
+    """
+    if model_path is None:
+        registry = ModelRegistry()
+    else:
+        registry = ModelRegistry(model_path=model_path, scaler_path=scaler_path, current_path=None)
+    loaded_model = registry.load_from_disk()
+    if loaded_model is None:
+        raise FileNotFoundError(f"No trained model found at {registry.artifacts().model_path}")
+
+    batch = build_batch(data_path, rows)
+    results = []
+    baseline = None
+    for n_workers in workers:
+        with ParallelBatchScorer(loaded_model, n_workers=n_workers) as scorer:
+            # The pool is long-lived in serving, so its start-up is not timed
+            scorer.predict(batch)
+            start = time.perf_counter()
+            scorer.predict(batch)
+            elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        results.append((n_workers, elapsed, len(batch) / elapsed, baseline / elapsed))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sharded batch scoring throughput vs worker count")
+    parser.add_argument(
+        "--data_path",
+        type=str,
+        required=True,
+        help="Path to CSV file with feature columns"
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=1_000_000,
+        help="Number of rows to score per run (default: 1000000)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="Worker counts to benchmark (space-separated, default: 1 2 4 8)"
+    )
+    parser.add_argument(
+        "--model_path",
+        type=str,
+        default=None,
+        help="Path to a pickled model (default: the published model version)"
+    )
+    parser.add_argument(
+        "--scaler_path",
+        type=str,
+        default=SCALER_FILE_PATH,
+        help=f"Path to the pickled scaler of --model_path (default: {SCALER_FILE_PATH})"
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data_path):
+        print(f"Error: Data file not found at {args.data_path}")
+        sys.exit(1)
+
+    results = run_benchmark(args.data_path, args.rows, args.workers, args.model_path, args.scaler_path)
+
+    print(f"\nScored {args.rows} rows on {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'seconds':>10} {'rows/sec':>12} {'speedup':>8}")
+    for n_workers, elapsed, rows_per_second, speedup in results:
+        print(f"{n_workers:>8} {elapsed:>10.2f} {rows_per_second:>12.0f} {speedup:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
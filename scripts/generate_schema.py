@@ -9,6 +9,7 @@ Usage:
 
 import argparse
 import os
+import re
 import sys
 import pandas as pd
 import numpy as np
@@ -59,6 +60,38 @@ def detect_column_types(df: pd.DataFrame) -> dict:
     }
 
 
+def detect_compact_dtype(series: pd.Series) -> str:
+    """
+    Pick the smallest physical dtype that holds every value of a numeric column
+    :param series: Column to analyze
+    :return: Name of the dtype (uint8, int16, int32, int64 or float32)
+    """
+    if pd.api.types.is_float_dtype(series.dtype):
+        return "float32"
+    min_value, max_value = series.min(), series.max()
+    for dtype in ["uint8", "int16", "int32"]:
+        if np.iinfo(dtype).min <= min_value and max_value <= np.iinfo(dtype).max:
+            return dtype
+    return "int64"
+
+
+def detect_one_hot_blocks(df: pd.DataFrame, columns: list) -> dict:
+    """
+    Group 0/1 columns that share a name prefix followed by a number (e.g. Soil_Type1, Soil_Type2)
+    into one-hot blocks, keeping groups where at most one column is set per row
+    :param df: DataFrame to analyze
+    :param columns: Candidate columns, in order
+    :return: Dictionary of block prefix to its ordered columns
+    """
+    groups = {}
+    for col in columns:
+        match = re.fullmatch(r"(.+?)\d+", str(col))
+        if match and pd.api.types.is_numeric_dtype(df[col].dtype) and df[col].isin([0, 1]).all():
+            groups.setdefault(match.group(1), []).append(col)
+    return {prefix: cols for prefix, cols in groups.items()
+            if len(cols) > 1 and df[cols].sum(axis=1).max() <= 1}
+
+
 def generate_schema(data_path: str, output_path: str, target_column: str = None, drop_columns: list = None):
     """
     Generate schema.yaml file from dataset
@@ -96,6 +129,7 @@ def generate_schema(data_path: str, output_path: str, target_column: str = None,
         # Build columns list with types (matching the existing schema.yaml format)
         # Format: [{column_name: type}, ...]
         columns_list = []
+        dtypes = {}
         for col in df.columns:
             if col in drop_set:
                 continue
@@ -111,13 +145,19 @@ def generate_schema(data_path: str, output_path: str, target_column: str = None,
             
             # Format: {column_name: type} as dictionary
             columns_list.append({col: col_type})
+
+            # Compact physical dtype applied by the loaders, e.g. uint8 for 0/1 flags
+            if col_type in ("int", "float"):
+                dtypes[col] = detect_compact_dtype(df[col])
         
         # Build schema dictionary matching the existing format
         schema = {
             "columns": columns_list,
             "numerical_columns": numerical_columns,
             "categorical_columns": categorical_columns,
-            "drop_columns": drop_columns if drop_columns else []
+            "drop_columns": drop_columns if drop_columns else [],
+            "dtypes": dtypes,
+            "one_hot_blocks": detect_one_hot_blocks(df, numerical_columns)
         }
         
         # Write schema to file
@@ -128,6 +168,7 @@ def generate_schema(data_path: str, output_path: str, target_column: str = None,
         logging.info(f"Numerical columns: {len(numerical_columns)}")
         logging.info(f"Categorical columns: {len(categorical_columns)}")
         logging.info(f"Drop columns: {len(schema['drop_columns'])}")
+        logging.info(f"One-hot blocks: {list(schema['one_hot_blocks'])}")
         
         return schema
         
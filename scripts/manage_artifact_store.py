@@ -0,0 +1,63 @@
+"""
+Script to maintain the content-addressed artifact store under artifact/store.
+"invalidate" drops stored stage outputs so the next run recomputes them; "gc" deletes
+old artifact/<TIMESTAMP> run directories that no stored entry still points into.
+
+Usage:
+    python scripts/manage_artifact_store.py invalidate
+    python scripts/manage_artifact_store.py invalidate --stage data_transformation
+    python scripts/manage_artifact_store.py gc --keep_runs 3 --max_unused_days 30
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import project modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.forest.constant.training_pipeline import ARTIFACT_STORE_KEEP_RUNS, ARTIFACT_STORE_MAX_UNUSED_DAYS
+from src.forest.pipeline.artifact_store import artifact_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the pipeline artifact store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    invalidate_parser = subparsers.add_parser("invalidate", help="Drop stored stage outputs")
+    invalidate_parser.add_argument(
+        "--stage",
+        type=str,
+        default=None,
+        help="Stage to invalidate, e.g. data_ingestion or train_pipeline (default: every stage)"
+    )
+
+    gc_parser = subparsers.add_parser("gc", help="Delete unreferenced old run directories")
+    gc_parser.add_argument(
+        "--keep_runs",
+        type=int,
+        default=ARTIFACT_STORE_KEEP_RUNS,
+        help=f"Most recent run directories always kept (default: {ARTIFACT_STORE_KEEP_RUNS})"
+    )
+    gc_parser.add_argument(
+        "--max_unused_days",
+        type=float,
+        default=ARTIFACT_STORE_MAX_UNUSED_DAYS,
+        help=f"Drop entries not reused for this many days first (default: {ARTIFACT_STORE_MAX_UNUSED_DAYS})"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "invalidate":
+        removed = artifact_store.invalidate(stage=args.stage)
+        print(f"Removed {removed} artifact store entries")
+    else:
+        removed = artifact_store.collect_garbage(keep_runs=args.keep_runs, max_unused_days=args.max_unused_days,
+                                                 active_run_dir=None)
+        print(f"Removed {len(removed)} run directories")
+        for run_dir in removed:
+            print(f"  - {run_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Script to report per-worker memory when several serving processes load the model.
+It starts N worker processes for each serving format ("pickle" and "mmap"), lets every
+worker load the model through ModelRegistry and score a batch, then reports RSS and
+PSS (proportional set size, shared pages split between the processes mapping them)
+while all workers are alive. Reading PSS needs Linux /proc/<pid>/smaps_rollup.
+
+Usage:
+    python scripts/report_worker_memory.py --data_path data/prediction_data.csv
+    python scripts/report_worker_memory.py --data_path data/prediction_data.csv --workers 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import project modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+def read_memory_mb() -> dict:
+    """
+    Read RSS and PSS of the current process from /proc
+    :return: Dictionary with rss_mb and pss_mb (None when unavailable)
+    """
+    memory = {"rss_mb": None, "pss_mb": None}
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            for line in smaps:
+                key, value = line.split(":", 1)
+                if key in ("Rss", "Pss"):
+                    memory[f"{key.lower()}_mb"] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return memory
+
+
+def worker(serving_format: str, data_path: str, ready, release, results) -> None:
+    import pandas as pd
+    from src.forest.pipeline.model_registry import ModelRegistry
+
+    baseline = read_memory_mb()
+    entry = ModelRegistry(serving_format=serving_format).load()
+    entry.predict(pd.read_csv(data_path))
+    ready.wait()
+    memory = read_memory_mb()
+    results.put({"pid": os.getpid(), "baseline_rss_mb": baseline["rss_mb"], **memory})
+    release.wait()
+
+
+def measure(serving_format: str, data_path: str, n_workers: int) -> list:
+    """
+    Start `n_workers` processes serving `serving_format` and collect their memory once all are loaded
+    :return: List of per-worker memory dictionaries
+    """
+    context = multiprocessing.get_context("spawn")
+    ready, release = context.Barrier(n_workers + 1), context.Barrier(n_workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(serving_format, data_path, ready, release, results))
+                 for _ in range(n_workers)]
+    for process in processes:
+        process.start()
+    ready.wait()
+    reports = [results.get() for _ in processes]
+    release.wait()
+    for process in processes:
+        process.join()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-worker memory for pickle vs memory-mapped models")
+    parser.add_argument(
+        "--data_path",
+        type=str,
+        required=True,
+        help="Path to CSV file with feature columns scored by each worker"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of worker processes (default: 4)"
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data_path):
+        print(f"Error: Data file not found at {args.data_path}")
+        sys.exit(1)
+
+    for serving_format in ("pickle", "mmap"):
+        reports = measure(serving_format, args.data_path, args.workers)
+        print(f"\nServing format: {serving_format} ({args.workers} workers)")
+        print(f"{'pid':>8} {'baseline RSS MB':>16} {'RSS MB':>10} {'PSS MB':>10}")
+        for report in reports:
+            print(f"{report['pid']:>8} {report['baseline_rss_mb'] or 0:>16.1f} "
+                  f"{report['rss_mb'] or 0:>10.1f} {report['pss_mb'] or 0:>10.1f}")
+        print(f"{'total':>8} {'':>16} {sum(r['rss_mb'] or 0 for r in reports):>10.1f} "
+              f"{sum(r['pss_mb'] or 0 for r in reports):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
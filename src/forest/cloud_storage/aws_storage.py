@@ -5,6 +5,7 @@ from io import StringIO
 from typing import Union,List
 import os,sys
 from src.forest.logger import logging
+from src.forest.metrics import timed
 from mypy_boto3_s3.service_resource import Bucket
 from src.forest.exception import ForestException
 from botocore.exceptions import ClientError
@@ -143,6 +144,7 @@ class SimpleStorageService:
             logging.error(f"Error in get_file_object: {str(e)}")
             raise ForestException(e, sys) from e
 
+    @timed("s3", "load_model")
     def load_model(self, model_name: str, bucket_name: str, model_dir: str = None) -> object:
         """
         Method Name :   load_model
@@ -196,6 +198,7 @@ class SimpleStorageService:
                 pass
             logging.info("Exited the create_folder method of S3Operations class")
 
+    @timed("s3", "upload")
     def upload_file(self, from_filename: str, to_filename: str,  bucket_name: str,  remove: bool = True):
         """
         Method Name :   upload_file
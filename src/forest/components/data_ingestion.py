@@ -1,104 +1,201 @@
 import sys
 import os
-import shutil
+from typing import Iterator, Optional
 import pandas as pd
 from pandas import DataFrame
 from zipfile import ZipFile
-from sklearn.model_selection import train_test_split
 from src.forest.entity.config_entity import DataIngestionConfig
 from src.forest.entity.artifact_entity import DataIngestionArtifact
+from src.forest.entity.dataset_context import DatasetContext
+from src.forest.entity.hash_splitter import HashSplitter
 from src.forest.exception import ForestException
 from src.forest.logger import logging
-from src.forest.utils.main_utils import read_yaml_file, create_directories
-from src.forest.constant.training_pipeline import SCHEMA_FILE_PATH
+from src.forest.metrics import timed
+from src.forest.utils.main_utils import (create_directories, save_dataframe,
+                                         apply_schema_dtypes, get_dataframe_memory_mb, ChunkedDataFrameWriter,
+                                         iter_dataframe_chunks)
+from src.forest.constant.training_pipeline import SCHEMA_FILE_PATH, TARGET_COLUMN
+from src.forest.pipeline.artifact_store import ArtifactStore
 
 class DataIngestion:
-    def __init__(self,data_ingestion_config:DataIngestionConfig=DataIngestionConfig()):
-        
+    def __init__(self,data_ingestion_config:DataIngestionConfig=DataIngestionConfig(),
+                 artifact_store: Optional[ArtifactStore] = None, context: Optional[DatasetContext] = None):
+        """
+        :param data_ingestion_config: Paths and settings of the ingestion stage
+        :param artifact_store: When given, a run with an unchanged archive, schema and config reuses the stored split
+        :param context: Datasets and schema of this run, handed to later components on the artifact;
+                        a new one is started when not given
+        """
         try:
             self.data_ingestion_config = data_ingestion_config
+            self.artifact_store = artifact_store
+            self.context = context or DatasetContext()
         except Exception as e:
             raise ForestException(e,sys)
     
-    def export_data_into_feature_store(self)->DataFrame:
+    def read_archive_chunks(self) -> Iterator[DataFrame]:
+        """
+        Method Name :   read_archive_chunks
+        Description :   This method reads the CSV member of the zip archive straight from the
+                        compressed stream, without extracting the archive to disk, and yields it
+                        in chunks of `chunk_size` rows (one chunk when chunk_size is 0), cast to
+                        the compact schema dtypes
+
+        Output      :   dataframe chunks read from the archive
+        On Failure  :   Write an exception log and then raise an exception
+        """
         try:
-            logging.info(f"Extracting data from local zip file: {self.data_ingestion_config.zip_file_path}")
+            zip_file_path = self.data_ingestion_config.zip_file_path
+            logging.info(f"Reading data from local zip file: {zip_file_path}")
             
             # Check if zip file exists
-            if not os.path.exists(self.data_ingestion_config.zip_file_path):
-                raise FileNotFoundError(f"Zip file not found at: {self.data_ingestion_config.zip_file_path}")
-            
-            # Extract zip file
-            extract_dir = os.path.join(os.path.dirname(self.data_ingestion_config.zip_file_path), "extracted")
-            os.makedirs(extract_dir, exist_ok=True)
-            
-            with ZipFile(self.data_ingestion_config.zip_file_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
-                logging.info(f"Extracted zip file to: {extract_dir}")
-            
-            # Find CSV file in extracted directory
-            csv_files = [f for f in os.listdir(extract_dir) if f.endswith('.csv')]
-            if not csv_files:
-                raise FileNotFoundError(f"No CSV file found in extracted directory: {extract_dir}")
-            
-            # Read the first CSV file found (assuming train.csv or similar)
-            csv_file_path = os.path.join(extract_dir, csv_files[0])
-            logging.info(f"Reading CSV file: {csv_file_path}")
-            dataframe = pd.read_csv(csv_file_path)
-
-            # Drop accidental index columns like "Unnamed: 0"
-            unnamed_cols = [c for c in dataframe.columns if str(c).startswith("Unnamed")]
-            if unnamed_cols:
-                logging.info(f"Dropping unnamed columns: {unnamed_cols}")
-                dataframe = dataframe.drop(columns=unnamed_cols, errors="ignore")
-            
-            logging.info(f"Shape of dataframe: {dataframe.shape}")
-            feature_store_file_path  = self.data_ingestion_config.feature_store_file_path
-            dir_path = os.path.dirname(feature_store_file_path)
-            os.makedirs(dir_path,exist_ok=True)
-            logging.info(f"Saving extracted data into feature store file path: {feature_store_file_path}")
-            dataframe.to_csv(feature_store_file_path,index=False,header=True)
-            
-            # Clean up extracted directory after saving
-            shutil.rmtree(extract_dir)
-            logging.info(f"Cleaned up extracted directory: {extract_dir}")
+            if not os.path.exists(zip_file_path):
+                raise FileNotFoundError(f"Zip file not found at: {zip_file_path}")
+
+            schema_dtypes = self.context.schema_dtypes
+
+            with ZipFile(zip_file_path, 'r') as zip_ref:
+                # Read the first CSV member found (assuming train.csv or similar)
+                csv_members = [name for name in zip_ref.namelist()
+                               if name.endswith('.csv') and not name.startswith('__MACOSX/')]
+                if not csv_members:
+                    raise FileNotFoundError(f"No CSV file found in zip file: {zip_file_path}")
+                logging.info(f"Streaming CSV member {csv_members[0]} from {zip_file_path}")
+
+                with zip_ref.open(csv_members[0]) as csv_stream:
+                    if self.data_ingestion_config.chunk_size > 0:
+                        chunks = pd.read_csv(csv_stream, chunksize=self.data_ingestion_config.chunk_size)
+                    else:
+                        chunks = [pd.read_csv(csv_stream)]
+
+                    for chunk in chunks:
+                        # Drop accidental index columns like "Unnamed: 0"
+                        unnamed_cols = [c for c in chunk.columns if str(c).startswith("Unnamed")]
+                        if unnamed_cols:
+                            chunk = chunk.drop(columns=unnamed_cols, errors="ignore")
+                        # Downcast each chunk to the compact schema dtypes as soon as it is parsed
+                        yield apply_schema_dtypes(chunk, schema_dtypes)
+
+        except Exception as e:
+            raise ForestException(e,sys)
+
+    def sync_mongodb_feature_store(self) -> int:
+        """
+        Method Name :   sync_mongodb_feature_store
+        Description :   This method appends the documents inserted into the MongoDB collection since
+                        the last run to the persistent local store, fetching only those above the
+                        stored watermark unless a full export is forced
+
+        Output      :   number of new documents
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            # Imported here so zip ingestion does not need the MongoDB driver
+            from src.forest.data_access.forest_data import ForestData
+            return ForestData().sync_to_feature_store(
+                collection_name=self.data_ingestion_config.collection_name,
+                feature_store_file_path=self.data_ingestion_config.mongo_feature_store_file_path,
+                watermark_field=self.data_ingestion_config.watermark_field,
+                force_full=self.data_ingestion_config.force_full_export,
+                chunk_size=self.data_ingestion_config.chunk_size or 10_000)
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def read_source_chunks(self) -> Iterator[DataFrame]:
+        """Chunks of the configured source: the zip archive, or the synced MongoDB store"""
+        if self.data_ingestion_config.source == "mongodb":
+            return iter_dataframe_chunks(self.data_ingestion_config.mongo_feature_store_file_path,
+                                         chunk_size=self.data_ingestion_config.chunk_size,
+                                         dtypes=self.context.schema_dtypes)
+        return self.read_archive_chunks()
+
+    def export_data_into_feature_store(self)->DataFrame:
+        """
+        Method Name :   export_data_into_feature_store
+        Description :   This method reads the whole archive into memory and saves it to the feature store
+
+        Output      :   dataframe read from the archive
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            feature_store_file_path = self.data_ingestion_config.feature_store_file_path
+            schema_dtypes = self.context.schema_dtypes
+
+            frames = list(self.read_source_chunks())
+            dataframe = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            # Chunks with differing categories concatenate to object, cast those columns back
+            dataframe = apply_schema_dtypes(dataframe, schema_dtypes)
+            logging.info(f"Shape of dataframe: {dataframe.shape}, memory: {get_dataframe_memory_mb(dataframe)} MB")
+
+            logging.info(f"Saving data into feature store file path: {feature_store_file_path}")
+            save_dataframe(feature_store_file_path, dataframe)
             
             return dataframe
 
         except Exception as e:
             raise ForestException(e,sys)
 
+    def get_splitter(self) -> HashSplitter:
+        """Row splitter configured from the ingestion config"""
+        return HashSplitter(test_ratio=self.data_ingestion_config.train_test_split_ratio,
+                            key_columns=self.data_ingestion_config.split_key_columns,
+                            stratify_column=TARGET_COLUMN if self.data_ingestion_config.split_stratify else None)
+
     def split_data_as_train_test(self,dataframe: DataFrame) ->None:
         """
         Method Name :   split_data_as_train_test
-        Description :   This method splits the dataframe into train set and test set based on split ratio 
+        Description :   This method splits an in-memory dataframe into train set and test set based on
+                        split ratio, with the same deterministic row hashing as `stream_data_into_splits`
         
-        Output      :   Folder is created in s3 bucket
+        Output      :   train and test files are written
         On Failure  :   Write an exception log and then raise an exception
-        
-        Version     :   1.2
-        Revisions   :   moved setup to cloud
         """
         logging.info("Entered split_data_as_train_test method of Data_Ingestion class")
 
         try:
-            train_set, test_set = train_test_split(dataframe, test_size=self.data_ingestion_config.train_test_split_ratio)
+            test_mask = self.get_splitter().test_mask(dataframe)
             logging.info("Performed train test split on the dataframe")
-            logging.info(
-                "Exited split_data_as_train_test method of Data_Ingestion class"
-            )
-            dir_path = os.path.dirname(self.data_ingestion_config.training_file_path)
-            os.makedirs(dir_path,exist_ok=True)
-            
             logging.info(f"Exporting train and test file path.")
-            train_set.to_csv(self.data_ingestion_config.training_file_path,index=False,header=True)
-            test_set.to_csv(self.data_ingestion_config.testing_file_path,index=False,header=True)
+            save_dataframe(self.data_ingestion_config.training_file_path, dataframe[~test_mask])
+            save_dataframe(self.data_ingestion_config.testing_file_path, dataframe[test_mask])
 
             logging.info(f"Exported train and test file path.")
         except Exception as e:
             raise ForestException(e, sys) from e
 
+    def stream_data_into_splits(self) -> None:
+        """
+        Method Name :   stream_data_into_splits
+        Description :   This method makes one chunked pass over the source: each chunk is appended to
+                        the feature store, assigned row by row to train or test with the hash splitter
+                        (before the schema's drop columns are removed, so an id column can key the
+                        split) and appended to the train and test files. Memory is bounded by the
+                        chunk size rather than the dataset size
+
+        Output      :   feature store, train and test files are written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            drop_columns = self.context.schema.get("drop_columns", [])
+            splitter = self.get_splitter()
+
+            with ChunkedDataFrameWriter(self.data_ingestion_config.feature_store_file_path) as feature_store, \
+                    ChunkedDataFrameWriter(self.data_ingestion_config.training_file_path) as train_file, \
+                    ChunkedDataFrameWriter(self.data_ingestion_config.testing_file_path) as test_file:
+                for chunk in self.read_source_chunks():
+                    feature_store.write(chunk)
+                    test_mask = splitter.test_mask(chunk)
+                    chunk = chunk.drop(columns=drop_columns, errors="ignore")
+                    train_file.write(chunk[~test_mask])
+                    test_file.write(chunk[test_mask])
+
+            logging.info(f"Wrote {feature_store.rows} rows to the feature store, "
+                         f"{train_file.rows} to train and {test_file.rows} to test")
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
 
+    @timed("components", "data_ingestion")
     def initiate_data_ingestion(self) ->DataIngestionArtifact:
         """
         Method Name :   initiate_data_ingestion
@@ -113,25 +210,41 @@ class DataIngestion:
         logging.info("Entered initiate_data_ingestion method of Data_Ingestion class")
 
         try:
-            dataframe = self.export_data_into_feature_store()
-            _schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
-
-            dataframe = dataframe.drop(_schema_config.get("drop_columns", []), axis=1, errors="ignore")
+            self.context.start_stage("data_ingestion")
+            if self.data_ingestion_config.source == "mongodb":
+                self.sync_mongodb_feature_store()
+                source_file_path = self.data_ingestion_config.mongo_feature_store_file_path
+            else:
+                source_file_path = self.data_ingestion_config.zip_file_path
 
-            logging.info("Got the data from zip file and dropped specified columns")
+            if self.artifact_store is not None:
+                cache_key = self.artifact_store.key(
+                    "data_ingestion", files=[source_file_path, SCHEMA_FILE_PATH],
+                    params={"train_test_split_ratio": self.data_ingestion_config.train_test_split_ratio,
+                            "split_key_columns": self.data_ingestion_config.split_key_columns,
+                            "split_stratify": self.data_ingestion_config.split_stratify,
+                            "file_format": os.path.splitext(self.data_ingestion_config.training_file_path)[1]})
+                cached_artifact = self.artifact_store.fetch("data_ingestion", cache_key, DataIngestionArtifact)
+                if cached_artifact is not None:
+                    cached_artifact.context = self.context
+                    return cached_artifact
 
-            self.split_data_as_train_test(dataframe)
+            self.stream_data_into_splits()
 
-            logging.info("Performed train test split on the dataset")
+            logging.info(f"Got the data from the {self.data_ingestion_config.source} source, dropped specified columns and split it")
 
             logging.info(
                 "Exited initiate_data_ingestion method of Data_Ingestion class"
             )
 
             data_ingestion_artifact = DataIngestionArtifact(trained_file_path=self.data_ingestion_config.training_file_path,
-                                                            test_file_path=self.data_ingestion_config.testing_file_path)
+                                                            test_file_path=self.data_ingestion_config.testing_file_path,
+                                                            context=self.context)
+            self.context.record_stage("data_ingestion")
             
             logging.info(f"Data ingestion artifact: {data_ingestion_artifact}")
+            if self.artifact_store is not None:
+                self.artifact_store.put("data_ingestion", cache_key, data_ingestion_artifact)
             return data_ingestion_artifact
         except Exception as e:
             raise ForestException(e, sys) from e
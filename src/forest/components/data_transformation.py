@@ -1,4 +1,6 @@
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
 import numpy as np
 import pandas as pd
 from sklearn.impute import SimpleImputer
@@ -6,7 +8,9 @@ from sklearn.pipeline import Pipeline
 from src.forest.constant import *
 from src.forest.exception import ForestException
 from src.forest.logger import logging
-from src.forest.utils.main_utils import save_object, save_numpy_array_data,read_yaml_file
+from src.forest.metrics import timed
+from src.forest.utils.main_utils import (save_object, save_numpy_array_data, read_dataframe, apply_schema_dtypes,
+                                        iter_dataframe_chunks, ChunkedArrayWriter)
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
@@ -14,20 +18,57 @@ from sklearn.compose import ColumnTransformer
 from src.forest.constant.training_pipeline import TARGET_COLUMN,SCHEMA_FILE_PATH
 from src.forest.entity.config_entity import DataTransformationConfig
 from src.forest.entity.artifact_entity import DataIngestionArtifact, DataTransformationArtifact
+from src.forest.entity.dataset_context import DatasetContext
+from src.forest.entity.one_hot_block_encoder import OneHotBlockEncoder
+from src.forest.entity.streaming_fit import StreamingFit
+from src.forest.pipeline.artifact_store import ArtifactStore
+
+
+def fit_file_shard(file_path: str, columns: List[str], dtypes: dict, feature_dtype: str, k: int, chunk_size: int,
+                   shard: int = 0, n_shards: int = 1) -> StreamingFit:
+    """
+    Gather the imputer and scaler statistics of the given columns of one shard of a file saved by
+    `save_dataframe`, streaming it in chunks cast to the schema dtypes and then `feature_dtype`, as
+    the in-memory fit sees them. A feather file is cut into `n_shards` contiguous row ranges of its
+    memory map; a CSV file can only be read as a whole. Module-level so worker processes can run it
+    :return: Streaming fit of the shard
+    """
+    try:
+        fit = StreamingFit(columns, k=k, seed=shard)
+        if file_path.endswith(".feather"):
+            from pyarrow import feather
+            table = feather.read_table(file_path, columns=columns, memory_map=True)
+            start = table.num_rows * shard // n_shards
+            stop = table.num_rows * (shard + 1) // n_shards
+            chunks = (apply_schema_dtypes(batch.to_pandas(), dtypes)
+                      for batch in table.slice(start, stop - start).to_batches(chunk_size or None))
+        else:
+            chunks = (chunk[columns] for chunk in iter_dataframe_chunks(file_path, chunk_size=chunk_size,
+                                                                         dtypes=dtypes))
+        for chunk in chunks:
+            fit.update(chunk.astype(feature_dtype))
+        return fit
+    except Exception as e:
+        raise ForestException(e, sys) from e
+
 
 class DataTransformation:
     def __init__(self, data_ingestion_artifact: DataIngestionArtifact,
-                 data_transformation_config: DataTransformationConfig):
+                 data_transformation_config: DataTransformationConfig,
+                 artifact_store: Optional[ArtifactStore] = None):
 
         self.data_ingestion_artifact = data_ingestion_artifact
         self.data_transformation_config = data_transformation_config
+        self.artifact_store = artifact_store
+        # Splits already parsed by validation in this run are reused from the context
+        self.context = data_ingestion_artifact.context or DatasetContext()
 
         #self.utils = MainUtils()
 
     @staticmethod
     def read_data(file_path) -> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_dataframe(file_path)
         except Exception as e:
             raise ForestException(e, sys)
     
@@ -49,7 +90,7 @@ class DataTransformation:
         try:
             logging.info("Got numerical, categorical, transformation columns from schema config")
 
-            _schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            _schema_config = self.context.schema
             
             num_features = _schema_config['numerical_columns']
             
@@ -65,11 +106,20 @@ class DataTransformation:
                 ('scaler', StandardScaler())
             ])
             
-            preprocessor = ColumnTransformer(
-                [
-                    ("Numeric_Pipeline",numeric_pipeline,num_features)
-            ]
-            )
+            transformers = [("Numeric_Pipeline", numeric_pipeline, num_features)]
+
+            one_hot_blocks = _schema_config.get("one_hot_blocks") or {}
+            if self.data_transformation_config.encode_one_hot_blocks and one_hot_blocks:
+                # One-hot flags are passed to the trees as one code per block instead of being
+                # imputed and scaled as continuous features
+                block_columns = [column for columns in one_hot_blocks.values() for column in columns]
+                continuous_features = [column for column in num_features if column not in block_columns]
+                transformers = [("Numeric_Pipeline", numeric_pipeline, continuous_features),
+                                ("One_Hot_Block_Encoder", OneHotBlockEncoder(blocks=one_hot_blocks), block_columns)]
+                logging.info(f"Encoding one-hot blocks {list(one_hot_blocks)} as "
+                             f"{len(continuous_features) + len(one_hot_blocks)} features")
+
+            preprocessor = ColumnTransformer(transformers)
 
             logging.info("Created preprocessor object from ColumnTransformer")
 
@@ -83,6 +133,7 @@ class DataTransformation:
             raise ForestException(e, sys) from e
 
 
+    @timed("components", "data_transformation")
     def initiate_data_transformation( self) ->  DataTransformationArtifact:
         """
         Method Name :   initiate_data_transformation
@@ -98,13 +149,69 @@ class DataTransformation:
             "Entered initiate_data_transformation method of Data_Transformation class"
         )
         try:
+            self.context.start_stage("data_transformation")
+            if self.artifact_store is not None:
+                cache_key = self.artifact_store.key(
+                    "data_transformation", files=[self.data_ingestion_artifact.trained_file_path,
+                                                  self.data_ingestion_artifact.test_file_path, SCHEMA_FILE_PATH],
+                    params=self._cache_params())
+                cached_artifact = self.artifact_store.fetch("data_transformation", cache_key,
+                                                            DataTransformationArtifact)
+                if cached_artifact is not None:
+                    return cached_artifact
 
             logging.info("Starting data transformation")
             preprocessor = self.get_data_transformer_object()
             logging.info("Got the preprocessor object")
 
-            train_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.trained_file_path)
-            test_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.test_file_path)
+            config = self.data_transformation_config
+            if config.fit_method == "streaming":
+                self.fit_transform_in_chunks(preprocessor)
+            elif config.fit_method == "in_memory":
+                self.fit_transform_in_memory(preprocessor)
+            else:
+                raise ValueError(f"Unknown fit method {config.fit_method}, expected in_memory or streaming")
+
+            save_object(config.transformed_object_file_path, preprocessor)
+
+            logging.info("Saved the preprocessor object")
+
+            logging.info(
+                "Exited initiate_data_transformation method of Data_Transformation class"
+            )
+
+            data_transformation_artifact = DataTransformationArtifact(
+                transformed_object_file_path=self.data_transformation_config.transformed_object_file_path,
+                transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
+                transformed_test_file_path=self.data_transformation_config.transformed_test_file_path,
+                transformed_train_label_file_path=self.data_transformation_config.transformed_train_label_file_path,
+                transformed_test_label_file_path=self.data_transformation_config.transformed_test_label_file_path
+            )
+            self.context.record_stage("data_transformation")
+            if self.artifact_store is not None:
+                self.artifact_store.put("data_transformation", cache_key, data_transformation_artifact)
+            return data_transformation_artifact
+        
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def _cache_params(self) -> dict:
+        config = self.data_transformation_config
+        params = {"encode_one_hot_blocks": config.encode_one_hot_blocks, "feature_dtype": config.feature_dtype,
+                  "fit_method": config.fit_method}
+        if config.fit_method == "streaming":
+            # The sketched medians depend on the sketch size and on how the rows are cut into shards
+            params.update(sketch_k=config.sketch_k, chunk_size=config.chunk_size, fit_workers=config.fit_workers)
+        return params
+
+    def fit_transform_in_memory(self, preprocessor: ColumnTransformer) -> None:
+        """
+        Fit the preprocessor on the whole train split, then save the transformed features and labels
+        of both splits
+        """
+        try:
+            train_df = self.context.read_dataframe(self.data_ingestion_artifact.trained_file_path)
+            test_df = self.context.read_dataframe(self.data_ingestion_artifact.test_file_path)
 
             input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN], axis=1)
             target_feature_train_df = train_df[TARGET_COLUMN]
@@ -121,41 +228,80 @@ class DataTransformation:
                 "Applying preprocessing object on training dataframe and testing dataframe"
             )
 
-            input_feature_train_arr = preprocessor.fit_transform(input_feature_train_df)
+            # Feeding the features in feature_dtype keeps the imputer's and scaler's intermediate
+            # copies in it as well; the scaler still accumulates its mean and variance in float64
+            config = self.data_transformation_config
+            input_feature_train_arr = preprocessor.fit_transform(input_feature_train_df.astype(config.feature_dtype))
 
             logging.info(
                 "Used the preprocessor object to fit transform the train features"
             )
 
-            input_feature_test_arr = preprocessor.transform(input_feature_test_df)
-
-            logging.info("Used the preprocessor object to transform the test features")
-
-
-            train_arr = np.c_[
-               input_feature_train_arr, np.array(target_feature_train_df)
-            ]
-
-            test_arr = np.c_[
-                input_feature_test_arr, np.array(target_feature_test_df)
-            ]
+            # Features and labels are saved as separate arrays, so no combined copy is built
+            save_numpy_array_data(config.transformed_train_file_path, array=input_feature_train_arr,
+                                  dtype=config.feature_dtype)
+            save_numpy_array_data(config.transformed_train_label_file_path,
+                                  array=np.asarray(target_feature_train_df))
+            del input_feature_train_arr
 
-            save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
-            save_numpy_array_data(self.data_transformation_config.transformed_train_file_path, array=train_arr)
-            save_numpy_array_data(self.data_transformation_config.transformed_test_file_path, array=test_arr)
+            input_feature_test_arr = preprocessor.transform(input_feature_test_df.astype(config.feature_dtype))
 
-            logging.info("Saved the preprocessor object")
+            logging.info("Used the preprocessor object to transform the test features")
 
-            logging.info(
-                "Exited initiate_data_transformation method of Data_Transformation class"
-            )
+            save_numpy_array_data(config.transformed_test_file_path, array=input_feature_test_arr,
+                                  dtype=config.feature_dtype)
+            save_numpy_array_data(config.transformed_test_label_file_path,
+                                  array=np.asarray(target_feature_test_df))
+        except Exception as e:
+            raise ForestException(e, sys) from e
 
-            data_transformation_artifact = DataTransformationArtifact(
-                transformed_object_file_path=self.data_transformation_config.transformed_object_file_path,
-                transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
-                transformed_test_file_path=self.data_transformation_config.transformed_test_file_path
-            )
-            return data_transformation_artifact
-        
+    def fit_transform_in_chunks(self, preprocessor: ColumnTransformer) -> None:
+        """
+        Fit the preprocessor without loading the train split: its structure is fitted on the first
+        chunk, the imputer medians and scaler moments are gathered over all chunks with
+        `StreamingFit` (in `fit_workers` processes over row ranges of a feather split) and written
+        into it, then both splits are transformed and saved chunk by chunk. Memory is bounded by
+        `chunk_size` rows, and the preprocessor matches the in-memory fit up to the sketch's rank
+        error in the medians
+        """
+        try:
+            config = self.data_transformation_config
+            dtypes = self.context.schema_dtypes
+            train_file_path = self.data_ingestion_artifact.trained_file_path
+
+            chunks = iter_dataframe_chunks(train_file_path, chunk_size=config.chunk_size, dtypes=dtypes)
+            sample = next(chunks)
+            chunks.close()
+            preprocessor.fit(sample.drop(columns=[TARGET_COLUMN]).astype(config.feature_dtype))
+            columns = StreamingFit.fitted_columns(preprocessor)
+            del sample
+
+            n_shards = config.fit_workers if train_file_path.endswith(".feather") else 1
+            if n_shards > 1:
+                with ProcessPoolExecutor(max_workers=n_shards) as executor:
+                    futures = [executor.submit(fit_file_shard, train_file_path, columns, dtypes, config.feature_dtype,
+                                               config.sketch_k, config.chunk_size, shard, n_shards)
+                               for shard in range(n_shards)]
+                    shards = [future.result() for future in futures]
+                fit = shards[0]
+                for shard in shards[1:]:
+                    fit.merge(shard)
+            else:
+                fit = fit_file_shard(train_file_path, columns, dtypes, config.feature_dtype, config.sketch_k,
+                                     config.chunk_size)
+            fit.apply(preprocessor)
+            logging.info(f"Fitted the preprocessor on {fit.rows} rows in chunks of {config.chunk_size}")
+
+            for file_path, feature_file_path, label_file_path in [
+                    (train_file_path, config.transformed_train_file_path, config.transformed_train_label_file_path),
+                    (self.data_ingestion_artifact.test_file_path, config.transformed_test_file_path,
+                     config.transformed_test_label_file_path)]:
+                with ChunkedArrayWriter(feature_file_path, dtype=config.feature_dtype) as features, \
+                        ChunkedArrayWriter(label_file_path) as labels:
+                    for chunk in iter_dataframe_chunks(file_path, chunk_size=config.chunk_size, dtypes=dtypes):
+                        features.write(preprocessor.transform(
+                            chunk.drop(columns=[TARGET_COLUMN]).astype(config.feature_dtype)))
+                        labels.write(chunk[TARGET_COLUMN].to_numpy())
+                logging.info(f"Transformed {features.rows} rows of {file_path} in chunks")
         except Exception as e:
-            raise ForestException(e, sys) from e
\ No newline at end of file
+            raise ForestException(e, sys) from e
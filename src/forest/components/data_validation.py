@@ -1,20 +1,100 @@
 import sys
 import os
-import pandas as pd
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import numpy as np
+import pandas as pd
 from pandas import DataFrame
 from src.forest.exception import ForestException
 from src.forest.logger import logging
-from src.forest.utils.main_utils import read_yaml_file, write_yaml_file
+from src.forest.metrics import timed
+from src.forest.utils.main_utils import (read_yaml_file, write_yaml_file, read_dataframe, get_schema_dtypes,
+                                         get_dataframe_memory_mb, iter_dataframe_chunks, read_dataframe_columns)
 from src.forest.constant.training_pipeline import SCHEMA_FILE_PATH
 from src.forest.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
+from src.forest.entity.chunk_validator import ChunkValidator
 from src.forest.entity.config_entity import DataValidationConfig
+from src.forest.entity.dataset_context import DatasetContext
+from src.forest.entity.drift_detector import DriftDetector, save_reference, load_reference
+from src.forest.entity.quantile_sketch import KLLSketch, save_sketches, load_sketches
+from src.forest.entity.statistics_engine import StatisticsEngine
+from src.forest.pipeline.artifact_store import ArtifactStore
+
+
+def sketch_file_shard(file_path: str, columns: List[str], k: int, chunk_size: int, shard: int = 0,
+                      n_shards: int = 1, start_row: int = 0) -> Dict[str, KLLSketch]:
+    """
+    Sketch the given columns of one shard of a file saved by `save_dataframe`, streaming it in
+    chunks. The rows from `start_row` on of a feather file are cut into `n_shards` contiguous row
+    ranges of its memory map; a CSV file can only be read as a whole, its first `start_row` rows
+    parsed and skipped. Module-level so worker processes can run it
+    :return: Dictionary of column name to sketch of the shard
+    """
+    try:
+        sketches = {column: KLLSketch(k=k, seed=shard) for column in columns}
+        if file_path.endswith(".feather"):
+            from pyarrow import feather
+            table = feather.read_table(file_path, columns=columns, memory_map=True)
+            n_rows = max(table.num_rows - start_row, 0)
+            start = start_row + n_rows * shard // n_shards
+            stop = start_row + n_rows * (shard + 1) // n_shards
+            chunks = (batch.to_pandas() for batch in table.slice(start, stop - start).to_batches(chunk_size or None))
+        else:
+            chunks = _skip_rows((chunk[columns] for chunk in iter_dataframe_chunks(file_path, chunk_size=chunk_size)),
+                                start_row)
+        for chunk in chunks:
+            for column in columns:
+                sketches[column].update(chunk[column].to_numpy(dtype=np.float64, na_value=np.nan))
+        return sketches
+    except Exception as e:
+        raise ForestException(e, sys) from e
+
+
+def _skip_rows(chunks, n_rows: int):
+    for chunk in chunks:
+        if n_rows >= len(chunk):
+            n_rows -= len(chunk)
+            continue
+        yield chunk.iloc[n_rows:]
+        n_rows = 0
+
+
+def sample_rows_digest(file_path: str, columns: List[str], n_rows: int, n_samples: int = 64) -> str:
+    """
+    Digest of `n_samples` rows spread evenly over the first `n_rows` rows of a file, the first and
+    last of them included. Reads only those rows of a feather file; a CSV file is parsed but only
+    the sampled rows are kept. Used to check that a file still starts with rows sketched earlier
+    """
+    try:
+        positions = np.unique(np.linspace(0, n_rows - 1, min(n_samples, n_rows)).astype(np.int64))
+        if file_path.endswith(".feather"):
+            from pyarrow import feather
+            table = feather.read_table(file_path, columns=columns, memory_map=True)
+            if table.num_rows < n_rows:
+                return ""
+            rows = table.take(positions).to_pandas()
+        else:
+            wanted = set((positions + 1).tolist())
+            rows = pd.read_csv(file_path, usecols=columns, skiprows=lambda line: line > 0 and line not in wanted,
+                               nrows=len(positions))[columns]
+            if len(rows) < len(positions):
+                return ""
+        values = rows.to_numpy(dtype=np.float64, na_value=np.nan)
+        return hashlib.sha256(np.ascontiguousarray(values).tobytes()).hexdigest()[:16]
+    except Exception as e:
+        raise ForestException(e, sys) from e
+
 
 class DataValidation:
-    def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationConfig):
+    def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationConfig,
+                 artifact_store: Optional[ArtifactStore] = None):
         self.data_ingestion_artifact = data_ingestion_artifact
         self.data_validation_config = data_validation_config
-        self._schema_config =read_yaml_file(file_path=SCHEMA_FILE_PATH)
+        self.artifact_store = artifact_store
+        # Shared with the other components of the run, so the schema and splits are parsed once
+        self.context = data_ingestion_artifact.context or DatasetContext()
+        self._schema_config = self.context.schema
     
     def validate_number_of_columns(self, dataframe: DataFrame) -> bool:
         """
@@ -32,7 +112,9 @@ class DataValidation:
     @staticmethod
     def read_data(file_path) -> DataFrame:
         try:
-            return pd.read_csv(file_path)
+            dataframe = read_dataframe(file_path, dtypes=get_schema_dtypes(read_yaml_file(file_path=SCHEMA_FILE_PATH)))
+            logging.info(f"Read {file_path}, memory: {get_dataframe_memory_mb(dataframe)} MB")
+            return dataframe
         except Exception as e:
             raise ForestException(e, sys)
     
@@ -55,43 +137,253 @@ class DataValidation:
         except Exception as e:
             raise ForestException(e, sys) from e
     
-    def detect_outliers(self, df: DataFrame) -> dict:
+    def compute_statistics(self, df: DataFrame) -> dict:
+        """
+        Compute quartiles, IQR outlier bounds and counts, null counts, min/max and means
+        of all numerical columns in one vectorized pass
+        :param df: DataFrame to describe
+        :return: Dictionary with the statistics of each column
+        """
+        try:
+            numerical_columns = [col for col in self._schema_config["numerical_columns"] if col in df.columns]
+            return StatisticsEngine().compute(df, numerical_columns)
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def build_sketches(self, file_path: str, sketch_file_path: str) -> Dict[str, KLLSketch]:
+        """
+        Build quantile sketches of the numerical columns of a split with bounded memory, and
+        save them to `sketch_file_path`. With `sketch_workers` above 1 a feather split is cut
+        into row ranges sketched in worker processes and merged. Sketches stored for a file
+        with the same content are reused instead of rescanning it, and when the split only grew
+        since the last sketches of a split of the same name (ingestion appends new rows at the
+        end), only the new rows are sketched and merged into them
+        :param file_path: Split to sketch
+        :param sketch_file_path: Where the sketches are saved, next to the drift report
+        :return: Dictionary of column name to sketch
+        """
+        try:
+            config = self.data_validation_config
+            columns = [col for col in self._schema_config["numerical_columns"]
+                       if col in read_dataframe_columns(file_path)]
+
+            sketches, start_row = None, 0
+            if self.artifact_store is not None:
+                params = {"k": config.sketch_k, "columns": columns}
+                cache_key = self.artifact_store.key("quantile_sketch", files=[file_path], params=params)
+                cached = self.artifact_store.fetch("quantile_sketch", cache_key)
+                if cached is not None:
+                    sketches, _ = load_sketches(cached["sketch_file_path"])
+                    if cached["sketch_file_path"] != sketch_file_path:
+                        save_sketches(sketch_file_path, sketches, metadata={"source": file_path})
+                    return sketches
+                # Split files live in a new run directory every run, so earlier sketches are found by split name
+                latest_key = self.artifact_store.key("quantile_sketch_latest",
+                                                     params={**params, "split": os.path.basename(file_path)})
+                sketches, start_row = self._stored_prefix_sketches(latest_key, file_path, columns)
+
+            new_sketches = self._sketch_rows(file_path, columns, start_row)
+            if sketches is None:
+                sketches = new_sketches
+            else:
+                for column in columns:
+                    sketches[column].merge(new_sketches[column])
+            n_rows = self._sketched_rows(sketches, start_row)
+
+            save_sketches(sketch_file_path, sketches, metadata={"source": file_path, "rows": n_rows})
+            logging.info(f"Sketched {len(columns)} columns of rows {start_row} to {n_rows} of {file_path} "
+                         f"into {sketch_file_path}")
+            if self.artifact_store is not None:
+                self.artifact_store.put("quantile_sketch", cache_key, {"sketch_file_path": sketch_file_path})
+                self.artifact_store.put("quantile_sketch_latest", latest_key,
+                                        {"sketch_file_path": sketch_file_path, "rows": n_rows,
+                                         "rows_digest": sample_rows_digest(file_path, columns, n_rows)})
+            return sketches
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def _stored_prefix_sketches(self, latest_key: str, file_path: str,
+                                columns: List[str]) -> Tuple[Optional[Dict[str, KLLSketch]], int]:
+        """
+        Last stored sketches of this split and the number of rows they cover, when `file_path` still
+        starts with those rows (checked on a sample of them); (None, 0) otherwise
+        """
+        latest = self.artifact_store.fetch("quantile_sketch_latest", latest_key)
+        if latest is None or not latest["rows"]:
+            return None, 0
+        if sample_rows_digest(file_path, columns, latest["rows"]) != latest["rows_digest"]:
+            logging.info(f"{file_path} does not start with the {latest['rows']} rows sketched last time")
+            return None, 0
+        sketches, _ = load_sketches(latest["sketch_file_path"])
+        logging.info(f"Reusing sketches of the first {latest['rows']} rows of {file_path}")
+        return sketches, latest["rows"]
+
+    def _sketch_rows(self, file_path: str, columns: List[str], start_row: int) -> Dict[str, KLLSketch]:
+        """Sketch the rows of a split from `start_row` on, in worker processes when configured"""
+        config = self.data_validation_config
+        n_shards = config.sketch_workers if file_path.endswith(".feather") else 1
+        if n_shards <= 1:
+            return sketch_file_shard(file_path, columns, config.sketch_k, config.chunk_size, start_row=start_row)
+        with ProcessPoolExecutor(max_workers=n_shards) as executor:
+            futures = [executor.submit(sketch_file_shard, file_path, columns, config.sketch_k,
+                                       config.chunk_size, shard, n_shards, start_row) for shard in range(n_shards)]
+            shards = [future.result() for future in futures]
+        sketches = shards[0]
+        for shard in shards[1:]:
+            for column in columns:
+                sketches[column].merge(shard[column])
+        return sketches
+
+    @staticmethod
+    def _sketched_rows(sketches: Dict[str, KLLSketch], start_row: int) -> int:
+        """Rows covered by the sketches: every sketched row is counted as a value or as missing"""
+        sketch = next(iter(sketches.values()), None)
+        return start_row if sketch is None else sketch.n + sketch.null_count
+
+    def validate_in_chunks(self, file_path: str, sketch_file_path: str) -> Tuple[dict, Optional[Dict[str, KLLSketch]]]:
+        """
+        Stream a split in blocks of `chunk_size` rows, checking every block with `ChunkValidator`
+        and feeding its numerical columns to quantile sketches, so the split is read once in the
+        memory of one block. The column header is checked before any rows are parsed, and
+        reading stops at the first block with a hard failure
+        :param file_path: Split to validate
+        :param sketch_file_path: Where the sketches are saved when the split passes
+        :return: Validation report of the split, and its sketches when it passed
+        """
+        try:
+            config = self.data_validation_config
+            validator = ChunkValidator(self._schema_config, max_null_rate=config.max_null_rate,
+                                       max_out_of_range_rate=config.max_out_of_range_rate)
+            sketches = None
+            if not validator.check_columns(read_dataframe_columns(file_path)):
+                columns = self._schema_config["numerical_columns"]
+                sketches = {column: KLLSketch(k=config.sketch_k, seed=0) for column in columns}
+                for block in iter_dataframe_chunks(file_path, chunk_size=config.chunk_size):
+                    if validator.check_block(block):
+                        sketches = None
+                        break
+                    for column in columns:
+                        sketches[column].update(block[column].to_numpy(dtype=np.float64, na_value=np.nan))
+
+            report = validator.report()
+            if sketches is not None:
+                save_sketches(sketch_file_path, sketches, metadata={"source": file_path})
+                logging.info(f"Validated {report['rows']} rows of {file_path} in {report['blocks']} blocks")
+            else:
+                logging.info(f"Stopped validating {file_path} after {report['rows']} rows: {report['failures']}")
+            return report, sketches
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def get_drift_detector(self) -> DriftDetector:
+        config = self.data_validation_config
+        return DriftDetector(n_bins=config.drift_n_bins, ks_threshold=config.drift_ks_threshold,
+                             psi_threshold=config.drift_psi_threshold, workers=config.drift_workers)
+
+    def get_reference(self, base_df: Optional[DataFrame] = None,
+                      base_sketches: Optional[Dict[str, KLLSketch]] = None) -> dict:
+        """
+        Reference histograms of the training split, from its dataframe or its sketches, saved
+        next to the drift report. Histograms stored for a training split with the same content
+        are reused, so checking new data does not rescan the training data
+        :return: Result of `DriftDetector.fit`
+        """
+        try:
+            config = self.data_validation_config
+            if self.artifact_store is not None:
+                cache_key = self.artifact_store.key("drift_reference",
+                                                    files=[self.data_ingestion_artifact.trained_file_path],
+                                                    params={"n_bins": config.drift_n_bins,
+                                                            "sketched": base_sketches is not None})
+                cached = self.artifact_store.fetch("drift_reference", cache_key)
+                if cached is not None:
+                    return load_reference(cached["reference_file_path"])
+
+            detector = self.get_drift_detector()
+            if base_sketches is not None:
+                reference = detector.fit_sketches(base_sketches)
+            else:
+                numerical_columns = [col for col in self._schema_config["numerical_columns"] if col in base_df.columns]
+                reference = detector.fit(base_df, numerical_columns)
+            save_reference(config.reference_file_path, reference)
+            if self.artifact_store is not None:
+                self.artifact_store.put("drift_reference", cache_key,
+                                        {"reference_file_path": config.reference_file_path})
+            return reference
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def detect_dataset_drift(self, base_df: DataFrame, current_df: DataFrame, reference: Optional[dict] = None,
+                             current_sketches: Optional[Dict[str, KLLSketch]] = None) -> bool:
+        """
+        Compare the distribution of every numerical column of current_df with base_df using the
+        KS statistic and PSI, and write the per-column results to the drift report
+        :param base_df: Reference (training) data, only read when `reference` is not given
+        :param current_df: New data
+        :param reference: Reference histograms from `get_reference`
+        :param current_sketches: Sketches of the new data, used instead of current_df when it was streamed
+        :return: True if any column drifted
+        """
+        try:
+            detector = self.get_drift_detector()
+            if reference is None:
+                reference = self.get_reference(base_df=base_df)
+            if current_sketches is not None:
+                edges = {column: values["edges"] for column, values in reference.items()}
+                report = detector.compare(reference, detector.sketch_histograms(current_sketches, edges))
+            else:
+                report = detector.detect(reference, current_df)
+
+            drifted_columns = [column for column, result in report.items() if result["drift_status"]]
+            for column in drifted_columns:
+                logging.info(f"Column {column} drifted: KS {report[column]['ks_statistic']:.3f}, "
+                             f"PSI {report[column]['psi']:.3f}")
+            drift_status = len(drifted_columns) > 0
+            write_yaml_file(file_path=self.data_validation_config.drift_report_file_path,
+                            content={"drift_status": drift_status, "drifted_columns": drifted_columns,
+                                     "columns": report})
+            logging.info(f"Drift report saved to: {self.data_validation_config.drift_report_file_path}")
+            return drift_status
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def detect_outliers(self, df: DataFrame, statistics: Optional[dict] = None) -> dict:
         """
         Detect outliers in numerical columns using IQR (Interquartile Range) method
         :param df: DataFrame to check for outliers
+        :param statistics: Result of `compute_statistics` for df, computed when not given
         :return: Dictionary with outlier information for each column
         """
         try:
-            outlier_report = {}
-            numerical_columns = [col for col in self._schema_config["numerical_columns"] if col in df.columns]
-            
-            for column in numerical_columns:
-                Q1 = df[column].quantile(0.25)
-                Q3 = df[column].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                
-                outliers = df[(df[column] < lower_bound) | (df[column] > upper_bound)]
-                outlier_count = len(outliers)
-                outlier_percentage = (outlier_count / len(df)) * 100
-                
-                outlier_report[column] = {
-                    "lower_bound": float(lower_bound),
-                    "upper_bound": float(upper_bound),
-                    "outlier_count": int(outlier_count),
-                    "outlier_percentage": float(outlier_percentage),
-                    "Q1": float(Q1),
-                    "Q3": float(Q3),
-                    "IQR": float(IQR)
-                }
-                
-                logging.info(f"Column {column}: {outlier_count} outliers ({outlier_percentage:.2f}%)")
-            
+            if statistics is None:
+                statistics = self.compute_statistics(df)
+            outlier_report = StatisticsEngine.outlier_report(statistics)
+            for column, report in outlier_report.items():
+                logging.info(f"Column {column}: {report['outlier_count']} outliers "
+                             f"({report['outlier_percentage']:.2f}%)")
             return outlier_report
         except Exception as e:
             raise ForestException(e, sys) from e
 
+    def _validation_artifact(self, validation_status: bool, drift_status: bool,
+                             cache_key: Optional[str]) -> DataValidationArtifact:
+        data_validation_artifact = DataValidationArtifact(
+            validation_status=validation_status,
+            valid_train_file_path=self.data_ingestion_artifact.trained_file_path,
+            valid_test_file_path=self.data_ingestion_artifact.test_file_path,
+            invalid_train_file_path=self.data_validation_config.invalid_train_file_path,
+            invalid_test_file_path=self.data_validation_config.invalid_test_file_path,
+            drift_report_file_path=self.data_validation_config.drift_report_file_path,
+            drift_status=drift_status,
+            context=self.context
+        )
+        logging.info(f"Data validation artifact: {data_validation_artifact}")
+        self.context.record_stage("data_validation")
+        if self.artifact_store is not None:
+            self.artifact_store.put("data_validation", cache_key, data_validation_artifact)
+        return data_validation_artifact
+
+    @timed("components", "data_validation")
     def initiate_data_validation(self) -> bool:
         """
         Method Name :   initiate_data_validation
@@ -105,11 +397,52 @@ class DataValidation:
         """
         logging.info("Entered initiate_data_validation method of Data_Validation class")
         try:
+            self.context.start_stage("data_validation")
+            config = self.data_validation_config
+            cache_key = None
+            if self.artifact_store is not None:
+                cache_key = self.artifact_store.key(
+                    "data_validation", files=[self.data_ingestion_artifact.trained_file_path,
+                                              self.data_ingestion_artifact.test_file_path, SCHEMA_FILE_PATH],
+                    params={"quantile_method": config.quantile_method, "sketch_k": config.sketch_k,
+                            "drift_n_bins": config.drift_n_bins, "drift_ks_threshold": config.drift_ks_threshold,
+                            "drift_psi_threshold": config.drift_psi_threshold,
+                            "validation_mode": config.validation_mode, "max_null_rate": config.max_null_rate,
+                            "max_out_of_range_rate": config.max_out_of_range_rate})
+                cached_artifact = self.artifact_store.fetch("data_validation", cache_key, DataValidationArtifact)
+                if cached_artifact is not None:
+                    cached_artifact.context = self.context
+                    return cached_artifact
 
             validation_error_msg = ""
             logging.info("Starting data validation")
-            train_df, test_df = (DataValidation.read_data(file_path=self.data_ingestion_artifact.trained_file_path),
-                                 DataValidation.read_data(file_path=self.data_ingestion_artifact.test_file_path))
+            train_file_path = self.data_ingestion_artifact.trained_file_path
+            test_file_path = self.data_ingestion_artifact.test_file_path
+            chunked = config.validation_mode == "chunked"
+            use_sketches = config.quantile_method == "sketch" or chunked
+            if chunked:
+                # Each split is streamed once, and the test split is not read when the training split fails
+                validation_report = {}
+                validation_report["train"], train_sketches = self.validate_in_chunks(
+                    train_file_path, config.train_sketch_file_path)
+                if validation_report["train"]["status"]:
+                    validation_report["test"], test_sketches = self.validate_in_chunks(
+                        test_file_path, config.test_sketch_file_path)
+                write_yaml_file(file_path=config.validation_report_file_path, content=validation_report)
+                logging.info(f"Validation report saved to: {config.validation_report_file_path}")
+                failures = [f"{split}: {message}" for split, report in validation_report.items()
+                            for message in report["failures"]]
+                if failures:
+                    logging.info(f"Validation_error: {failures}")
+                    return self._validation_artifact(False, False, cache_key)
+
+            if use_sketches:
+                # Only the column names are read, the splits are streamed through the sketches below
+                train_df, test_df = (DataFrame(columns=read_dataframe_columns(train_file_path)),
+                                     DataFrame(columns=read_dataframe_columns(test_file_path)))
+            else:
+                train_df, test_df = (self.context.read_dataframe(train_file_path),
+                                     self.context.read_dataframe(test_file_path))
 
             status = self.validate_number_of_columns(dataframe=train_df)
             if not status:
@@ -133,50 +466,52 @@ class DataValidation:
             
             validation_status = len(validation_error_msg) == 0
             
+            # Compute column statistics of train and test concurrently; NumPy releases the GIL
+            # while converting, counting and reducing the column blocks
+            logging.info("Computing column statistics of training and testing data")
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                if use_sketches:
+                    if not chunked:
+                        train_sketches, test_sketches = executor.map(
+                            self.build_sketches, [train_file_path, test_file_path],
+                            [config.train_sketch_file_path, config.test_sketch_file_path])
+                    train_statistics, test_statistics = (StatisticsEngine().from_sketches(train_sketches),
+                                                         StatisticsEngine().from_sketches(test_sketches))
+                else:
+                    train_statistics, test_statistics = executor.map(self.compute_statistics, [train_df, test_df])
+
             # Perform outlier detection
-            logging.info("Starting outlier detection on training data")
-            train_outlier_report = self.detect_outliers(train_df)
-            logging.info("Starting outlier detection on testing data")
-            test_outlier_report = self.detect_outliers(test_df)
+            train_outlier_report = self.detect_outliers(train_df, train_statistics)
+            test_outlier_report = self.detect_outliers(test_df, test_statistics)
             
             # Save outlier reports
-            outlier_report_path = os.path.join(
-                os.path.dirname(self.data_validation_config.drift_report_file_path),
-                "outlier_report.yaml"
-            )
+            report_dir = os.path.dirname(self.data_validation_config.drift_report_file_path)
+            outlier_report_path = os.path.join(report_dir, "outlier_report.yaml")
             outlier_report = {
                 "train_outliers": train_outlier_report,
                 "test_outliers": test_outlier_report
             }
             write_yaml_file(file_path=outlier_report_path, content=outlier_report)
             logging.info(f"Outlier report saved to: {outlier_report_path}")
+
+            statistics_report_path = os.path.join(report_dir, "statistics_report.yaml")
+            write_yaml_file(file_path=statistics_report_path,
+                            content={"train_statistics": train_statistics, "test_statistics": test_statistics})
+            logging.info(f"Statistics report saved to: {statistics_report_path}")
             
+            drift_status = False
             if validation_status:
-                # drift_status = self.detect_dataset_drift(train_df, test_df)
-                # if drift_status:
-                #     logging.info(f"Drift detected.")
-                data_validation_artifact = DataValidationArtifact(
-                    validation_status=validation_status,
-                    valid_train_file_path=self.data_ingestion_artifact.trained_file_path,
-                    valid_test_file_path=self.data_ingestion_artifact.test_file_path,
-                    invalid_train_file_path=self.data_validation_config.invalid_train_file_path,
-                    invalid_test_file_path=self.data_validation_config.invalid_test_file_path,
-                    drift_report_file_path=self.data_validation_config.drift_report_file_path
-                )
-                logging.info(f"Data validation artifact: {data_validation_artifact}")
-                return data_validation_artifact
+                if use_sketches:
+                    drift_status = self.detect_dataset_drift(
+                        train_df, test_df, reference=self.get_reference(base_sketches=train_sketches),
+                        current_sketches=test_sketches)
+                else:
+                    drift_status = self.detect_dataset_drift(train_df, test_df)
+                if drift_status:
+                    logging.info("Drift detected.")
             else:
                 logging.info(f"Validation_error: {validation_error_msg}")
-                data_validation_artifact = DataValidationArtifact(
-                    validation_status=validation_status,
-                    valid_train_file_path=self.data_ingestion_artifact.trained_file_path,
-                    valid_test_file_path=self.data_ingestion_artifact.test_file_path,
-                    invalid_train_file_path=self.data_validation_config.invalid_train_file_path,
-                    invalid_test_file_path=self.data_validation_config.invalid_test_file_path,
-                    drift_report_file_path=self.data_validation_config.drift_report_file_path
-                )
-                logging.info(f"Data validation artifact: {data_validation_artifact}")
-                return data_validation_artifact
+            return self._validation_artifact(validation_status, drift_status, cache_key)
 
         except Exception as e:
             raise ForestException(e, sys) from e
@@ -1,12 +1,13 @@
 import  sys
-import pandas as pd
 from src.forest.entity.config_entity import ModelEvaluationConfig
 from src.forest.entity.artifact_entity import ModelTrainerArtifact, DataIngestionArtifact, ModelEvaluationArtifact
+from src.forest.entity.dataset_context import DatasetContext
 from src.forest.utils.main_utils import load_object
 from sklearn.metrics import f1_score
 from src.forest.exception import ForestException
 from src.forest.constant.training_pipeline import TARGET_COLUMN
 from src.forest.logger import logging
+from src.forest.metrics import timed
 from src.forest.entity.s3_estimator import SensorEstimator
 from dataclasses import dataclass
 from typing import Optional
@@ -27,6 +28,8 @@ class ModelEvaluation:
             self.model_eval_config = model_eval_config
             self.data_ingestion_artifact = data_ingestion_artifact
             self.model_trainer_artifact = model_trainer_artifact
+            # The test split parsed earlier in this run is reused from the context
+            self.context = data_ingestion_artifact.context or DatasetContext()
         except Exception as e:
             raise ForestException(e, sys) from e
 
@@ -45,7 +48,7 @@ class ModelEvaluation:
 
     def evaluate_model(self) -> EvaluateModelResponse:
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
+            test_df = self.context.read_dataframe(self.data_ingestion_artifact.test_file_path)
             x, y = test_df.drop(TARGET_COLUMN, axis=1), test_df[TARGET_COLUMN]
             trained_model = load_object(file_path=self.model_trainer_artifact.trained_model_file_path)
             y_hat_trained_model = trained_model.predict(x)
@@ -70,8 +73,10 @@ class ModelEvaluation:
         except Exception as e:
             raise ForestException(e, sys)
 
+    @timed("components", "model_evaluation")
     def initiate_model_evaluation(self) -> ModelEvaluationArtifact:
         try:
+            self.context.start_stage("model_evaluation")
             evaluate_model_response = self.evaluate_model()
             model_evaluation_artifact = ModelEvaluationArtifact(
                 is_model_accepted=evaluate_model_response.is_model_accepted,
@@ -80,6 +85,8 @@ class ModelEvaluation:
                 changed_accuracy=evaluate_model_response.difference)
 
             logging.info(f"Model evaluation artifact: {model_evaluation_artifact}")
+            self.context.record_stage("model_evaluation")
+            logging.info(f"Dataset memory report: {self.context.memory_report()}")
             return model_evaluation_artifact
         except Exception as e:
             raise ForestException(e, sys) from e
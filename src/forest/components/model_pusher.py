@@ -2,6 +2,7 @@ import sys
 from src.forest.cloud_storage.aws_storage import SimpleStorageService
 from src.forest.exception import ForestException
 from src.forest.logger import logging
+from src.forest.metrics import timed
 from src.forest.entity.artifact_entity import ModelPusherArtifact, ModelTrainerArtifact
 from src.forest.entity.config_entity import ModelPusherConfig
 from src.forest.entity.s3_estimator import SensorEstimator
@@ -16,6 +17,7 @@ class ModelPusher:
         self.sensor_estimator = SensorEstimator(bucket_name=model_pusher_config.bucket_name,
                                 model_path=model_pusher_config.s3_model_key_path)
 
+    @timed("components", "model_pusher")
     def initiate_model_pusher(self) -> ModelPusherArtifact:
         logging.info("Entered initiate_model_pusher method of ModelTrainer class")
 
@@ -1,26 +1,47 @@
 import sys
+from typing import Optional
 from src.forest.constant import *
 from src.forest.exception import ForestException
 from src.forest.logger import logging
+from src.forest.metrics import timed
 from src.forest.utils.main_utils import load_numpy_array_data, read_yaml_file, load_object, save_object
 from src.forest.entity.config_entity import ModelTrainerConfig
 from src.forest.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
 from neuro_mf  import ModelFactory
 from src.forest.entity.estimator import SensorModel
+from src.forest.pipeline.artifact_store import ArtifactStore
 
 class ModelTrainer:
     def __init__(self, data_transformation_artifact: DataTransformationArtifact,
-                 model_trainer_config: ModelTrainerConfig):
+                 model_trainer_config: ModelTrainerConfig, artifact_store: Optional[ArtifactStore] = None):
         self.data_transformation_artifact = data_transformation_artifact
         self.model_trainer_config = model_trainer_config
+        self.artifact_store = artifact_store
     
+    @timed("components", "model_trainer")
     def initiate_model_trainer(self, ) -> ModelTrainerArtifact:
         logging.info("Entered initiate_model_trainer method of ModelTrainer class")
 
         try:
-            train_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_file_path)
-            test_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_file_path)
-            x_train, y_train, x_test, y_test = train_arr[:, :-1], train_arr[:, -1], test_arr[:, :-1], test_arr[:, -1]
+            if self.artifact_store is not None:
+                cache_key = self.artifact_store.key(
+                    "model_trainer", files=[self.data_transformation_artifact.transformed_train_file_path,
+                                            self.data_transformation_artifact.transformed_test_file_path,
+                                            self.data_transformation_artifact.transformed_train_label_file_path,
+                                            self.data_transformation_artifact.transformed_test_label_file_path,
+                                            self.data_transformation_artifact.transformed_object_file_path,
+                                            self.model_trainer_config.model_config_file_path],
+                    params={"expected_accuracy": self.model_trainer_config.expected_accuracy})
+                cached_artifact = self.artifact_store.fetch("model_trainer", cache_key, ModelTrainerArtifact)
+                if cached_artifact is not None:
+                    return cached_artifact
+
+            # Memory-mapped read-only: rows are paged in from disk as the models read them
+            artifact = self.data_transformation_artifact
+            x_train = load_numpy_array_data(file_path=artifact.transformed_train_file_path, mmap_mode="r")
+            y_train = load_numpy_array_data(file_path=artifact.transformed_train_label_file_path, mmap_mode="r")
+            x_test = load_numpy_array_data(file_path=artifact.transformed_test_file_path, mmap_mode="r")
+            y_test = load_numpy_array_data(file_path=artifact.transformed_test_label_file_path, mmap_mode="r")
             model_factory = ModelFactory(model_config_path=self.model_trainer_config.model_config_file_path)
             best_model_detail = model_factory.get_best_model(X=x_train,y=y_train,base_accuracy=self.model_trainer_config.expected_accuracy)
             preprocessing_obj = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
@@ -42,6 +63,8 @@ class ModelTrainer:
                 metric_artifact=metric_artifact,
             )
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
+            if self.artifact_store is not None:
+                self.artifact_store.put("model_trainer", cache_key, model_trainer_artifact)
             return model_trainer_artifact
         except Exception as e:
             raise ForestException(e, sys) from e
@@ -1,4 +1,39 @@
 import os
 
 APP_HOST = os.getenv("APP_HOST", "0.0.0.0")
-APP_PORT = int(os.getenv("APP_PORT", 8080))
\ No newline at end of file
+APP_PORT = int(os.getenv("APP_PORT", 8080))
+
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+MODEL_FILE_PATH = os.path.join(MODEL_DIR, "model.pkl")
+SCALER_FILE_PATH = os.path.join(MODEL_DIR, "scaler.pkl")
+# Training publishes every artifact of a version in an immutable versions/<version>/ directory,
+# then names that version in the CURRENT pointer file; MODEL_FILE_PATH etc. are the legacy flat layout
+MODEL_VERSIONS_DIR = os.path.join(MODEL_DIR, "versions")
+CURRENT_MODEL_FILE_PATH = os.path.join(MODEL_DIR, "CURRENT")
+MODEL_REGISTRY_MAX_VERSIONS = int(os.getenv("MODEL_REGISTRY_MAX_VERSIONS", 2))
+
+PREDICT_MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", 256))
+PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", 5))
+
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", 2))
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", 100))
+
+PREDICTION_CHUNK_SIZE = int(os.getenv("PREDICTION_CHUNK_SIZE", 100_000))
+PREDICTION_N_WORKERS = int(os.getenv("PREDICTION_N_WORKERS", 1))
+
+COMPILED_FOREST_FILE_PATH = os.path.join(MODEL_DIR, "model.npz")
+COMPILED_FOREST_MAX_ROWS = int(os.getenv("COMPILED_FOREST_MAX_ROWS", 256))
+# Memory-mappable bundle directory inside each model version directory
+COMPILED_FOREST_BUNDLE_NAME = "model_arrays"
+# Serve the imputer and scaler as precomputed fill/offset/scale vectors instead of the ColumnTransformer
+COMPILED_PREPROCESSOR = os.getenv("COMPILED_PREPROCESSOR", "true").lower() == "true"
+
+# "pickle" unpickles the model.pkl in every process; "mmap" serves from the
+# memory-mapped compiled forest bundle so worker processes share one copy
+MODEL_SERVING_FORMAT = os.getenv("MODEL_SERVING_FORMAT", "pickle")
+
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", 100_000))
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", 0))
+
+MODEL_WATCH_INTERVAL_SECONDS = float(os.getenv("MODEL_WATCH_INTERVAL_SECONDS", 30))
+MODEL_WATCH_S3 = os.getenv("MODEL_WATCH_S3", "false").lower() == "true"
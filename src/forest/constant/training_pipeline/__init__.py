@@ -4,6 +4,9 @@ from src.forest.constant.s3_bucket import TRAINING_BUCKET_NAME
 TARGET_COLUMN = "Cover_Type"
 PIPELINE_NAME: str = "covtype"
 ARTIFACT_DIR: str = "artifact"
+ARTIFACT_STORE_DIR_NAME: str = "store"
+ARTIFACT_STORE_KEEP_RUNS: int = 3  # most recent run directories always kept by garbage collection
+ARTIFACT_STORE_MAX_UNUSED_DAYS: float = 30  # store entries not reused for this long are dropped by garbage collection
 
 # common file name
 
@@ -23,6 +26,14 @@ DATA_INGESTION_FEATURE_STORE_DIR: str = "feature_store"
 DATA_INGESTION_INGESTED_DIR: str = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATION: float = 0.2
 DATA_INGESTION_ZIP_FILE_PATH: str = os.path.join("data", "forest-cover-type.zip")
+DATA_INGESTION_FILE_FORMAT: str = "feather"  # "feather" (columnar, memory-mapped reads) or "csv"
+DATA_INGESTION_CHUNK_SIZE: int = 0  # rows parsed per chunk from the zip stream, 0 reads the member in one pass
+DATA_INGESTION_SPLIT_KEY_COLUMNS: tuple = ("Id",)  # row key hashed to assign train/test, all columns when absent
+DATA_INGESTION_SPLIT_STRATIFY: bool = False  # split each TARGET_COLUMN class in the ratio by its row hashes
+DATA_INGESTION_SOURCE: str = "zip"  # "zip" reads the archive; "mongodb" syncs new documents into a local store first
+DATA_INGESTION_MONGO_FEATURE_STORE_FILE_PATH: str = os.path.join("data", "feature_store", "forest.feather")
+DATA_INGESTION_WATERMARK_FIELD: str = "_id"  # increasing field whose last synced value marks the watermark
+DATA_INGESTION_FORCE_FULL_EXPORT: bool = False  # rebuild the local MongoDB store from the whole collection
 
 
 """
@@ -34,6 +45,21 @@ DATA_VALIDATION_VALID_DIR: str = "validated"
 DATA_VALIDATION_INVALID_DIR: str = "invalid"
 DATA_VALIDATION_DRIFT_REPORT_DIR: str = "drift_report"
 DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = "report.yaml"
+DATA_VALIDATION_QUANTILE_METHOD: str = "exact"  # "exact" loads each split; "sketch" streams it through KLL sketches
+DATA_VALIDATION_SKETCH_K: int = 200  # KLL accuracy parameter, rank error about 1.3% of the rows at 200
+DATA_VALIDATION_CHUNK_SIZE: int = 100_000  # rows per streamed chunk in sketch mode
+DATA_VALIDATION_SKETCH_WORKERS: int = 1  # processes sketching a feather split's record batches, merged afterwards
+DATA_VALIDATION_TRAIN_SKETCH_FILE_NAME: str = "train_sketches.npz"
+DATA_VALIDATION_TEST_SKETCH_FILE_NAME: str = "test_sketches.npz"
+DATA_VALIDATION_REFERENCE_FILE_NAME: str = "reference_histograms.npz"  # training histograms new data is checked against
+DATA_VALIDATION_DRIFT_N_BINS: int = 50  # reference quantile bins per column
+DATA_VALIDATION_DRIFT_KS_THRESHOLD: float = 0.1  # KS statistic above which a column drifts
+DATA_VALIDATION_DRIFT_PSI_THRESHOLD: float = 0.2  # population stability index above which a column drifts
+DATA_VALIDATION_DRIFT_WORKERS: int = 4  # threads binning column blocks concurrently
+DATA_VALIDATION_MODE: str = "full"  # "chunked" streams each split in blocks and stops at the first hard failure
+DATA_VALIDATION_REPORT_FILE_NAME: str = "validation_report.yaml"
+DATA_VALIDATION_MAX_NULL_RATE: float = 0.1  # largest share of missing values per column and block in chunked mode
+DATA_VALIDATION_MAX_OUT_OF_RANGE_RATE: float = 0.0  # largest share of values outside the schema value_ranges
 
 """
 Data Transformation ralated constant start with DATA_TRANSFORMATION VAR NAME
@@ -42,6 +68,14 @@ Data Transformation ralated constant start with DATA_TRANSFORMATION VAR NAME
 DATA_TRANSFORMATION_DIR_NAME: str = "data_transformation"
 DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR: str = "transformed"
 DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR: str = "transformed_object"
+DATA_TRANSFORMATION_ENCODE_ONE_HOT_BLOCKS: bool = False  # collapse the schema's one_hot_blocks into one code column each
+DATA_TRANSFORMATION_TRAIN_LABEL_FILE_NAME: str = "train_labels.npy"
+DATA_TRANSFORMATION_TEST_LABEL_FILE_NAME: str = "test_labels.npy"
+DATA_TRANSFORMATION_FEATURE_DTYPE: str = "float32"  # dtype of the saved feature arrays, memory-mapped by the trainer
+DATA_TRANSFORMATION_FIT_METHOD: str = "in_memory"  # "streaming" fits the imputer and scaler chunk by chunk
+DATA_TRANSFORMATION_CHUNK_SIZE: int = 100_000  # rows per chunk of a streaming fit and transform
+DATA_TRANSFORMATION_SKETCH_K: int = 1000  # KLL accuracy parameter of the streamed medians
+DATA_TRANSFORMATION_FIT_WORKERS: int = 1  # processes fitting row ranges of a feather split, merged afterwards
 
 """
 MODEL TRAINER related constant start with MODEL_TRAINER var name
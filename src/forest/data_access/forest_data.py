@@ -1,10 +1,15 @@
 from src.forest.configuration.mongo_db_connection import MongoDBClient
 from src.forest.constant.database import DATABASE_NAME
+from src.forest.constant.training_pipeline import SCHEMA_FILE_PATH
 from src.forest.exception import ForestException
+from src.forest.logger import logging
+from src.forest.utils.main_utils import read_yaml_file, get_schema_dtypes, apply_schema_dtypes, ChunkedDataFrameWriter
 import pandas as pd
+import os
 import sys
-from typing import Optional
+from typing import Iterator, Optional, Tuple
 import numpy as np
+from bson import json_util
 
 class ForestData:
     """
@@ -18,23 +23,133 @@ class ForestData:
             self.mongo_client = MongoDBClient(database_name=DATABASE_NAME)
         except Exception as e:
             raise ForestException(e,sys)
-        
 
-    def export_collection_as_dataframe(self,collection_name:str,database_name:Optional[str]=None)->pd.DataFrame:
+
+    def _get_collection(self, collection_name: str, database_name: Optional[str] = None):
+        if database_name is None:
+            return self.mongo_client.database[collection_name]
+        return self.mongo_client.client[database_name][collection_name]
+
+    @staticmethod
+    def _to_dataframe(documents: list) -> pd.DataFrame:
+        df = pd.DataFrame(documents)
+        if "_id" in df.columns.to_list():
+            df = df.drop(columns=["_id"], axis=1)
+        df.replace({"na":np.nan},inplace=True)
+        return apply_schema_dtypes(df, get_schema_dtypes(read_yaml_file(file_path=SCHEMA_FILE_PATH)))
+
+    def export_collection_as_dataframe(self,collection_name:str,database_name:Optional[str]=None,
+                                       watermark=None,watermark_field:str="_id")->pd.DataFrame:
         try:
             """
-            export entire collectin as dataframe:
+            export entire collectin as dataframe, or only the documents whose
+            `watermark_field` is greater than `watermark` when one is given:
             return pd.DataFrame of collection
             """
-            if database_name is None:
-                collection = self.mongo_client.database[collection_name]
-            else:
-                collection = self.mongo_client[database_name][collection_name]
-            df = pd.DataFrame(list(collection.find()))
-            if "_id" in df.columns.to_list():
-                df = df.drop(columns=["_id"], axis=1)
-            df.replace({"na":np.nan},inplace=True)
-            return df
+            query = {} if watermark is None else {watermark_field: {"$gt": watermark}}
+            collection = self._get_collection(collection_name, database_name)
+            return self._to_dataframe(list(collection.find(query)))
+        except Exception as e:
+            raise ForestException(e,sys)
+
+    def iter_collection_chunks(self, collection_name: str, database_name: Optional[str] = None, watermark=None,
+                               watermark_field: str = "_id", chunk_size: int = 10_000) -> Iterator[Tuple[pd.DataFrame, object]]:
+        """
+        Stream the documents newer than `watermark` in ascending `watermark_field` order
+        :param chunk_size: Documents per yielded dataframe
+        :return: Iterator of (dataframe, watermark value of the chunk's last document)
+        """
+        try:
+            query = {} if watermark is None else {watermark_field: {"$gt": watermark}}
+            cursor = self._get_collection(collection_name, database_name).find(query) \
+                .sort(watermark_field, 1).batch_size(chunk_size)
+            documents = []
+            for document in cursor:
+                documents.append(document)
+                if len(documents) == chunk_size:
+                    yield self._to_dataframe(documents), documents[-1][watermark_field]
+                    documents = []
+            if documents:
+                yield self._to_dataframe(documents), documents[-1][watermark_field]
         except Exception as e:
             raise ForestException(e,sys)
 
+    def sync_to_feature_store(self, collection_name: str, feature_store_file_path: str,
+                              database_name: Optional[str] = None, watermark_field: str = "_id",
+                              force_full: bool = False, chunk_size: int = 10_000) -> int:
+        """
+        Append the documents inserted since the last sync to the local feature store.
+
+        The largest `watermark_field` value stored so far is kept in a
+        `<feature_store_file_path>.watermark.json` file next to the store, and only
+        documents above it are fetched. Without a watermark or store, when the
+        collection or watermark field changed, or with `force_full`, the store is
+        rebuilt from the whole collection. `_id` ObjectIds only increase per client
+        process, so collections written from several clients should use an insertion
+        timestamp set by the database as the watermark field.
+
+        The watermark file also records the row count and byte size of the store it
+        describes, and is replaced only after the new rows are written, so it marks what
+        has been committed. Rows found past that size were written by a sync that
+        stopped before recording their watermark; they are dropped and fetched again
+        instead of being duplicated. A rebuild removes the watermark file first.
+        :return: Number of documents written to the store
+        """
+        try:
+            watermark_file_path = feature_store_file_path + ".watermark.json"
+            source = {"database": database_name or self.mongo_client.database_name,
+                      "collection": collection_name, "field": watermark_field}
+
+            state = None
+            if not force_full and os.path.exists(watermark_file_path) and os.path.exists(feature_store_file_path):
+                with open(watermark_file_path) as f:
+                    state = json_util.loads(f.read())
+                if state.get("source") != source:
+                    logging.info(f"Feature store was synced from {state.get('source')}, re-exporting {source}")
+                    state = None
+
+            keep_rows = None
+            if state is not None and "size" in state:
+                size = os.path.getsize(feature_store_file_path)
+                if size < state["size"]:
+                    logging.info(f"{feature_store_file_path} is smaller than when its watermark was recorded, "
+                                 f"re-exporting {source}")
+                    state = None
+                elif size > state["size"]:
+                    logging.info(f"Dropping the rows of {feature_store_file_path} past its {state['rows']} "
+                                 f"rows up to watermark {state['watermark']}")
+                    if feature_store_file_path.endswith(".feather"):
+                        keep_rows = state["rows"]
+                    else:
+                        os.truncate(feature_store_file_path, state["size"])
+            if state is None and os.path.exists(watermark_file_path):
+                # A rebuild that stops halfway must not be taken for a synced store
+                os.remove(watermark_file_path)
+
+            watermark = None if state is None else state["watermark"]
+            logging.info(f"Syncing {source} into {feature_store_file_path} after watermark {watermark}")
+            with ChunkedDataFrameWriter(feature_store_file_path, append=state is not None,
+                                        keep_rows=keep_rows) as feature_store:
+                for chunk, watermark in self.iter_collection_chunks(collection_name, database_name, watermark,
+                                                                    watermark_field, chunk_size):
+                    feature_store.write(chunk)
+
+            if state is None and feature_store.rows == 0:
+                os.remove(feature_store_file_path)
+                raise ValueError(f"Collection {source} has no documents to export")
+            if feature_store.rows or keep_rows is not None:
+                rows = feature_store.rows + (0 if state is None else state["rows"])
+                with open(feature_store_file_path, "rb") as f:
+                    os.fsync(f.fileno())
+                tmp_path = watermark_file_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    f.write(json_util.dumps({"source": source, "watermark": watermark, "rows": rows,
+                                             "size": os.path.getsize(feature_store_file_path)}))
+                    f.flush()
+                    os.fsync(f.fileno())
+                # The watermark only moves once the appended rows are on disk
+                os.replace(tmp_path, watermark_file_path)
+            logging.info(f"Appended {feature_store.rows} new documents to {feature_store_file_path}")
+            return feature_store.rows
+        except Exception as e:
+            raise ForestException(e,sys)
@@ -1,10 +1,18 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.forest.entity.dataset_context import DatasetContext
+
+# Fields with this metadata hold in-memory state for the current run and are not saved by the artifact store
+RUN_ONLY = {"persist": False}
 
 
 @dataclass
 class DataIngestionArtifact:
     trained_file_path:str 
     test_file_path:str 
+    context:Optional["DatasetContext"] = field(default=None, repr=False, compare=False, metadata=RUN_ONLY)
 
 @dataclass
 class DataValidationArtifact:
@@ -14,6 +22,8 @@ class DataValidationArtifact:
     invalid_train_file_path:str 
     invalid_test_file_path:str
     drift_report_file_path:str
+    drift_status:bool = False
+    context:Optional["DatasetContext"] = field(default=None, repr=False, compare=False, metadata=RUN_ONLY)
 
 
 
@@ -22,6 +32,8 @@ class DataTransformationArtifact:
     transformed_object_file_path:str 
     transformed_train_file_path:str
     transformed_test_file_path:str
+    transformed_train_label_file_path:str
+    transformed_test_label_file_path:str
 
 
 @dataclass
@@ -0,0 +1,189 @@
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.forest.exception import ForestException
+from src.forest.utils.main_utils import get_schema_dtypes
+
+
+class ChunkValidator:
+    """
+    Checks of a split against the schema, one block of rows at a time, so a file
+    of any size is validated in the memory of one block.
+
+    Every block is checked for the schema's column set and order, values that do
+    not fit the schema dtype (non-numeric, fractional in an integer column, or
+    outside the dtype's range), values outside the schema's `value_ranges` and
+    the null rate of every column. The numeric columns of a block are reduced
+    together per dtype, and integer columns, which cannot hold missing or
+    fractional values, are checked from their min and max alone. A failed check
+    is a hard failure: `check_block` returns its messages and the caller stops
+    reading. Counts, nulls and min/max are accumulated over the blocks for
+    `report`.
+    """
+
+    def __init__(self, schema_config: dict, max_null_rate: float = 0.1, max_out_of_range_rate: float = 0.0):
+        """
+        :param schema_config: Parsed schema file
+        :param max_null_rate: Largest share of missing values a column may have in a block
+        :param max_out_of_range_rate: Largest share of values outside `value_ranges` a column may have in a block
+        """
+        self.columns = [name for column in schema_config["columns"] for name in column]
+        self.dtypes = get_schema_dtypes(schema_config)
+        self.max_null_rate = max_null_rate
+        self.max_out_of_range_rate = max_out_of_range_rate
+        self.numeric_columns = [name for name in self.columns if self.dtypes.get(name) != "category"]
+        self.categorical_columns = [name for name in self.columns if name not in self.numeric_columns]
+        self._numeric_index = [self.columns.index(name) for name in self.numeric_columns]
+
+        # Bounds of every numeric column: those of its integer dtype, and those of its value range
+        infinite = np.full(len(self.numeric_columns), np.inf)
+        self._dtype_low, self._dtype_high = -infinite, infinite.copy()
+        self._range_low, self._range_high = -infinite, infinite.copy()
+        self._integer = np.zeros(len(self.numeric_columns), dtype=bool)
+        value_ranges = schema_config.get("value_ranges") or {}
+        for i, name in enumerate(self.numeric_columns):
+            dtype = np.dtype(self.dtypes[name])
+            if np.issubdtype(dtype, np.integer):
+                self._integer[i] = True
+                self._dtype_low[i], self._dtype_high[i] = np.iinfo(dtype).min, np.iinfo(dtype).max
+            low, high = value_ranges.get(name, (None, None))
+            if low is not None:
+                self._range_low[i] = low
+            if high is not None:
+                self._range_high[i] = high
+        self._categorical_ranges = {name: value_ranges[name] for name in self.categorical_columns
+                                    if name in value_ranges}
+
+        self.rows = 0
+        self.blocks = 0
+        self.null_count = np.zeros(len(self.columns), dtype=np.int64)
+        self.out_of_range_count = np.zeros(len(self.columns), dtype=np.int64)
+        self.min = np.full(len(self.numeric_columns), np.inf)
+        self.max = np.full(len(self.numeric_columns), -np.inf)
+        self.failures: List[str] = []
+
+    def check_columns(self, columns: List[str]) -> List[str]:
+        """
+        :param columns: Column names of the split, in file order
+        :return: Messages of the hard failures, empty when the columns match the schema
+        """
+        failures = []
+        missing = [name for name in self.columns if name not in columns]
+        unexpected = [name for name in columns if name not in self.columns]
+        if missing:
+            failures.append(f"Missing columns: {missing}")
+        if unexpected:
+            failures.append(f"Unexpected columns: {unexpected}")
+        if not failures and list(columns) != self.columns:
+            failures.append(f"Columns are not in schema order: {list(columns)}")
+        self.failures.extend(failures)
+        return failures
+
+    def _fail_columns(self, failures: List[str], message: str, columns: np.ndarray, names: List[str]) -> None:
+        if columns.any():
+            failures.append(f"{message}: {[name for name, failed in zip(names, columns) if failed]}")
+
+    def check_block(self, block: pd.DataFrame) -> List[str]:
+        """
+        Check one block of rows and add it to the accumulated counts
+        :param block: Rows of the split, with the columns read from the file
+        :return: Messages of the hard failures in the block, empty when it passes
+        """
+        try:
+            failures = self.check_columns(list(block.columns))
+            if failures:
+                return failures
+
+            non_numeric = [name for name in self.numeric_columns
+                           if not pd.api.types.is_numeric_dtype(block[name].dtype)]
+            rows = len(block)
+            location = f"Block {self.blocks + 1} (rows {self.rows} to {self.rows + rows})"
+            if non_numeric:
+                failures.append(f"{location}: Non-numeric values in columns: {non_numeric}")
+                self.failures.extend(failures)
+                return failures
+
+            null_count = np.zeros(len(self.columns), dtype=np.int64)
+            out_of_range_count = np.zeros(len(self.columns), dtype=np.int64)
+            minimum = np.full(len(self.numeric_columns), np.inf)
+            maximum = np.full(len(self.numeric_columns), -np.inf)
+            fractional = np.zeros(len(self.numeric_columns), dtype=bool)
+            # Columns of one dtype are reduced together in their own dtype. An integer column has no
+            # missing or fractional values, so only its min and max are needed to check its bounds
+            groups: Dict[str, List[int]] = {}
+            for i, name in enumerate(self.numeric_columns):
+                groups.setdefault(str(block[name].dtype), []).append(i)
+            for positions in groups.values():
+                names = [self.numeric_columns[i] for i in positions]
+                values = block[names].to_numpy()
+                if values.dtype.kind not in "iubf":
+                    values = block[names].to_numpy(dtype=np.float64, na_value=np.nan)
+                if not rows:
+                    continue
+                if values.dtype.kind == "f":
+                    null_count[[self._numeric_index[i] for i in positions]] = np.isnan(values).sum(axis=0)
+                    # NaN compares false, so missing values are neither fractional nor out of range
+                    fractional[positions] = (np.mod(values, 1) > 0).any(axis=0)
+                    minimum[positions] = np.fmin.reduce(values, axis=0, initial=np.inf)
+                    maximum[positions] = np.fmax.reduce(values, axis=0, initial=-np.inf)
+                else:
+                    minimum[positions] = values.min(axis=0)
+                    maximum[positions] = values.max(axis=0)
+            fractional &= self._integer
+            outside_dtype = (minimum < self._dtype_low) | (maximum > self._dtype_high)
+            # Values outside the range are only counted in the columns whose extremes are outside it
+            for i in np.flatnonzero((minimum < self._range_low) | (maximum > self._range_high)):
+                values = block[self.numeric_columns[i]].to_numpy(dtype=np.float64, na_value=np.nan)
+                out_of_range_count[self._numeric_index[i]] = ((values < self._range_low[i]) |
+                                                              (values > self._range_high[i])).sum()
+            for name in self.categorical_columns:
+                index = self.columns.index(name)
+                null_count[index] = block[name].isna().sum()
+                if name in self._categorical_ranges:
+                    low, high = self._categorical_ranges[name]
+                    codes = pd.to_numeric(block[name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+                    out_of_range_count[index] = ((codes < (-np.inf if low is None else low)) |
+                                                 (codes > (np.inf if high is None else high))).sum()
+
+            self._fail_columns(failures, "Fractional values in integer columns", fractional, self.numeric_columns)
+            self._fail_columns(failures, "Values outside the schema dtype in columns", outside_dtype,
+                               self.numeric_columns)
+            if rows:
+                self._fail_columns(failures, f"Null rate above {self.max_null_rate} in columns",
+                                   null_count / rows > self.max_null_rate, self.columns)
+                self._fail_columns(failures, f"Share of values outside the schema range above "
+                                             f"{self.max_out_of_range_rate} in columns",
+                                   out_of_range_count / rows > self.max_out_of_range_rate, self.columns)
+
+            self.rows += rows
+            self.blocks += 1
+            self.null_count += null_count
+            self.out_of_range_count += out_of_range_count
+            self.min = np.minimum(self.min, minimum)
+            self.max = np.maximum(self.max, maximum)
+            if failures:
+                failures = [f"{location}: {message}" for message in failures]
+                self.failures.extend(failures)
+            return failures
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def report(self) -> Dict[str, object]:
+        """Rows and blocks checked, the hard failures, and the null and range counts of every column"""
+        extremes = {name: (self.min[i], self.max[i]) for i, name in enumerate(self.numeric_columns)}
+
+        def number(value: float) -> Optional[float]:
+            return float(value) if np.isfinite(value) else None
+
+        columns = {}
+        for i, name in enumerate(self.columns):
+            columns[name] = {"null_count": int(self.null_count[i]),
+                             "null_rate": float(self.null_count[i] / self.rows) if self.rows else 0.0,
+                             "out_of_range_count": int(self.out_of_range_count[i])}
+            if name in extremes:
+                columns[name].update(min=number(extremes[name][0]), max=number(extremes[name][1]))
+        return {"status": not self.failures, "rows": self.rows, "blocks": self.blocks,
+                "failures": list(self.failures), "columns": columns}
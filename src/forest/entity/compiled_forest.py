@@ -0,0 +1,268 @@
+import os
+import shutil
+import sys
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from src.forest.exception import ForestException
+from src.forest.logger import logging
+
+_TREE_LEAF = -1
+
+
+class CompiledForest:
+    """
+    Array-based inference engine for a fitted RandomForestClassifier.
+
+    Every tree is flattened into rows of padded (n_trees, max_nodes) arrays
+    holding split feature, threshold and child indices, plus the per-leaf class
+    distribution. Prediction walks all trees for a block of rows at once with
+    NumPy fancy indexing instead of calling each estimator in turn, advancing
+    only the (tree, row) pairs that have not reached a leaf yet, and
+    accumulates the leaf distributions in the same order and precision as
+    sklearn so predict/predict_proba match exactly.
+
+    Arrays are read from the `.npz` file on first use, so constructing the
+    engine with `load` is cheap. A bundle directory written by `save_bundle`
+    holds the traversal-ready arrays as plain `.npy` files that are
+    memory-mapped read-only, so every process serving the same bundle shares
+    one physical copy through the page cache. A bundle is never rewritten:
+    truncating a mapped file kills its readers with SIGBUS, so each model
+    version is exported to a directory of its own.
+    """
+
+    _ARRAY_NAMES = ("feature", "threshold", "missing_go_to_left", "children_left", "children_right",
+                    "leaf_values", "classes")
+    _BUNDLE_ARRAY_NAMES = ("leaf_values", "classes")
+    _BUNDLE_FLAT_ARRAY_NAMES = ("roots", "feature", "threshold", "missing_go_to_left", "children", "is_leaf")
+
+    def __init__(self, arrays: Optional[dict] = None, file_path: Optional[str] = None, block_rows: int = 8192,
+                 compact_every: int = 4):
+        """
+        :param arrays: Flattened forest arrays, as produced by `from_sklearn`
+        :param file_path: `.npz` file to read the arrays from lazily when `arrays` is not given
+        :param block_rows: Number of rows traversed together, bounds the n_trees * block_rows work arrays
+        :param compact_every: Traversal steps between dropping (tree, row) pairs that reached a leaf
+        """
+        self._arrays = arrays
+        self._flat_arrays = None
+        self.file_path = file_path
+        self.block_rows = block_rows
+        self.compact_every = compact_every
+
+    @classmethod
+    def from_sklearn(cls, forest) -> "CompiledForest":
+        """Flatten a fitted single-output RandomForestClassifier"""
+        try:
+            if getattr(forest, "n_outputs_", 1) != 1:
+                raise ValueError("CompiledForest only supports single-output forests")
+
+            trees = [estimator.tree_ for estimator in forest.estimators_]
+            n_trees, n_classes = len(trees), len(forest.classes_)
+            max_nodes = max(tree.node_count for tree in trees)
+
+            feature = np.zeros((n_trees, max_nodes), dtype=np.int32)
+            threshold = np.zeros((n_trees, max_nodes), dtype=np.float64)
+            missing_go_to_left = np.zeros((n_trees, max_nodes), dtype=bool)
+            children_left = np.zeros((n_trees, max_nodes), dtype=np.int32)
+            children_right = np.zeros((n_trees, max_nodes), dtype=np.int32)
+            leaf_values = np.zeros((n_trees, max_nodes, n_classes), dtype=np.float64)
+
+            for t, tree in enumerate(trees):
+                n = tree.node_count
+                nodes = np.arange(n, dtype=np.int32)
+                is_leaf = tree.children_left == _TREE_LEAF
+                # Leaves point to themselves so extra traversal steps keep rows in place
+                feature[t, :n] = np.where(is_leaf, 0, tree.feature)
+                threshold[t, :n] = np.where(is_leaf, 0.0, tree.threshold)
+                # Trees fitted without missing values send NaN right, like `NaN <= threshold` being False
+                if hasattr(tree, "missing_go_to_left"):
+                    missing_go_to_left[t, :n] = np.asarray(tree.missing_go_to_left, dtype=bool)
+                children_left[t, :n] = np.where(is_leaf, nodes, tree.children_left)
+                children_right[t, :n] = np.where(is_leaf, nodes, tree.children_right)
+
+                values = tree.value[:, 0, :n_classes].astype(np.float64)
+                # Older sklearn stores class counts and normalises at predict time;
+                # newer releases already store per-node fractions.
+                normalizer = values.sum(axis=1)[:, np.newaxis]
+                if not np.allclose(normalizer, 1.0):
+                    normalizer[normalizer == 0.0] = 1.0
+                    values = values / normalizer
+                leaf_values[t, :n] = values
+
+            arrays = {
+                "feature": feature,
+                "threshold": threshold,
+                "missing_go_to_left": missing_go_to_left,
+                "children_left": children_left,
+                "children_right": children_right,
+                "leaf_values": leaf_values,
+                "classes": np.asarray(forest.classes_),
+            }
+            logging.info(f"Compiled forest of {n_trees} trees with up to {max_nodes} nodes each")
+            return cls(arrays=arrays)
+
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: str) -> "CompiledForest":
+        """
+        Reference a saved engine; arrays are read on the first prediction
+        :param file_path: `.npz` file written by `save`, or bundle directory written by `save_bundle`
+        """
+        return cls(file_path=file_path)
+
+    def save(self, file_path: str, **metadata) -> None:
+        """
+        Write the engine as a compressed `.npz`
+        :param metadata: Extra scalar entries stored alongside the arrays, e.g. source_version
+        """
+        try:
+            arrays = dict(self.arrays)
+            arrays.update({key: np.asarray(value) for key, value in metadata.items()})
+            np.savez_compressed(file_path, **arrays)
+            logging.info(f"Saved compiled forest to {file_path}")
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def save_bundle(self, bundle_dir: str, **metadata) -> None:
+        """
+        Write the traversal-ready arrays as one uncompressed `.npy` file each so
+        they can be memory-mapped by `load`. The files are written to a temporary
+        directory renamed to `bundle_dir` once complete, so readers never see a
+        partial bundle; an existing `bundle_dir` may be mapped by a serving
+        process and is kept as it is
+        :param bundle_dir: New directory for this engine, e.g. one named after its source_version
+        :param metadata: Extra scalar entries stored alongside the arrays, e.g. source_version
+        """
+        try:
+            if os.path.exists(bundle_dir):
+                logging.info(f"Keeping existing compiled forest bundle {bundle_dir}")
+                return
+            parent_dir = os.path.dirname(os.path.abspath(bundle_dir))
+            os.makedirs(parent_dir, exist_ok=True)
+            arrays = {name: self.arrays[name] for name in self._BUNDLE_ARRAY_NAMES}
+            arrays.update(self._flat())
+            arrays.update({key: np.asarray(value) for key, value in metadata.items()})
+            temp_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(bundle_dir)}.", dir=parent_dir)
+            try:
+                for name, array in arrays.items():
+                    np.save(os.path.join(temp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+                os.rename(temp_dir, bundle_dir)
+            except OSError:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                # Another process exported the same bundle first
+                if not os.path.isdir(bundle_dir):
+                    raise
+            logging.info(f"Saved compiled forest bundle to {bundle_dir}")
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # An engine saved to disk is pickled as its path, so a worker process reads or maps the
+        # file itself instead of receiving a copy of the arrays
+        if self.file_path is not None:
+            state["_arrays"] = state["_flat_arrays"] = None
+        return state
+
+    @staticmethod
+    def read_metadata(file_path: str, key: str):
+        """Read one scalar entry from a saved engine without loading the tree arrays"""
+        if os.path.isdir(file_path):
+            entry_path = os.path.join(file_path, f"{key}.npy")
+            return np.load(entry_path, allow_pickle=False).item() if os.path.exists(entry_path) else None
+        with np.load(file_path, allow_pickle=False) as npz:
+            return npz[key].item() if key in npz.files else None
+
+    @property
+    def arrays(self) -> dict:
+        if self._arrays is None:
+            if os.path.isdir(self.file_path):
+                self._arrays = self._map_bundle(self._BUNDLE_ARRAY_NAMES)
+                self._flat_arrays = self._map_bundle(self._BUNDLE_FLAT_ARRAY_NAMES)
+                logging.info(f"Memory-mapped compiled forest bundle {self.file_path}")
+            else:
+                with np.load(self.file_path, allow_pickle=False) as npz:
+                    self._arrays = {name: npz[name] for name in self._ARRAY_NAMES}
+                logging.info(f"Loaded compiled forest from {self.file_path}")
+        return self._arrays
+
+    def _map_bundle(self, names) -> dict:
+        return {name: np.load(os.path.join(self.file_path, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+                for name in names}
+
+    @property
+    def classes_(self) -> np.ndarray:
+        return self.arrays["classes"]
+
+    def _flat(self) -> dict:
+        """Tree arrays flattened to global node ids (tree * max_nodes + node)"""
+        arrays = self.arrays
+        if self._flat_arrays is None:
+            n_trees, max_nodes = arrays["feature"].shape
+            offsets = (np.arange(n_trees, dtype=np.intp) * max_nodes)[:, np.newaxis]
+            children = np.stack([arrays["children_left"] + offsets, arrays["children_right"] + offsets], axis=-1)
+            self._flat_arrays = {
+                "roots": offsets.ravel(),
+                "feature": arrays["feature"].ravel().astype(np.intp),
+                "threshold": arrays["threshold"].ravel(),
+                "missing_go_to_left": arrays["missing_go_to_left"].ravel(),
+                "children": children.ravel(),
+                "is_leaf": (arrays["children_left"] == np.arange(max_nodes)).ravel(),
+            }
+        return self._flat_arrays
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf index reached in every tree, shape (n_trees, n_samples)"""
+        flat = self._flat()
+        feature, threshold, children = flat["feature"], flat["threshold"], flat["children"]
+        missing_go_to_left, is_leaf, roots = flat["missing_go_to_left"], flat["is_leaf"], flat["roots"]
+
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        leaves = np.empty((len(roots), n_samples), dtype=np.intp)
+
+        for start in range(0, n_samples, self.block_rows):
+            block = X[start:start + self.block_rows]
+            n_block = block.shape[0]
+            values = block.ravel()
+            # One entry per (tree, row) pair; only pairs not yet at a leaf are advanced
+            node = np.repeat(roots, n_block)
+            row_offset = np.tile(np.arange(n_block, dtype=np.intp) * n_features, len(roots))
+            active = np.flatnonzero(~is_leaf[node])
+            has_missing = np.isnan(values).any()
+            step = 0
+            while active.size:
+                current = node[active]
+                x = values[row_offset[active] + feature[current]]
+                go_left = x <= threshold[current]
+                if has_missing:
+                    go_left |= np.isnan(x) & missing_go_to_left[current]
+                node[active] = children[2 * current + 1 - go_left]
+                step += 1
+                # Leaves point to themselves, so finished pairs can be dropped only every few steps
+                if step % self.compact_every == 0:
+                    active = active[~is_leaf[node[active]]]
+            leaves[:, start:start + n_block] = node.reshape(len(roots), n_block) - roots[:, np.newaxis]
+        return leaves
+
+    def predict_proba(self, X) -> np.ndarray:
+        try:
+            leaf_values = self.arrays["leaf_values"]
+            leaves = self.apply(X)
+            proba = np.zeros((leaves.shape[1], leaf_values.shape[2]), dtype=np.float64)
+            # Sum tree by tree, as sklearn does, so results are bit-identical
+            for t in range(leaves.shape[0]):
+                proba += leaf_values[t, leaves[t]]
+            proba /= leaves.shape[0]
+            return proba
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
@@ -0,0 +1,230 @@
+import sys
+from typing import List, Optional
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, StandardScaler
+
+from src.forest.exception import ForestException
+from src.forest.logger import logging
+from src.forest.entity.one_hot_block_encoder import OneHotBlockEncoder
+
+
+class CompiledPreprocessor:
+    """
+    Array form of a fitted ColumnTransformer whose numeric pipelines are an
+    imputer and a scaler, for serving.
+
+    Per output column, imputing then standard scaling is the affine map
+    `(fill(x) - offset) / scale`, so the whole numeric pipeline reduces to an
+    index map into the raw input columns and three vectors: the fill values
+    (imputer statistics), the offsets (scaler means) and the scales. `transform`
+    converts the input once and applies the vectors to one copy of its columns,
+    with the same operations in the same order and dtype as sklearn, so the
+    result is identical to `ColumnTransformer.transform` without its per-call
+    DataFrame validation and per-transformer column selection. Like sklearn,
+    each transformer computes in the float dtype of its input columns (float32
+    stays float32, integers are computed in float64) and the output has the
+    result dtype of all transformer outputs. One-hot block encoders are applied
+    to their columns of the same raw array.
+
+    Only SimpleImputer (NaN missing values, no indicator) and StandardScaler
+    steps, OneHotBlockEncoder, "passthrough" and a dropped remainder are
+    supported; `from_sklearn` raises for anything else.
+    """
+
+    def __init__(self, input_columns: List[str], index: np.ndarray, fill: np.ndarray, offset: np.ndarray,
+                 scale: np.ndarray, encoders: Optional[list] = None, groups: Optional[list] = None):
+        """
+        :param input_columns: Raw input columns the ColumnTransformer was fitted on, in order
+        :param index: Position in `input_columns` of the input of every affine output column
+        :param fill: Value replacing a missing input of every affine output column, NaN keeps it missing
+        :param offset: Value subtracted from every affine output column
+        :param scale: Value every affine output column is divided by
+        :param encoders: (output position, input positions, OneHotBlockEncoder) of the block encoders
+        :param groups: (number of columns, converts to float) of every transformer over consecutive affine
+            columns; a "passthrough" does not convert. Defaults to one converting transformer
+        """
+        self.input_columns = list(input_columns)
+        self.index = np.asarray(index, dtype=np.intp)
+        self.fill = np.asarray(fill, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.encoders = encoders or []
+        self.groups = groups if groups is not None else [(len(self.index), True)]
+        self.n_features_out = len(self.index) + sum(len(encoder.blocks) for _, _, encoder in self.encoders)
+        encoded = np.zeros(self.n_features_out, dtype=bool)
+        for start, _, encoder in self.encoders:
+            encoded[start:start + len(encoder.blocks)] = True
+        self._affine_positions = np.flatnonzero(~encoded)
+        self._column_map = None
+        self._dtypes = None
+
+    @staticmethod
+    def _affine_steps(transformer, n_columns: int):
+        """
+        Fill, offset and scale vectors of an imputer and/or scaler pipeline over n_columns inputs,
+        and whether the pipeline converts its input to float (False for "passthrough")
+        """
+        steps = [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+        # "passthrough" is fitted as an identity FunctionTransformer
+        steps = [step for step in steps if step is not None and not isinstance(step, str) and
+                 not (isinstance(step, FunctionTransformer) and step.func is None)]
+        imputers = [step for step in steps if isinstance(step, SimpleImputer)]
+        scalers = [step for step in steps if isinstance(step, StandardScaler)]
+        if len(imputers) > 1 or len(scalers) > 1 or len(imputers) + len(scalers) != len(steps) or \
+                (imputers and steps[0] is not imputers[0]):
+            raise ValueError(f"Cannot compile {transformer}, expected an optional SimpleImputer "
+                             f"followed by an optional StandardScaler")
+
+        fill, offset, scale = np.full(n_columns, np.nan), np.zeros(n_columns), np.ones(n_columns)
+        for imputer in imputers:
+            missing_values = imputer.missing_values
+            if not (isinstance(missing_values, float) and np.isnan(missing_values)) or imputer.add_indicator:
+                raise ValueError("Only imputers of NaN without a missing indicator can be compiled")
+            # SimpleImputer fills with its statistics cast to the dtype it was fitted on
+            fill = np.asarray(imputer.statistics_).astype(getattr(imputer, "_fill_dtype", np.float64)) \
+                .astype(np.float64)
+            if np.isnan(fill).any():
+                raise ValueError("Imputers that drop or keep all-missing columns cannot be compiled")
+        for scaler in scalers:
+            if scaler.with_mean:
+                offset = np.asarray(scaler.mean_, dtype=np.float64)
+            if scaler.with_std:
+                scale = np.asarray(scaler.scale_, dtype=np.float64)
+        return fill, offset, scale, bool(steps)
+
+    @classmethod
+    def from_sklearn(cls, preprocessor: ColumnTransformer) -> "CompiledPreprocessor":
+        """Export a fitted ColumnTransformer"""
+        try:
+            if not isinstance(preprocessor, ColumnTransformer):
+                raise ValueError(f"Cannot compile {type(preprocessor).__name__}, expected a ColumnTransformer")
+            if not (isinstance(preprocessor.remainder, str) and preprocessor.remainder == "drop"):
+                raise ValueError("Only ColumnTransformers that drop the remainder can be compiled")
+            input_columns = list(preprocessor.feature_names_in_)
+            position = {column: i for i, column in enumerate(input_columns)}
+
+            index, fill, offset, scale, encoders, groups = [], [], [], [], [], []
+            n_out = 0
+            for name, transformer, columns in preprocessor.transformers_:
+                if isinstance(transformer, str) and transformer == "drop" or name == "remainder":
+                    continue
+                inputs = [position[column] for column in columns]
+                if isinstance(transformer, OneHotBlockEncoder):
+                    encoders.append((n_out, np.asarray(inputs, dtype=np.intp), transformer))
+                    n_out += len(transformer.blocks)
+                    continue
+                column_fill, column_offset, column_scale, converts = cls._affine_steps(transformer, len(inputs))
+                groups.append((len(inputs), converts))
+                index.extend(inputs)
+                fill.append(column_fill)
+                offset.append(column_offset)
+                scale.append(column_scale)
+                n_out += len(inputs)
+
+            compiled = cls(input_columns, index, np.concatenate(fill or [[]]), np.concatenate(offset or [[]]),
+                           np.concatenate(scale or [[]]), encoders, groups)
+            logging.info(f"Compiled preprocessor: {len(index)} affine and {n_out - len(index)} encoded columns")
+            return compiled
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def _raw_array(self, X):
+        """
+        Input columns of X as a float64 array (exact for every integer and float32 column), where each
+        input column is in it (None when in order), and the dtypes of the input columns in order.
+        A frame holding exactly the input columns is converted whole; the positions of its columns
+        are looked up once per column order and reused
+        """
+        if not hasattr(X, "columns"):
+            X = np.asarray(X)
+            return X.astype(np.float64, copy=False), None, (X.dtype,) * len(self.input_columns)
+        columns = tuple(X.columns)
+        column_map = getattr(self, "_column_map", None)
+        # Maps cached before the input positions were kept (3 entries) are rebuilt
+        if column_map is None or column_map[0] != columns or len(column_map) < 4:
+            positions = X.columns.get_indexer(self.input_columns)
+            if (positions < 0).any():
+                missing = [column for column, i in zip(self.input_columns, positions) if i < 0]
+                raise ValueError(f"Columns are missing from the input: {missing}")
+            in_order = columns == tuple(self.input_columns)
+            column_map = self._column_map = (columns, None if in_order else positions,
+                                             len(columns) == len(self.input_columns), positions)
+        frame_dtypes = tuple(X.dtypes)
+        input_dtypes = tuple(frame_dtypes[i] for i in column_map[3])
+        if not column_map[2]:
+            return X[self.input_columns].to_numpy(dtype=np.float64, na_value=np.nan), None, input_dtypes
+        return X.to_numpy(dtype=np.float64, na_value=np.nan), column_map[1], input_dtypes
+
+    @staticmethod
+    def _group_dtype(input_dtypes, converts: bool) -> np.dtype:
+        """Dtype sklearn's check_array gives a transformer's columns: their result type, float64 unless float"""
+        try:
+            dtype = np.result_type(*input_dtypes)
+        except TypeError:
+            # pandas extension dtypes are converted to float64
+            return np.dtype(np.float64)
+        if dtype.kind not in "biuf" or (converts and dtype.kind != "f"):
+            return np.dtype(np.float64)
+        return dtype
+
+    def _groups(self) -> list:
+        # Preprocessors compiled before groups were recorded hold one converting transformer
+        return getattr(self, "groups", [(len(self.index), True)])
+
+    def _output_dtypes(self, input_dtypes):
+        """Dtype of every affine group and of the output, computed once per input dtypes"""
+        cached = getattr(self, "_dtypes", None)
+        if cached is not None and cached[0] == input_dtypes:
+            return cached[1], cached[2]
+        index = self.index.tolist()
+        group_dtypes, start = [], 0
+        for size, converts in self._groups():
+            group_dtypes.append(self._group_dtype([input_dtypes[i] for i in index[start:start + size]], converts))
+            start += size
+        # ColumnTransformer stacks the transformer outputs, the block encoders' being uint8
+        output_dtype = np.result_type(*group_dtypes, *([np.uint8] if self.encoders else []))
+        self._dtypes = (input_dtypes, group_dtypes, output_dtype)
+        return group_dtypes, output_dtype
+
+    def transform(self, X) -> np.ndarray:
+        """
+        :param X: DataFrame holding the input columns, or an array of them in `input_columns` order
+        :return: Array equal to the ColumnTransformer's output, in the same dtype
+        """
+        try:
+            X, positions, input_dtypes = self._raw_array(X)
+            group_dtypes, output_dtype = self._output_dtypes(input_dtypes)
+            index = self.index if positions is None else positions[self.index]
+            if all(dtype == np.float64 for dtype in group_dtypes):
+                # Same operations in the same order as SimpleImputer then StandardScaler, on one copy
+                values = X[:, index]
+                np.copyto(values, self.fill, where=np.isnan(values))
+                values -= self.offset
+                values /= self.scale
+            else:
+                values = np.empty((len(X), len(index)), dtype=output_dtype)
+                start = 0
+                for (size, converts), dtype in zip(self._groups(), group_dtypes):
+                    columns = slice(start, start + size)
+                    start += size
+                    group = X[:, index[columns]].astype(dtype)
+                    if converts:
+                        # StandardScaler casts its mean and scale to the dtype of its input
+                        np.copyto(group, self.fill[columns].astype(dtype), where=np.isnan(group))
+                        group -= self.offset[columns].astype(dtype)
+                        group /= self.scale[columns].astype(dtype)
+                    values[:, columns] = group
+            if not self.encoders:
+                return values.astype(output_dtype, copy=False)
+            transformed = np.empty((len(X), self.n_features_out), dtype=output_dtype)
+            transformed[:, self._affine_positions] = values
+            for start, inputs, encoder in self.encoders:
+                inputs = inputs if positions is None else positions[inputs]
+                transformed[:, start:start + len(encoder.blocks)] = encoder.transform(X[:, inputs])
+            return transformed
+        except Exception as e:
+            raise ForestException(e, sys) from e
@@ -13,6 +13,7 @@ class TrainingPipelineConfig:
     pipeline_name: str = PIPELINE_NAME
     artifact_dir: str = os.path.join(ROOT_DIR,ARTIFACT_DIR, TIMESTAMP)
     timestamp: str = TIMESTAMP
+    artifact_store_dir: str = os.path.join(ROOT_DIR, ARTIFACT_DIR, ARTIFACT_STORE_DIR_NAME)
 
 training_pipeline_config: TrainingPipelineConfig = TrainingPipelineConfig()
 
@@ -20,12 +21,22 @@ training_pipeline_config: TrainingPipelineConfig = TrainingPipelineConfig()
 @dataclass
 class DataIngestionConfig:
     data_ingestion_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_INGESTION_DIR_NAME)
-    feature_store_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_FEATURE_STORE_DIR, FILE_NAME)
-    training_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TRAIN_FILE_NAME)
-    testing_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TEST_FILE_NAME)
+    feature_store_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_FEATURE_STORE_DIR,
+                                                FILE_NAME.replace("csv", DATA_INGESTION_FILE_FORMAT))
+    training_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR,
+                                           TRAIN_FILE_NAME.replace("csv", DATA_INGESTION_FILE_FORMAT))
+    testing_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR,
+                                          TEST_FILE_NAME.replace("csv", DATA_INGESTION_FILE_FORMAT))
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATION
     collection_name:str = DATA_INGESTION_COLLECTION_NAME
     zip_file_path: str = DATA_INGESTION_ZIP_FILE_PATH
+    chunk_size: int = DATA_INGESTION_CHUNK_SIZE
+    split_key_columns: tuple = DATA_INGESTION_SPLIT_KEY_COLUMNS
+    split_stratify: bool = DATA_INGESTION_SPLIT_STRATIFY
+    source: str = DATA_INGESTION_SOURCE
+    mongo_feature_store_file_path: str = DATA_INGESTION_MONGO_FEATURE_STORE_FILE_PATH
+    watermark_field: str = DATA_INGESTION_WATERMARK_FIELD
+    force_full_export: bool = DATA_INGESTION_FORCE_FULL_EXPORT
 
 
 @dataclass
@@ -39,6 +50,25 @@ class DataValidationConfig:
     invalid_test_file_path: str = os.path.join(invalid_data_dir, TEST_FILE_NAME)
     drift_report_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_DRIFT_REPORT_DIR,
                                                DATA_VALIDATION_DRIFT_REPORT_FILE_NAME)
+    train_sketch_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_DRIFT_REPORT_DIR,
+                                               DATA_VALIDATION_TRAIN_SKETCH_FILE_NAME)
+    test_sketch_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_DRIFT_REPORT_DIR,
+                                              DATA_VALIDATION_TEST_SKETCH_FILE_NAME)
+    reference_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_DRIFT_REPORT_DIR,
+                                            DATA_VALIDATION_REFERENCE_FILE_NAME)
+    validation_report_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_DRIFT_REPORT_DIR,
+                                                    DATA_VALIDATION_REPORT_FILE_NAME)
+    quantile_method: str = DATA_VALIDATION_QUANTILE_METHOD
+    sketch_k: int = DATA_VALIDATION_SKETCH_K
+    chunk_size: int = DATA_VALIDATION_CHUNK_SIZE
+    sketch_workers: int = DATA_VALIDATION_SKETCH_WORKERS
+    drift_n_bins: int = DATA_VALIDATION_DRIFT_N_BINS
+    drift_ks_threshold: float = DATA_VALIDATION_DRIFT_KS_THRESHOLD
+    drift_psi_threshold: float = DATA_VALIDATION_DRIFT_PSI_THRESHOLD
+    drift_workers: int = DATA_VALIDATION_DRIFT_WORKERS
+    validation_mode: str = DATA_VALIDATION_MODE
+    max_null_rate: float = DATA_VALIDATION_MAX_NULL_RATE
+    max_out_of_range_rate: float = DATA_VALIDATION_MAX_OUT_OF_RANGE_RATE
 
 
 @dataclass
@@ -48,9 +78,21 @@ class DataTransformationConfig:
                                                     TRAIN_FILE_NAME.replace("csv", "npy"))
     transformed_test_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
                                                    TEST_FILE_NAME.replace("csv", "npy"))
+    transformed_train_label_file_path: str = os.path.join(data_transformation_dir,
+                                                          DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                          DATA_TRANSFORMATION_TRAIN_LABEL_FILE_NAME)
+    transformed_test_label_file_path: str = os.path.join(data_transformation_dir,
+                                                         DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                         DATA_TRANSFORMATION_TEST_LABEL_FILE_NAME)
     transformed_object_file_path: str = os.path.join(data_transformation_dir,
                                                      DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
                                                      PREPROCSSING_OBJECT_FILE_NAME)
+    encode_one_hot_blocks: bool = DATA_TRANSFORMATION_ENCODE_ONE_HOT_BLOCKS
+    feature_dtype: str = DATA_TRANSFORMATION_FEATURE_DTYPE
+    fit_method: str = DATA_TRANSFORMATION_FIT_METHOD
+    chunk_size: int = DATA_TRANSFORMATION_CHUNK_SIZE
+    sketch_k: int = DATA_TRANSFORMATION_SKETCH_K
+    fit_workers: int = DATA_TRANSFORMATION_FIT_WORKERS
 
 
 @dataclass
@@ -0,0 +1,121 @@
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.forest.constant.training_pipeline import SCHEMA_FILE_PATH
+from src.forest.exception import ForestException
+from src.forest.logger import logging
+from src.forest.utils.main_utils import (read_yaml_file, read_dataframe, get_schema_dtypes, get_dataframe_memory_mb,
+                                         RssSampler)
+
+
+class DatasetContext:
+    """
+    Datasets and schema shared by the components of one training run.
+
+    The schema and every split are parsed on first use and cached, so each file
+    is read at most once per run however many components need it; a file that
+    is rewritten (new size or mtime) is read again. Dataframes are handed out
+    with read-only blocks: components derive new frames from them (drop, select,
+    transform) as they already do, and an in-place write raises instead of
+    silently changing what later components see.
+
+    The context travels on `DataIngestionArtifact` and `DataValidationArtifact`
+    and is not persisted with them. Each load's size and time and, per stage,
+    the RSS at its start and the largest RSS sampled while it ran are recorded
+    for `memory_report`.
+    """
+
+    def __init__(self, schema_file_path: str = SCHEMA_FILE_PATH):
+        self.schema_file_path = schema_file_path
+        self._schema: Optional[dict] = None
+        self._frames: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._file_locks: Dict[str, threading.Lock] = {}
+        self.loads: Dict[str, dict] = {}
+        self.stage_rss_mb: Dict[str, dict] = {}
+        self._stage_sampler: Optional[RssSampler] = None
+
+    @property
+    def schema(self) -> dict:
+        """Parsed schema file, read once"""
+        with self._lock:
+            if self._schema is None:
+                self._schema = read_yaml_file(file_path=self.schema_file_path)
+            return self._schema
+
+    @property
+    def schema_dtypes(self) -> dict:
+        return get_schema_dtypes(self.schema)
+
+    @staticmethod
+    def _freeze(dataframe: pd.DataFrame) -> pd.DataFrame:
+        # Object blocks stay writeable: pandas' deep memory usage reads them through a writeable buffer
+        for block in getattr(dataframe._mgr, "blocks", ()):
+            if isinstance(block.values, np.ndarray) and block.values.dtype != object:
+                block.values.flags.writeable = False
+        return dataframe
+
+    def read_dataframe(self, file_path: str) -> pd.DataFrame:
+        """
+        :param file_path: Split saved by `save_dataframe`
+        :return: Read-only dataframe of the file with the schema dtypes, parsed on first use
+        """
+        try:
+            path = os.path.abspath(file_path)
+            stat = os.stat(path)
+            stamp = (stat.st_size, stat.st_mtime_ns)
+            with self._lock:
+                file_lock = self._file_locks.setdefault(path, threading.Lock())
+            # Components reading the same file concurrently wait for one parse
+            with file_lock:
+                cached = self._frames.get(path)
+                if cached is not None and cached[0] == stamp:
+                    return cached[1]
+
+                start = time.perf_counter()
+                dataframe = self._freeze(read_dataframe(file_path, dtypes=self.schema_dtypes))
+                load = {"rows": len(dataframe), "memory_mb": float(get_dataframe_memory_mb(dataframe)),
+                        "read_seconds": round(time.perf_counter() - start, 3),
+                        "reads": self.loads.get(path, {}).get("reads", 0) + 1}
+                self._frames[path] = (stamp, dataframe)
+                self.loads[path] = load
+                logging.info(f"Read {file_path} once for this run: {load}")
+                return dataframe
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def release(self, file_path: Optional[str] = None) -> None:
+        """Drop one cached dataframe, or all of them, once no later component needs it"""
+        with self._lock:
+            if file_path is None:
+                self._frames.clear()
+            else:
+                self._frames.pop(os.path.abspath(file_path), None)
+
+    def start_stage(self, stage: str) -> None:
+        """Start sampling the RSS of `stage`; a stage started but never recorded (a cache hit) is discarded"""
+        with self._lock:
+            previous, self._stage_sampler = self._stage_sampler, RssSampler().start()
+        if previous is not None:
+            previous.stop()
+
+    def record_stage(self, stage: str) -> None:
+        """Record the RSS at the start of `stage` and the largest RSS sampled until its end"""
+        with self._lock:
+            sampler, self._stage_sampler = self._stage_sampler, None
+        if sampler is None:
+            return
+        self.stage_rss_mb[stage] = sampler.stop()
+        logging.info(f"RSS during {stage}: {self.stage_rss_mb[stage]}")
+
+    def memory_report(self) -> dict:
+        """Files read with their size, time and read count, and the RSS of each stage"""
+        return {"loads": dict(self.loads), "cached_memory_mb": round(float(sum(
+                    get_dataframe_memory_mb(frame) for _, frame in self._frames.values())), 3),
+                "stage_rss_mb": dict(self.stage_rss_mb)}
@@ -0,0 +1,226 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from src.forest.exception import ForestException
+
+
+class DriftDetector:
+    """
+    Per-column distribution drift between reference (training) data and new data.
+
+    The reference is summarized once as a histogram per column over bins at its
+    quantiles; a discrete column whose values are fewer than the bins gets one
+    bin per value. New data is binned on the same edges, so checking a batch
+    only reads the batch. Histograms of a column block are counted with one
+    `np.bincount` over offset bin codes, and blocks are counted in a thread
+    pool for wide data. All columns are then compared at once on zero-padded
+    count matrices:
+
+    - KS statistic: largest gap between the two cumulative distributions at
+      the bin edges, exact for discrete columns binned by value.
+    - PSI: sum of (p_new - p_ref) * ln(p_new / p_ref) over the bins, with
+      empty bins smoothed by `epsilon`.
+
+    A column drifts when its KS statistic or PSI passes its threshold.
+    """
+
+    MAX_LOOKUP_RANGE = 1 << 20
+    SKETCH_BIN_RANKS = 20
+
+    def __init__(self, n_bins: int = 50, ks_threshold: float = 0.1, psi_threshold: float = 0.2,
+                 block_columns: int = 16, workers: int = 4, epsilon: float = 1e-4):
+        """
+        :param n_bins: Maximum number of reference quantile bins per column
+        :param ks_threshold: KS statistic above which a column drifts
+        :param psi_threshold: PSI above which a column drifts, 0.2 is the usual "significant shift"
+        :param block_columns: Columns binned and counted together
+        :param workers: Threads counting column blocks concurrently
+        :param epsilon: Share given to empty bins in the PSI
+        """
+        self.n_bins = n_bins
+        self.ks_threshold = ks_threshold
+        self.psi_threshold = psi_threshold
+        self.block_columns = block_columns
+        self.workers = workers
+        self.epsilon = epsilon
+
+    def _edges(self, quantiles: np.ndarray) -> np.ndarray:
+        # Bin j is [edges[j], edges[j + 1]), the first bin is open below and the last above
+        return np.unique(quantiles[~np.isnan(quantiles)])
+
+    def _is_countable(self, values: np.ndarray) -> bool:
+        """Integer columns of a moderate range are histogrammed by value instead of searched"""
+        return np.issubdtype(values.dtype, np.integer) and len(values) > 0 and \
+            int(values.max()) - int(values.min()) < self.MAX_LOOKUP_RANGE
+
+    def fit(self, df: pd.DataFrame, columns: List[str]) -> Dict[str, dict]:
+        """
+        :param df: Reference data
+        :param columns: Numerical columns to profile
+        :return: Dictionary of column name to {"edges", "counts"} of its reference histogram
+        """
+        try:
+            levels = np.linspace(0, 1, self.n_bins + 1)
+            reference, other_edges = {}, {}
+            for column in columns:
+                values = df[column].to_numpy()
+                if self._is_countable(values):
+                    # One pass: quantile edges and bin counts both come from the value histogram
+                    minimum = int(values.min())
+                    histogram = np.bincount(values.astype(np.intp) - minimum)
+                    ranks = np.floor(levels * (len(values) - 1))
+                    edges = self._edges(minimum + np.searchsorted(np.cumsum(histogram), ranks, side="right")
+                                        .astype(np.float64))
+                    counts = np.add.reduceat(histogram, (edges - minimum).astype(np.intp))
+                    reference[column] = {"edges": edges, "counts": counts}
+                else:
+                    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+                    other_edges[column] = self._edges(np.nanquantile(values, levels, method="lower")
+                                                      if not np.isnan(values).all() else np.array([]))
+            if other_edges:
+                counts = self.histograms(df, other_edges)
+                reference.update({column: {"edges": edges, "counts": counts[column]}
+                                  for column, edges in other_edges.items()})
+            return {column: reference[column] for column in columns}
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def fit_sketches(self, sketches: dict) -> Dict[str, dict]:
+        """
+        Reference histograms from per-column `KLLSketch`es of data that was streamed rather
+        than loaded. Bin shares carry the sketch's rank error, so bins are kept at least
+        `SKETCH_BIN_RANKS` times wider than it (deciles at k=200) to keep the PSI from
+        reading that error as drift
+        """
+        try:
+            edges = {}
+            for column, sketch in sketches.items():
+                n_bins = min(self.n_bins, max(1, sketch.k // self.SKETCH_BIN_RANKS))
+                edges[column] = self._edges(np.atleast_1d(sketch.quantile(np.linspace(0, 1, n_bins + 1))))
+            counts = self.sketch_histograms(sketches, edges)
+            return {column: {"edges": edges[column], "counts": counts[column]} for column in sketches}
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def _bin_codes(self, values: np.ndarray, edges: np.ndarray, missing_code: int) -> np.ndarray:
+        if np.issubdtype(values.dtype, np.integer) and len(edges) and edges[-1] - edges[0] < self.MAX_LOOKUP_RANGE:
+            # Bin of every value in the reference range, values outside it are clipped into the outer bins
+            low, high = int(edges[0]), int(edges[-1])
+            lookup = np.searchsorted(edges[1:], np.arange(low, high + 1), side="right")
+            return lookup[np.clip(values.astype(np.intp), low, high) - low]
+        values = values.astype(np.float64)
+        # Interior edges only, so values outside the reference range fall in the outer bins
+        codes = np.searchsorted(edges[1:], values, side="right")
+        # Missing values go to a spare last bin that is dropped
+        codes[np.isnan(values)] = missing_code
+        return codes
+
+    def _count_block(self, df: pd.DataFrame, names: List[str], edges: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        width = max(len(edges[name]) for name in names) + 1
+        codes = np.empty((len(names), len(df)), dtype=np.int64)
+        for i, name in enumerate(names):
+            values = df[name].to_numpy()
+            if not np.issubdtype(values.dtype, np.number):
+                values = df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+            codes[i] = self._bin_codes(values, edges[name], width - 1)
+        codes += (np.arange(len(names)) * width)[:, np.newaxis]
+        counts = np.bincount(codes.ravel(), minlength=len(names) * width).reshape(len(names), width)
+        return {name: counts[i, :max(len(edges[name]), 1)] for i, name in enumerate(names)}
+
+    def histograms(self, df: pd.DataFrame, edges: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        :param df: Data to bin
+        :param edges: Dictionary of column name to reference bin edges
+        :return: Dictionary of column name to its counts in the reference bins
+        """
+        try:
+            names = list(edges)
+            blocks = [names[start:start + self.block_columns] for start in range(0, len(names), self.block_columns)]
+            counts = {}
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(blocks)))) as executor:
+                for block_counts in executor.map(lambda block: self._count_block(df, block, edges), blocks):
+                    counts.update(block_counts)
+            return counts
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    @staticmethod
+    def sketch_histograms(sketches: dict, edges: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Approximate `histograms` of streamed data from its per-column `KLLSketch`es"""
+        try:
+            counts = {}
+            for column, column_edges in edges.items():
+                sketch = sketches[column]
+                below = sketch.n * np.atleast_1d(sketch.rank(column_edges[1:], inclusive=False)) \
+                    if sketch.n else np.zeros(max(len(column_edges) - 1, 0))
+                cumulative = np.concatenate(([0], np.round(below), [sketch.n]))
+                counts[column] = np.diff(cumulative).astype(np.int64)
+            return counts
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def compare(self, reference: Dict[str, dict], counts: Dict[str, np.ndarray]) -> Dict[str, dict]:
+        """
+        :param reference: Result of `fit` or `fit_sketches`
+        :param counts: Counts of the new data in the reference bins, from `histograms` or `sketch_histograms`
+        :return: Dictionary of column name to its KS statistic, PSI and drift status
+        """
+        try:
+            names = list(reference)
+            width = max(len(reference[name]["counts"]) for name in names)
+
+            def padded(rows):
+                matrix = np.zeros((len(names), width))
+                for i, row in enumerate(rows):
+                    matrix[i, :len(row)] = row
+                return matrix
+
+            expected = padded(reference[name]["counts"] for name in names)
+            actual = padded(counts[name] for name in names)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                expected /= expected.sum(axis=1, keepdims=True)
+                actual /= actual.sum(axis=1, keepdims=True)
+            ks = np.abs(np.cumsum(expected, axis=1) - np.cumsum(actual, axis=1)).max(axis=1)
+            # Padding bins are empty on both sides and add nothing
+            smoothed_expected = np.maximum(expected, self.epsilon)
+            smoothed_actual = np.maximum(actual, self.epsilon)
+            psi = ((smoothed_actual - smoothed_expected) * np.log(smoothed_actual / smoothed_expected)).sum(axis=1)
+
+            drift = (ks > self.ks_threshold) | (psi > self.psi_threshold)
+            return {name: {"ks_statistic": float(ks[i]), "psi": float(psi[i]), "drift_status": bool(drift[i])}
+                    for i, name in enumerate(names)}
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def detect(self, reference: Dict[str, dict], df: pd.DataFrame) -> Dict[str, dict]:
+        """Compare new data against the reference histograms, see `compare`"""
+        return self.compare(reference, self.histograms(df, {name: column["edges"] for name, column in reference.items()}))
+
+
+def save_reference(file_path: str, reference: Dict[str, dict]) -> None:
+    """Save reference histograms as one `.npz` file, an edges and a counts array per column"""
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        arrays = {"columns": np.array(list(reference), dtype=str)}
+        for i, column in enumerate(reference.values()):
+            arrays[f"edges_{i}"] = column["edges"]
+            arrays[f"counts_{i}"] = column["counts"]
+        with open(file_path, "wb") as file_obj:
+            np.savez(file_obj, **arrays)
+    except Exception as e:
+        raise ForestException(e, sys) from e
+
+
+def load_reference(file_path: str) -> Dict[str, dict]:
+    """Load reference histograms saved by `save_reference`"""
+    try:
+        with np.load(file_path) as arrays:
+            return {str(name): {"edges": arrays[f"edges_{i}"], "counts": arrays[f"counts_{i}"]}
+                    for i, name in enumerate(arrays["columns"])}
+    except Exception as e:
+        raise ForestException(e, sys) from e
@@ -3,6 +3,10 @@ from pandas import DataFrame
 from sklearn.pipeline import Pipeline
 from src.forest.exception import ForestException
 from src.forest.logger import logging
+from src.forest.metrics import stage_timer
+from src.forest.constant.application import COMPILED_FOREST_MAX_ROWS, COMPILED_PREPROCESSOR
+from src.forest.entity.compiled_forest import CompiledForest
+from src.forest.entity.compiled_preprocessor import CompiledPreprocessor
 
 from dataclasses import dataclass
 class TargetValueMapping:
@@ -19,6 +23,9 @@ class SensorModel:
     def __init__(self, preprocessing_object: Pipeline, trained_model_object: object):
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        self.compiled_model = None
+        # Exported with the model at training time, so serving never runs the ColumnTransformer
+        self.compiled_preprocessor = self._compile_preprocessor()
 
     def predict(self, dataframe: DataFrame) -> DataFrame:
         logging.info("Entered predict method of SensorTruckModel class")
@@ -26,10 +33,43 @@ class SensorModel:
         try:
             logging.info("Using the trained model to get predictions")
 
-            transformed_feature = self.preprocessing_object.transform(dataframe)
+            compiled_preprocessor = getattr(self, "compiled_preprocessor", None)
+            with stage_timer("sensor_model", "transform"):
+                if compiled_preprocessor is not None and COMPILED_PREPROCESSOR:
+                    transformed_feature = compiled_preprocessor.transform(dataframe)
+                else:
+                    transformed_feature = self.preprocessing_object.transform(dataframe)
 
             logging.info("Used the trained model to get predictions")
-            return self.trained_model_object.predict(transformed_feature)
+            compiled_model = getattr(self, "compiled_model", None)
+            with stage_timer("sensor_model", "predict"):
+                if compiled_model is not None and len(transformed_feature) <= COMPILED_FOREST_MAX_ROWS:
+                    return compiled_model.predict(transformed_feature)
+                return self.trained_model_object.predict(transformed_feature)
+
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def _compile_preprocessor(self):
+        """Fused fill/offset/scale form of the preprocessor, None when it has steps that cannot be fused"""
+        try:
+            return CompiledPreprocessor.from_sklearn(self.preprocessing_object)
+        except ForestException as e:
+            logging.info(f"Preprocessor is not compiled, serving it through sklearn: {e}")
+            return None
+
+    def compile(self) -> None:
+        """
+        Build the array-based inference engine for the trained forest so small
+        batches skip sklearn's per-estimator overhead. Only RandomForestClassifier
+        models are compiled; other models keep predicting through sklearn.
+        Models pickled before the preprocessor was exported get it compiled here.
+        """
+        try:
+            if getattr(self, "compiled_preprocessor", None) is None:
+                self.compiled_preprocessor = self._compile_preprocessor()
+            if type(self.trained_model_object).__name__ == "RandomForestClassifier":
+                self.compiled_model = CompiledForest.from_sklearn(self.trained_model_object)
 
         except Exception as e:
             raise ForestException(e, sys) from e
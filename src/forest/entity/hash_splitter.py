@@ -0,0 +1,57 @@
+import sys
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.forest.exception import ForestException
+
+
+class HashSplitter:
+    """
+    Deterministic, streaming train/test assignment of rows.
+
+    Each row is hashed from its key columns (all columns when none of them are
+    present) with pandas' fixed-key row hash. The row goes to test when the hash,
+    mapped to [0, 1), is below `test_ratio`. The result depends only on the row's
+    key, so it is the same across runs, machines and chunk sizes, and rows
+    appended to the dataset later never move existing rows between splits.
+
+    With `stratify_column`, the threshold on the hash still decides every row,
+    so assignment depends only on row content, never on row order. Hash
+    fractions are uniform within each class, so a class of n rows gets
+    test_ratio * n test rows up to the hash's sampling error, about
+    sqrt(n * test_ratio * (1 - test_ratio)) rows, not an exact count.
+    """
+
+    def __init__(self, test_ratio: float, key_columns: Sequence[str] = (), stratify_column: Optional[str] = None):
+        """
+        :param test_ratio: Fraction of rows assigned to test
+        :param key_columns: Columns identifying a row, e.g. an id; rows are hashed on all columns when none are present
+        :param stratify_column: Optional label column whose classes are each split in the ratio
+        """
+        self.test_ratio = test_ratio
+        self.key_columns = list(key_columns)
+        self.stratify_column = stratify_column
+
+    def row_fractions(self, dataframe: pd.DataFrame) -> np.ndarray:
+        """Hash of every row's key mapped to [0, 1)"""
+        key_columns = [c for c in self.key_columns if c in dataframe.columns] or list(dataframe.columns)
+        keys = dataframe[key_columns]
+        # Hash numbers by value, not by their compact storage dtype
+        keys = keys.astype({c: "float64" for c in key_columns if pd.api.types.is_numeric_dtype(keys[c].dtype)
+                            and not pd.api.types.is_bool_dtype(keys[c].dtype)})
+        hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        return (hashes >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+    def test_mask(self, chunk: pd.DataFrame) -> np.ndarray:
+        """
+        :param chunk: Next rows of the dataset, in any order
+        :return: Boolean array, True for rows assigned to test
+        """
+        try:
+            if self.stratify_column is not None and self.stratify_column not in chunk.columns:
+                raise KeyError(f"Stratify column {self.stratify_column} is not in the data")
+            return self.row_fractions(chunk) < self.test_ratio
+        except Exception as e:
+            raise ForestException(e, sys) from e
@@ -0,0 +1,74 @@
+import sys
+from typing import Dict, List
+
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from src.forest.exception import ForestException
+
+
+class OneHotBlockEncoder(TransformerMixin, BaseEstimator):
+    """
+    Collapses blocks of one-hot columns into one small-int code column per block.
+
+    A row's code is 1 + the position of its hot column within the block, or 0
+    when no column of the block is set. The code alone identifies the hot
+    column, so a tree can split on it directly and `inverse_transform` rebuilds
+    the original one-hot block exactly. For covtype the 4 Wilderness_Area and
+    the Soil_Type columns become 2 uint8 columns.
+    """
+
+    def __init__(self, blocks: Dict[str, List[str]]):
+        """
+        :param blocks: Block name (the output column) to the ordered one-hot columns it replaces
+        """
+        self.blocks = blocks
+
+    def fit(self, X, y=None) -> "OneHotBlockEncoder":
+        try:
+            for name, columns in self.blocks.items():
+                if not 0 < len(columns) < np.iinfo(np.uint8).max:
+                    raise ValueError(f"One-hot block {name} must have between 1 and 254 columns")
+            self.n_features_in_ = sum(len(columns) for columns in self.blocks.values())
+            if hasattr(X, "columns"):
+                self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+            return self
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def transform(self, X) -> np.ndarray:
+        """
+        :param X: DataFrame holding the block columns, or an array with the blocks' columns in order
+        :return: (n_rows, n_blocks) uint8 array of codes
+        """
+        try:
+            codes = np.empty((len(X), len(self.blocks)), dtype=np.uint8)
+            offset = 0
+            for i, (name, columns) in enumerate(self.blocks.items()):
+                if hasattr(X, "columns"):
+                    block = X[columns].to_numpy()
+                else:
+                    block = np.asarray(X)[:, offset:offset + len(columns)]
+                offset += len(columns)
+                # NaN compares False, so a missing flag counts as not set
+                hot = block > 0
+                codes[:, i] = np.where(hot.any(axis=1), hot.argmax(axis=1) + 1, 0)
+            return codes
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def inverse_transform(self, codes) -> np.ndarray:
+        """Rebuild the one-hot columns, in block order, from an array of codes"""
+        try:
+            codes = np.asarray(codes, dtype=np.intp)
+            blocks = []
+            for i, columns in enumerate(self.blocks.values()):
+                one_hot = np.zeros((len(codes), len(columns) + 1), dtype=np.uint8)
+                one_hot[np.arange(len(codes)), codes[:, i]] = 1
+                blocks.append(one_hot[:, 1:])
+            return np.hstack(blocks)
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        return np.asarray(list(self.blocks), dtype=object)
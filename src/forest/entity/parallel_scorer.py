@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+
+from src.forest.exception import ForestException
+from src.forest.logger import logging
+
+# Model used by pool workers, received once through the pool initializer, never per shard
+_worker_model = None
+
+# Long-lived scorers by model version, see `get_scorer`
+_scorers: Dict[str, "ParallelBatchScorer"] = {}
+_scorers_lock = threading.Lock()
+
+
+def _init_worker(model) -> None:
+    global _worker_model
+    _worker_model = model
+    # A compiled forest is read or memory-mapped here, once per worker, instead of on its first shard
+    compiled = getattr(model, "compiled", None)
+    if compiled is not None:
+        compiled.arrays
+
+
+def _score_shard(shard):
+    return np.asarray(_worker_model.predict(shard))
+
+
+def _pool_context():
+    # Workers are started from a clean process, never forked from the multi-threaded server,
+    # so they cannot inherit a lock (logging, the job threads) held by another thread
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class ParallelBatchScorer:
+    """
+    Splits a batch into row shards and scores them on a long-lived process pool.
+
+    `model` is any picklable object with a `predict` method (SensorModel, or a
+    registry LoadedModel that applies its scaler first). The pool is created on
+    the first batch large enough to shard, with forkserver (or spawn) workers
+    that receive the model once through the initializer, which also maps a
+    compiled forest bundle, and is reused by every later batch until `close`.
+    Shards are submitted in order and their results concatenated in that
+    order, so the returned predictions keep input order. Use `get_scorer` to share one scorer per
+    model version across requests.
+    """
+
+    def __init__(self, model: object, n_workers: int = None, min_shard_rows: int = 10_000):
+        """
+        :param model: Fitted object exposing predict(data)
+        :param n_workers: Number of worker processes, defaults to the CPU count
+        :param min_shard_rows: Batches are not split into shards smaller than this
+        """
+        self.model = model
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.min_shard_rows = min_shard_rows
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ParallelBatchScorer":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _shards(self, data) -> list:
+        n_shards = min(self.n_workers, max(1, len(data) // self.min_shard_rows))
+        bounds = np.linspace(0, len(data), n_shards + 1, dtype=int)
+        take = data.iloc if hasattr(data, "iloc") else data
+        return [take[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def predict(self, data) -> np.ndarray:
+        logging.info("Entered predict method of ParallelBatchScorer class")
+        try:
+            shards = self._shards(data)
+            if len(shards) == 1:
+                return np.asarray(self.model.predict(data))
+
+            with self._lock:
+                if self._closed:
+                    # Replaced by a newer version's scorer while this batch was on its way
+                    return np.asarray(self.model.predict(data))
+                if self._pool is None:
+                    context = _pool_context()
+                    logging.info(f"Starting {self.n_workers} {context.get_start_method()} scoring workers")
+                    self._pool = ProcessPoolExecutor(max_workers=self.n_workers, mp_context=context,
+                                                     initializer=_init_worker, initargs=(self.model,))
+                # Submitted under the lock, so `close` cannot shut the pool down in between
+                futures = [self._pool.submit(_score_shard, shard) for shard in shards]
+            logging.info(f"Scoring {len(data)} rows in {len(shards)} shards")
+            predictions = [future.result() for future in futures]
+
+            logging.info("Exited predict method of ParallelBatchScorer class")
+            return np.concatenate(predictions)
+
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def close(self) -> None:
+        """Shut the worker pool down once the shards already submitted are scored"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._closed = True
+        if pool is not None:
+            pool.shutdown(wait=True)
+            logging.info("Shut down scoring workers")
+
+
+def get_scorer(model: object, version: str, n_workers: int = None) -> ParallelBatchScorer:
+    """
+    Scorer shared by every caller of model `version`, so its workers load the model once for
+    all requests and chunks. Asking for another version (a hot swap) shuts the pools of the
+    previous versions down
+    :param model: Fitted object exposing predict(data), the same for every call with `version`
+    :param version: Version identifying `model`
+    :param n_workers: Number of worker processes, defaults to the CPU count
+    """
+    with _scorers_lock:
+        scorer = _scorers.get(version)
+        stale = []
+        if scorer is None or scorer.n_workers != (n_workers or os.cpu_count() or 1):
+            stale = list(_scorers.values())
+            _scorers.clear()
+            scorer = _scorers[version] = ParallelBatchScorer(model, n_workers=n_workers)
+    for previous in stale:
+        previous.close()
+    return scorer
+
+
+def close_scorers() -> None:
+    """Shut down the pools of every shared scorer, e.g. when the server stops"""
+    with _scorers_lock:
+        scorers = list(_scorers.values())
+        _scorers.clear()
+    for scorer in scorers:
+        scorer.close()
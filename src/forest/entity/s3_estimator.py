@@ -1,22 +1,41 @@
 import sys
+import threading
+import time
+from typing import Optional, Tuple
 from src.forest.cloud_storage.aws_storage import SimpleStorageService
+from src.forest.constant.application import MODEL_WATCH_INTERVAL_SECONDS
 from src.forest.exception import ForestException
 from src.forest.entity.estimator import SensorModel
+from src.forest.entity.parallel_scorer import get_scorer
 from pandas import DataFrame
+from botocore.exceptions import ClientError
 class SensorEstimator:
     """
     This class is used to save and retrieve sensor model in s3 bucket and to do prediction
     """
 
-    def __init__(self,bucket_name,model_path,):
+    def __init__(self,bucket_name,model_path,refresh_interval:float=MODEL_WATCH_INTERVAL_SECONDS):
         """
         :param bucket_name: Name of your model bucket
         :param model_path: Location of your model in bucket
+        :param refresh_interval: Seconds between checks of the object's ETag by predict
         """
         self.bucket_name = bucket_name
         self.s3 = SimpleStorageService()
         self.model_path = model_path
-        self.loaded_model:SensorModel=None
+        self.refresh_interval = refresh_interval
+        # Model and the ETag it was loaded from, swapped together by refresh
+        self._loaded:Tuple[Optional[SensorModel],Optional[str]]=(None,None)
+        self._checked_at:float=None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def loaded_model(self)->Optional[SensorModel]:
+        return self._loaded[0]
+
+    @property
+    def loaded_model_etag(self)->Optional[str]:
+        return self._loaded[1]
 
 
     def is_model_present(self,model_path):
@@ -34,6 +53,58 @@ class SensorEstimator:
 
         return self.s3.load_model(self.model_path,bucket_name=self.bucket_name)
 
+    def get_model_etag(self)->str:
+        """
+        ETag of the model object in the bucket, None when the object is missing
+        :return:
+        """
+        stamp = self.get_model_stamp()
+        return None if stamp is None else stamp[0]
+
+    def get_model_stamp(self)->Optional[Tuple[str,float]]:
+        """
+        ETag and LastModified (epoch seconds) of the model object in the bucket, None when the object is missing
+        :return:
+        """
+        try:
+            model_object = self.s3.s3_resource.Object(self.bucket_name, self.model_path)
+            model_object.load()
+            return model_object.e_tag.strip('"'), model_object.last_modified.timestamp()
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise ForestException(e, sys)
+        except Exception as e:
+            raise ForestException(e, sys)
+
+    def refresh(self)->bool:
+        """
+        Reload the cached model if the object in the bucket changed since it was loaded
+        :return: True when a new model was loaded
+        """
+        # Callers that already have a model keep predicting with it while another thread reloads
+        if not self._refresh_lock.acquire(blocking=self.loaded_model is None):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            etag = self.get_model_etag()
+            if etag is None or etag == self.loaded_model_etag:
+                return False
+            loaded_model = self.load_model()
+            loaded_model.compile()
+            self._loaded = (loaded_model, etag)
+            return True
+        except Exception as e:
+            raise ForestException(e, sys)
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh_if_due(self)->None:
+        """Check the object's ETag when no model is loaded or refresh_interval seconds have passed"""
+        if self.loaded_model is None or self._checked_at is None \
+                or time.monotonic() - self._checked_at >= self.refresh_interval:
+            self.refresh()
+
     def save_model(self,from_file,remove:bool=False)->None:
         """
         Save the model to the model_path
@@ -51,14 +122,19 @@ class SensorEstimator:
             raise ForestException(e, sys)
 
 
-    def predict(self,dataframe:DataFrame):
+    def predict(self,dataframe:DataFrame,n_workers:int=1):
         """
         :param dataframe:
+        :param n_workers: Number of worker processes to score row shards on; 1 scores in-process
         :return:
         """
         try:
-            if self.loaded_model is None:
-                self.loaded_model = self.load_model()
-            return self.loaded_model.predict(dataframe=dataframe)
+            self._refresh_if_due()
+            loaded_model, etag = self._loaded
+            if loaded_model is None:
+                raise FileNotFoundError(f"No model at s3://{self.bucket_name}/{self.model_path}")
+            if n_workers > 1:
+                return get_scorer(loaded_model, f"s3-{etag}", n_workers=n_workers).predict(dataframe)
+            return loaded_model.predict(dataframe=dataframe)
         except Exception as e:
             raise ForestException(e, sys)
\ No newline at end of file
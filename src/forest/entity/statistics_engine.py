@@ -0,0 +1,193 @@
+import sys
+import warnings
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.forest.exception import ForestException
+
+OUTLIER_REPORT_KEYS = ("lower_bound", "upper_bound", "outlier_count", "outlier_percentage", "Q1", "Q3", "IQR")
+
+
+def _lerp(a: np.ndarray, b: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """Linear interpolation written exactly as NumPy's quantile does it, so results match bit for bit"""
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+
+class StatisticsEngine:
+    """
+    Per-column summary statistics of a dataframe, computed for many columns at once.
+
+    Columns are processed `block_columns` at a time as one NumPy block, which
+    bounds the working memory on long data. Integer columns (every covtype
+    feature) are packed into a single offset array and counted with one
+    `np.bincount`; quartiles, IQR outlier bounds and counts, min/max and means
+    are then read off the per-column histograms without sorting. Other columns
+    are partitioned as a column-contiguous block of their own float dtype, one
+    block per dtype. Quartiles use the same linear interpolation as
+    `Series.quantile`, skip missing values the same way and come out in the
+    same dtype (a float32 column with missing values gives float32 quartiles),
+    and the outlier bounds are computed and compared in that dtype, so the
+    results match the per-column pandas computation exactly.
+    """
+
+    def __init__(self, iqr_multiplier: float = 1.5, block_columns: int = 16, max_histogram_ratio: float = 4.0):
+        """
+        :param iqr_multiplier: Outliers lie more than this many IQRs below Q1 or above Q3
+        :param block_columns: Number of columns converted and reduced together
+        :param max_histogram_ratio: Integer columns whose value range exceeds this many times the row count
+                                    are partitioned instead of counted
+        """
+        self.iqr_multiplier = iqr_multiplier
+        self.block_columns = block_columns
+        self.max_histogram_ratio = max_histogram_ratio
+
+    def compute(self, df: pd.DataFrame, columns: Optional[List[str]] = None) -> Dict[str, dict]:
+        """
+        :param df: Data to describe
+        :param columns: Numerical columns to describe, defaults to every numeric column
+        :return: Dictionary of column name to its statistics
+        """
+        try:
+            if columns is None:
+                columns = list(df.select_dtypes(include=[np.number]).columns)
+            if len(df) == 0:
+                raise ValueError("Cannot compute statistics of an empty dataframe")
+            integer_columns = [c for c in columns if pd.api.types.is_integer_dtype(df[c].dtype)]
+            other_columns = {}
+            for c in columns:
+                if c not in integer_columns:
+                    other_columns.setdefault(str(df[c].dtype), []).append(c)
+
+            statistics = {}
+            for start in range(0, len(integer_columns), self.block_columns):
+                statistics.update(self._integer_block(df, integer_columns[start:start + self.block_columns]))
+            for names in other_columns.values():
+                for start in range(0, len(names), self.block_columns):
+                    statistics.update(self._float_block(df, names[start:start + self.block_columns]))
+            return {name: statistics[name] for name in columns}
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def _integer_block(self, df: pd.DataFrame, names: List[str]) -> Dict[str, dict]:
+        n_rows = len(df)
+        # One row per column, so per-column reductions run over contiguous memory
+        block = np.ascontiguousarray(df[names].to_numpy(dtype=np.int64).T)
+        minimum, maximum = block.min(axis=1), block.max(axis=1)
+        sizes = maximum - minimum + 1
+        if sizes.sum() > self.max_histogram_ratio * n_rows * len(names):
+            return self._float_block(df, names)
+
+        # Shift every column onto its own range of bins and count them all in one pass
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        block -= (minimum - offsets)[:, np.newaxis]
+        histogram = np.bincount(block.ravel(), minlength=int(sizes.sum()))
+
+        # Rank of Q1/Q3 in the sorted column, as NumPy's linear method computes it
+        positions = np.array([0.25, 0.75]) * (n_rows - 1)
+        lower_ranks = np.floor(positions)
+        fractions = positions - lower_ranks
+
+        statistics = {}
+        for i, name in enumerate(names):
+            counts = histogram[offsets[i]:offsets[i] + sizes[i]]
+            values = np.arange(minimum[i], maximum[i] + 1, dtype=np.float64)
+            cumulative = np.cumsum(counts)
+            # Value at rank r is the first bin whose cumulative count exceeds r
+            below = values[np.searchsorted(cumulative, lower_ranks, side="right")]
+            above = values[np.searchsorted(cumulative, np.minimum(lower_ranks + 1, n_rows - 1), side="right")]
+            q1, q3 = _lerp(below, above, fractions)
+            iqr = q3 - q1
+            lower_bound = q1 - self.iqr_multiplier * iqr
+            upper_bound = q3 + self.iqr_multiplier * iqr
+            outlier_count = int(counts[(values < lower_bound) | (values > upper_bound)].sum())
+            total = int((counts * np.arange(minimum[i], maximum[i] + 1, dtype=np.int64)).sum())
+            statistics[name] = self._column_statistics(q1, q3, lower_bound, upper_bound, outlier_count, n_rows,
+                                                       null_count=0, minimum=minimum[i], maximum=maximum[i],
+                                                       mean=total / n_rows)
+        return statistics
+
+    def _float_block(self, df: pd.DataFrame, names: List[str]) -> Dict[str, dict]:
+        n_rows = len(df)
+        # A block of float columns stays in their dtype, integer columns are reduced as float64
+        dtype = df[names[0]].dtype
+        if not (isinstance(dtype, np.dtype) and dtype.kind == "f"):
+            dtype = np.dtype(np.float64)
+        block = np.ascontiguousarray(df[names].to_numpy(dtype=dtype).T)
+        null_counts = np.isnan(block).sum(axis=1)
+        # An all-missing column reduces to NaN, like in pandas, without the NumPy warning
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            if null_counts.any():
+                q1, q3 = np.nanquantile(block, [0.25, 0.75], axis=1)
+                minimum, maximum = np.nanmin(block, axis=1), np.nanmax(block, axis=1)
+                mean = np.nanmean(block, axis=1, dtype=np.float64)
+            else:
+                q1, q3 = np.quantile(block, [0.25, 0.75], axis=1)
+                minimum, maximum, mean = block.min(axis=1), block.max(axis=1), block.mean(axis=1, dtype=np.float64)
+
+        statistics = {}
+        for i, name in enumerate(names):
+            column_q1, column_q3 = q1[i], q3[i]
+            if null_counts[i]:
+                # pandas casts the quartiles of a column with missing values back to the column dtype
+                column_q1, column_q3 = dtype.type(column_q1), dtype.type(column_q3)
+            # Scalar arithmetic and comparisons as in the per-column loop, so the bounds round the same way
+            iqr = column_q3 - column_q1
+            lower_bound = column_q1 - self.iqr_multiplier * iqr
+            upper_bound = column_q3 + self.iqr_multiplier * iqr
+            outlier_count = ((block[i] < lower_bound) | (block[i] > upper_bound)).sum()
+            statistics[name] = self._column_statistics(column_q1, column_q3, lower_bound, upper_bound, outlier_count,
+                                                       n_rows, null_count=null_counts[i], minimum=minimum[i],
+                                                       maximum=maximum[i], mean=mean[i])
+        return statistics
+
+    @staticmethod
+    def _column_statistics(q1, q3, lower_bound, upper_bound, outlier_count, n_rows, null_count, minimum, maximum,
+                           mean) -> dict:
+        return {
+            "lower_bound": float(lower_bound),
+            "upper_bound": float(upper_bound),
+            "outlier_count": int(outlier_count),
+            "outlier_percentage": float(outlier_count / n_rows * 100),
+            "Q1": float(q1),
+            "Q3": float(q3),
+            "IQR": float(q3 - q1),
+            "null_count": int(null_count),
+            "min": float(minimum),
+            "max": float(maximum),
+            "mean": float(mean),
+        }
+
+    def from_sketches(self, sketches: dict) -> Dict[str, dict]:
+        """
+        Approximate the statistics of `compute` from per-column quantile sketches of data
+        that was streamed rather than loaded. Quartiles and outlier counts carry the
+        sketches' rank error; null counts, min, max and means are exact
+        :param sketches: Dictionary of column name to `KLLSketch`
+        :return: Dictionary of column name to its statistics
+        """
+        try:
+            statistics = {}
+            for name, sketch in sketches.items():
+                n_rows = sketch.n + sketch.null_count
+                if n_rows == 0:
+                    raise ValueError(f"Cannot compute statistics of empty column {name}")
+                q1, q3 = sketch.quantile([0.25, 0.75])
+                iqr = q3 - q1
+                lower_bound = q1 - self.iqr_multiplier * iqr
+                upper_bound = q3 + self.iqr_multiplier * iqr
+                statistics[name] = self._column_statistics(
+                    q1, q3, lower_bound, upper_bound, sketch.count_outside(lower_bound, upper_bound), n_rows,
+                    null_count=sketch.null_count, minimum=sketch.min if sketch.n else np.nan,
+                    maximum=sketch.max if sketch.n else np.nan, mean=sketch.sum / sketch.n if sketch.n else np.nan)
+            return statistics
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    @staticmethod
+    def outlier_report(statistics: Dict[str, dict]) -> Dict[str, dict]:
+        """The outlier fields of `compute`'s result, in the layout of outlier_report.yaml"""
+        return {name: {key: column[key] for key in OUTLIER_REPORT_KEYS} for name, column in statistics.items()}
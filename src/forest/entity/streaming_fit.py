@@ -0,0 +1,265 @@
+import sys
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from src.forest.exception import ForestException
+from src.forest.entity.quantile_sketch import KLLSketch
+
+
+def _columns(values: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    """Some columns of a 2D array, without a copy when they are all of them"""
+    return values if len(columns) == values.shape[1] else values[:, columns]
+
+
+class RunningMoments:
+    """
+    Count, mean and sum of squared deviations (M2) of columns, merged chunk by chunk.
+
+    Each chunk's moments are computed in float64 around its own mean and folded
+    into the running ones with the pairwise update of Chan, Golub and LeVeque,
+    the batched form of Welford's algorithm, so the variance does not lose
+    precision to a large mean the way sum-of-squares does. Moments of disjoint
+    shards merge the same way. Missing values are not counted.
+
+    The pairwise update still rounds differently depending on where chunks and
+    shards start. Columns holding only integers, as every covtype feature does,
+    are instead summed exactly: a chunk's sum and sum of squares are exact in
+    float64 while the squares add up to less than 2**53, and are accumulated as
+    Python integers. Their mean and variance are rounded once from those sums,
+    so they come out the same however the rows are cut, and as close as float64
+    allows. A column switches to the pairwise update for good at the first
+    chunk that is not exact.
+    """
+
+    def __init__(self, n_columns: int):
+        self.count = np.zeros(n_columns, dtype=np.int64)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        # Columns summed exactly, their mean kept rounded from `sums`; `m2` only holds for the other columns
+        self.exact = np.ones(n_columns, dtype=bool)
+        self.sums = [0] * n_columns
+        self.squares = [0] * n_columns
+
+    def _fold(self, count: np.ndarray, mean: np.ndarray, m2: np.ndarray) -> None:
+        total = self.count + count
+        merged = count > 0
+        delta = np.where(merged, mean - self.mean, 0.0)
+        share = np.divide(count, total, out=np.zeros(len(total)), where=merged)
+        self.mean = self.mean + delta * share
+        self.m2 = self.m2 + np.where(merged, m2, 0.0) + delta ** 2 * self.count * share
+        self.count = total
+
+    def _add_exact(self, columns: np.ndarray, count: np.ndarray, sums, squares) -> None:
+        for i, n, total, square in zip(columns.tolist(), count.tolist(), sums, squares):
+            self.count[i] += n
+            self.sums[i] += int(total)
+            self.squares[i] += int(square)
+            if self.count[i]:
+                self.mean[i] = self.sums[i] / int(self.count[i])
+
+    def _exact_m2(self, i: int) -> float:
+        n = int(self.count[i])
+        return (n * self.squares[i] - self.sums[i] ** 2) / n if n else 0.0
+
+    def _to_pairwise(self, columns: np.ndarray) -> None:
+        """Carry on with the pairwise update for these columns, from their exact moments"""
+        for i in columns[self.exact[columns]].tolist():
+            self.m2[i] = self._exact_m2(i)
+            self.exact[i] = False
+
+    def merge_moments(self, count: np.ndarray, mean: np.ndarray, m2: np.ndarray) -> "RunningMoments":
+        """Fold in the moments of other values of the same columns"""
+        self._to_pairwise(np.flatnonzero(count > 0))
+        self._fold(count, mean, m2)
+        return self
+
+    def update(self, values: np.ndarray) -> "RunningMoments":
+        """Add a chunk of rows, a 2D float array with NaN for missing values"""
+        missing = np.isnan(values)
+        has_missing = missing.any()
+        count = len(values) - missing.sum(axis=0)
+
+        columns = np.flatnonzero(self.exact)
+        summed = np.zeros(len(self.exact), dtype=bool)
+        if columns.size:
+            block = _columns(values, columns)
+            if has_missing:
+                block = np.where(_columns(missing, columns), 0.0, block)
+            bound = np.sqrt(2.0 ** 53 / max(len(values), 1))
+            exact = ((np.rint(block) == block).all(axis=0)
+                     & (block.max(axis=0, initial=0.0) < bound) & (block.min(axis=0, initial=0.0) > -bound))
+            block = _columns(block, np.flatnonzero(exact))
+            self._add_exact(columns[exact], count[columns[exact]], block.sum(axis=0).tolist(),
+                            np.einsum("ij,ij->j", block, block).tolist())
+            self._to_pairwise(columns[~exact])
+            summed[columns[exact]] = True
+
+        pairwise = np.flatnonzero(~summed)
+        if pairwise.size:
+            block = _columns(values, pairwise)
+            chunk_count = np.zeros(len(self.count), dtype=np.int64)
+            chunk_mean, chunk_m2 = np.zeros(len(self.count)), np.zeros(len(self.count))
+            chunk_count[pairwise] = count[pairwise]
+            if has_missing:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    mean = np.nansum(block, axis=0) / count[pairwise]
+                chunk_m2[pairwise] = np.nansum((block - mean) ** 2, axis=0)
+            else:
+                mean = block.mean(axis=0)
+                chunk_m2[pairwise] = ((block - mean) ** 2).sum(axis=0)
+            chunk_mean[pairwise] = mean
+            self._fold(chunk_count, chunk_mean, chunk_m2)
+        return self
+
+    def merge(self, other: "RunningMoments") -> "RunningMoments":
+        exact = self.exact & other.exact
+        self._to_pairwise(np.flatnonzero(~exact))
+        columns = np.flatnonzero(exact)
+        self._add_exact(columns, other.count[columns], [other.sums[i] for i in columns.tolist()],
+                        [other.squares[i] for i in columns.tolist()])
+        m2 = np.array([other._exact_m2(i) if other.exact[i] else other.m2[i] for i in range(len(other.m2))])
+        self._fold(np.where(exact, 0, other.count), other.mean, m2)
+        return self
+
+    def add_repeated(self, count: np.ndarray, value: np.ndarray) -> "RunningMoments":
+        """Add `count` copies of `value` to each column, exactly when the value is an integer"""
+        added = count > 0
+        exact = self.exact & added & (np.rint(value) == value)
+        self._to_pairwise(np.flatnonzero(added & ~exact))
+        columns = np.flatnonzero(exact)
+        self._add_exact(columns, count[columns], [int(count[i]) * int(value[i]) for i in columns.tolist()],
+                        [int(count[i]) * int(value[i]) ** 2 for i in columns.tolist()])
+        self._fold(np.where(exact, 0, count), value, np.zeros(len(count)))
+        return self
+
+    def take(self, index: List[int]) -> "RunningMoments":
+        """Copy of the moments of some of the columns"""
+        moments = RunningMoments(len(index))
+        moments.count, moments.mean, moments.m2 = self.count[index], self.mean[index], self.m2[index]
+        moments.exact = self.exact[index]
+        moments.sums = [self.sums[i] for i in index]
+        moments.squares = [self.squares[i] for i in index]
+        return moments
+
+    @property
+    def var(self) -> np.ndarray:
+        """Population variance, as StandardScaler computes it"""
+        var = np.divide(self.m2, self.count, out=np.zeros(len(self.m2)), where=self.count > 0)
+        for i in np.flatnonzero(self.exact & (self.count > 0)).tolist():
+            n = int(self.count[i])
+            var[i] = (n * self.squares[i] - self.sums[i] ** 2) / (n * n)
+        return var
+
+
+class StreamingFit:
+    """
+    Fit statistics of the numeric pipelines of a ColumnTransformer, gathered a
+    chunk of rows at a time.
+
+    Every column gets running moments, for the scaler's mean and variance and the
+    imputer's mean, and a `KLLSketch`, for the imputer's median, so the training
+    data never has to be in memory at once. Fits of disjoint shards `merge` into
+    the fit of their union. `apply` writes the statistics into a ColumnTransformer
+    fitted on a sample, which supplies the sklearn structure; the result
+    transforms like one fitted on all rows, up to the sketch's rank error in the
+    medians.
+
+    The scaler of an imputer-then-scaler pipeline is fitted on imputed values:
+    the missing values of a column all become its median, so they are merged into
+    its moments at the end as that many copies of the median, which is exact.
+    """
+
+    def __init__(self, columns: List[str], k: int = 1000, seed: Optional[int] = None):
+        """
+        :param columns: Columns to gather statistics of
+        :param k: Accuracy parameter of the median sketches
+        :param seed: Seed of the sketches' compaction offsets
+        """
+        self.columns = list(columns)
+        self.rows = 0
+        self.moments = RunningMoments(len(self.columns))
+        self.sketches = {column: KLLSketch(k=k, seed=seed) for column in self.columns}
+
+    def update(self, chunk: pd.DataFrame) -> "StreamingFit":
+        try:
+            values = chunk[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.moments.update(values)
+            for i, column in enumerate(self.columns):
+                self.sketches[column].update(values[:, i])
+            self.rows += len(chunk)
+            return self
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def merge(self, other: "StreamingFit") -> "StreamingFit":
+        try:
+            self.rows += other.rows
+            self.moments.merge(other.moments)
+            for column in self.columns:
+                self.sketches[column].merge(other.sketches[column])
+            return self
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    @staticmethod
+    def _steps(transformer) -> list:
+        steps = [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+        return [step for step in steps if isinstance(step, (SimpleImputer, StandardScaler))]
+
+    @classmethod
+    def fitted_columns(cls, preprocessor: ColumnTransformer) -> List[str]:
+        """Input columns of the transformers of a fitted ColumnTransformer that hold an imputer or scaler"""
+        return [column for _, transformer, columns in preprocessor.transformers_ if cls._steps(transformer)
+                for column in columns]
+
+    @staticmethod
+    def _is_constant(var: np.ndarray, mean: np.ndarray, n_samples: np.ndarray) -> np.ndarray:
+        # StandardScaler's bound on the rounding error of a computed variance
+        eps = np.finfo(np.float64).eps
+        return var <= n_samples * eps * var + (n_samples * mean * eps) ** 2
+
+    def apply(self, preprocessor: ColumnTransformer) -> ColumnTransformer:
+        """
+        :param preprocessor: ColumnTransformer fitted on a sample of the same columns
+        :return: The preprocessor, its imputer and scaler statistics replaced by the streamed ones
+        """
+        try:
+            position = {column: i for i, column in enumerate(self.columns)}
+            for name, transformer, columns in preprocessor.transformers_:
+                steps = self._steps(transformer)
+                if not steps:
+                    continue
+                moments = self.moments.take([position[column] for column in columns])
+                imputed = False
+                for step in steps:
+                    if isinstance(step, SimpleImputer):
+                        if step.strategy == "median":
+                            statistics = np.array([self.sketches[column].quantile(0.5) for column in columns])
+                        elif step.strategy == "mean":
+                            statistics = np.where(moments.count > 0, moments.mean, np.nan)
+                        else:
+                            raise ValueError(f"Cannot stream the fit of a {step.strategy} imputer")
+                        step.statistics_ = statistics
+                        # Every missing value becomes the fill value before the scaler sees it
+                        moments.add_repeated(self.rows - moments.count, np.nan_to_num(statistics))
+                        imputed = True
+                    else:
+                        count, mean, var = moments.count, moments.mean, moments.var
+                        n_samples = count if not imputed else np.full(len(columns), self.rows)
+                        step.n_samples_seen_ = int(n_samples[0]) if (n_samples == n_samples[0]).all() \
+                            else n_samples.astype(np.int64)
+                        step.mean_ = mean
+                        if step.with_std:
+                            step.var_ = var
+                            step.scale_ = np.where(self._is_constant(var, mean, n_samples), 1.0, np.sqrt(var))
+                        else:
+                            step.var_ = step.scale_ = None
+            return preprocessor
+        except Exception as e:
+            raise ForestException(e, sys) from e
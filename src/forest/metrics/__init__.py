@@ -0,0 +1,213 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Prometheus client defaults, in seconds
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    type_name = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observations over cumulative buckets, plus their sum and count"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            items = [(key, list(state["buckets"]), state["sum"], state["count"]) for key, state in self._values.items()]
+        for key, bucket_counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                yield (f"{self.name}_bucket",
+                       _format_labels(self.labelnames + ("le",), key + (_format_value(bound),)), cumulative)
+            yield f"{self.name}_sum", _format_labels(self.labelnames, key), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, key), count
+
+
+class MetricsRegistry:
+    """Holds every metric of the process and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+metrics_registry = MetricsRegistry()
+
+STAGE_DURATION = metrics_registry.histogram(
+    "forest_stage_duration_seconds", "Wall-clock duration of a pipeline stage", ("pipeline", "stage"))
+STAGE_FAILURES = metrics_registry.counter(
+    "forest_stage_failures_total", "Pipeline stages that raised an exception", ("pipeline", "stage"))
+ROWS_SCORED = metrics_registry.counter(
+    "forest_rows_scored_total", "Feature rows scored by a model", ("source",))
+BATCH_SIZE = metrics_registry.histogram(
+    "forest_batch_size_rows", "Rows per model call", ("source",), buckets=BATCH_SIZE_BUCKETS)
+PREDICTION_CACHE_REQUESTS = metrics_registry.counter(
+    "forest_prediction_cache_requests_total", "Rows looked up in the prediction cache", ("result",))
+MODEL_INFO = metrics_registry.gauge(
+    "forest_model_info", "Model version currently served (value is always 1)", ("version",))
+
+
+@contextmanager
+def stage_timer(pipeline: str, stage: str):
+    """Record the duration of the enclosed block as `stage` of `pipeline`; failures are counted too"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_FAILURES.inc(pipeline=pipeline, stage=stage)
+        raise
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - start, pipeline=pipeline, stage=stage)
+
+
+def timed(pipeline: str, stage: Optional[str] = None):
+    """Decorator form of `stage_timer`; the stage defaults to the function name"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(pipeline, stage or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_batch(source: str, rows: int) -> None:
+    """Count one model call over `rows` rows"""
+    ROWS_SCORED.inc(rows, source=source)
+    BATCH_SIZE.observe(rows, source=source)
+
+
+def set_model_version(version: Optional[str]) -> None:
+    MODEL_INFO.clear()
+    if version is not None:
+        MODEL_INFO.set(1, version=version)
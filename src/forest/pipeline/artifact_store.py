@@ -0,0 +1,229 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from src.forest.constant.training_pipeline import ARTIFACT_STORE_KEEP_RUNS, ARTIFACT_STORE_MAX_UNUSED_DAYS
+from src.forest.entity.config_entity import training_pipeline_config
+from src.forest.pipeline.model_registry import file_version
+
+logger = logging.getLogger(__name__)
+
+
+def _to_artifact(artifact_type, values: dict):
+    """Rebuild a (possibly nested) artifact dataclass from its `dataclasses.asdict` form"""
+    if artifact_type is None or not dataclasses.is_dataclass(artifact_type):
+        return values
+    kwargs = {}
+    for field in dataclasses.fields(artifact_type):
+        # Entries stored before a field with a default was added leave it at the default
+        if field.name not in values and field.default is not dataclasses.MISSING:
+            continue
+        value = values[field.name]
+        kwargs[field.name] = _to_artifact(field.type, value) if isinstance(value, dict) else value
+    return artifact_type(**kwargs)
+
+
+def _to_values(artifact) -> dict:
+    """`dataclasses.asdict` of an artifact without its run-only fields, such as the in-memory dataset context"""
+    values = {}
+    for field in dataclasses.fields(artifact):
+        if not field.metadata.get("persist", True):
+            continue
+        value = getattr(artifact, field.name)
+        values[field.name] = _to_values(value) if dataclasses.is_dataclass(value) else value
+    return values
+
+
+class ArtifactStore:
+    """
+    Content-addressed index of pipeline stage outputs.
+
+    A stage's key is the hash of its input files' contents and its config. The
+    entry for a key is a JSON manifest holding the artifact the stage returned;
+    the files it points to stay in the run directory (`artifact/<TIMESTAMP>`)
+    that produced them. A rerun whose inputs and config are unchanged gets the
+    earlier artifact back instead of recomputing it, and since downstream keys
+    hash the upstream output files, a changed input invalidates everything
+    after it.
+
+    Entries are dropped explicitly with `invalidate`, and `collect_garbage`
+    deletes old run directories that no live entry points into.
+    """
+
+    MANIFEST_SUFFIX = ".json"
+
+    def __init__(self, store_dir: str = training_pipeline_config.artifact_store_dir,
+                 runs_dir: Optional[str] = None):
+        """
+        :param store_dir: Directory holding one manifest directory per stage
+        :param runs_dir: Directory holding the timestamped run directories, defaults to the parent of `store_dir`
+        """
+        self.store_dir = store_dir
+        self.runs_dir = runs_dir or os.path.dirname(os.path.abspath(store_dir))
+        self._lock = threading.Lock()
+        self._digests: Dict[tuple, str] = {}
+
+    def _manifest_path(self, stage: str, key: str) -> str:
+        return os.path.join(self.store_dir, stage, key + self.MANIFEST_SUFFIX)
+
+    def file_digest(self, file_path: str) -> str:
+        """Content hash of a file, remembered while its size and mtime are unchanged"""
+        stat = os.stat(file_path)
+        stamp = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(stamp)
+        if digest is None:
+            digest = file_version(file_path)
+            with self._lock:
+                self._digests[stamp] = digest
+        return digest
+
+    def key(self, stage: str, files: Iterable[str] = (), params: Optional[dict] = None) -> str:
+        """
+        :param stage: Stage name, part of the key so stages with equal inputs do not collide
+        :param files: Input files, hashed by content (a missing file hashes as missing)
+        :param params: JSON-serializable config values that change the stage's output
+        :return: Hex key of the stage run
+        """
+        payload = {
+            "stage": stage,
+            "files": [self.file_digest(path) if os.path.exists(path) else None for path in files],
+            "params": params or {},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+    def fetch(self, stage: str, key: str, artifact_type=None):
+        """
+        Return the stored artifact for `key`, or None when there is no entry or one of
+        the files it recorded has since been removed
+        :param artifact_type: Artifact dataclass to rebuild; the stored dict is returned when omitted
+        """
+        manifest_path = self._manifest_path(stage, key)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        missing = [path for path in manifest.get("files", []) if not os.path.exists(path)]
+        if missing:
+            logger.info(f"Artifact store entry {stage}/{key} is stale, missing {missing}")
+            self._remove(manifest_path)
+            return None
+
+        # The manifest's mtime records the last use, which garbage collection goes by
+        os.utime(manifest_path)
+        logger.info(f"Reusing {stage} artifact {key} created at {manifest.get('created_at')}")
+        return _to_artifact(artifact_type, manifest["artifact"])
+
+    def put(self, stage: str, key: str, artifact) -> None:
+        """Record `artifact` (a dataclass or dict) as the output of the stage run `key`"""
+        values = _to_values(artifact) if dataclasses.is_dataclass(artifact) else dict(artifact)
+        manifest = {
+            "stage": stage,
+            "key": key,
+            "artifact": values,
+            "files": sorted(self._existing_paths(values)),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        manifest_path = self._manifest_path(stage, key)
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        # Written to a temporary file and renamed so a concurrent reader never sees a partial manifest
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, default=str)
+        os.replace(tmp_path, manifest_path)
+        logger.info(f"Stored {stage} artifact {key}")
+
+    def _existing_paths(self, values: dict) -> List[str]:
+        paths = []
+        for value in values.values():
+            if isinstance(value, dict):
+                paths.extend(self._existing_paths(value))
+            elif isinstance(value, str) and os.path.isfile(value):
+                paths.append(os.path.abspath(value))
+        return paths
+
+    def _manifests(self, stage: Optional[str] = None) -> List[str]:
+        stages = [stage] if stage is not None else (os.listdir(self.store_dir) if os.path.isdir(self.store_dir) else [])
+        paths = []
+        for name in stages:
+            stage_dir = os.path.join(self.store_dir, name)
+            if os.path.isdir(stage_dir):
+                paths.extend(os.path.join(stage_dir, file_name) for file_name in os.listdir(stage_dir)
+                             if file_name.endswith(self.MANIFEST_SUFFIX))
+        return paths
+
+    @staticmethod
+    def _remove(manifest_path: str) -> None:
+        try:
+            os.remove(manifest_path)
+        except FileNotFoundError:
+            pass
+
+    def invalidate(self, stage: Optional[str] = None, key: Optional[str] = None) -> int:
+        """
+        Drop entries so the next run recomputes them: one entry, every entry of a stage,
+        or the whole store when no stage is given
+        :return: Number of entries removed
+        """
+        if key is not None:
+            manifest_paths = [self._manifest_path(stage, key)] if os.path.exists(self._manifest_path(stage, key)) else []
+        else:
+            manifest_paths = self._manifests(stage)
+        for manifest_path in manifest_paths:
+            self._remove(manifest_path)
+        logger.info(f"Invalidated {len(manifest_paths)} artifact store entries (stage={stage}, key={key})")
+        return len(manifest_paths)
+
+    def collect_garbage(self, keep_runs: int = ARTIFACT_STORE_KEEP_RUNS,
+                        max_unused_days: float = ARTIFACT_STORE_MAX_UNUSED_DAYS,
+                        active_run_dir: Optional[str] = training_pipeline_config.artifact_dir) -> List[str]:
+        """
+        Drop entries unused for `max_unused_days`, then delete every run directory that is
+        neither among the `keep_runs` most recent nor referenced by a remaining entry
+        :param active_run_dir: Run directory of the current process, never deleted
+        :return: Run directories removed
+        """
+        cutoff = time.time() - max_unused_days * 86400
+        referenced = set()
+        for manifest_path in self._manifests():
+            try:
+                if os.path.getmtime(manifest_path) < cutoff:
+                    self._remove(manifest_path)
+                    continue
+                with open(manifest_path) as f:
+                    files = json.load(f).get("files", [])
+            except (FileNotFoundError, ValueError):
+                continue
+            for path in files:
+                relative = os.path.relpath(path, self.runs_dir)
+                if not relative.startswith(os.pardir):
+                    referenced.add(relative.split(os.sep)[0])
+
+        if not os.path.isdir(self.runs_dir):
+            return []
+        store_name = os.path.basename(os.path.abspath(self.store_dir))
+        run_dirs = [os.path.join(self.runs_dir, name) for name in os.listdir(self.runs_dir)
+                    if name != store_name and os.path.isdir(os.path.join(self.runs_dir, name))]
+        # Run directory names are month-first timestamps, so recency goes by mtime
+        run_dirs.sort(key=os.path.getmtime, reverse=True)
+
+        removed = []
+        for run_dir in run_dirs[keep_runs:]:
+            if os.path.basename(run_dir) in referenced or (
+                    active_run_dir is not None and os.path.abspath(run_dir) == os.path.abspath(active_run_dir)):
+                continue
+            shutil.rmtree(run_dir, ignore_errors=True)
+            removed.append(run_dir)
+        logger.info(f"Artifact store garbage collection removed {len(removed)} run directories")
+        return removed
+
+
+artifact_store = ArtifactStore()
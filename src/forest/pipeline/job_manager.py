@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from src.forest.constant.application import JOB_MAX_WORKERS, JOB_HISTORY_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class JobState:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    coalesce_key: Optional[str] = None
+    state: str = JobState.QUEUED
+    stage: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set_stage(self, stage: str) -> None:
+        logger.info(f"Job {self.job_id} ({self.kind}) entered stage: {stage}")
+        self.stage = stage
+
+    @property
+    def is_active(self) -> bool:
+        return self.state in (JobState.QUEUED, JobState.RUNNING)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - self.started_at
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "state": self.state,
+            "stage": self.stage,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs long pipeline work (training, batch prediction) on a worker pool so
+    request handlers can return a job id immediately.
+
+    Submissions sharing a `coalesce_key` while a job with that key is still
+    queued or running are attached to the existing job instead of starting a
+    duplicate.
+    """
+
+    def __init__(self, max_workers: int = JOB_MAX_WORKERS, history_size: int = JOB_HISTORY_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="forest-job")
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active_by_key: Dict[str, str] = {}
+
+    def submit(self, kind: str, fn: Callable[[Job], Optional[dict]], coalesce_key: Optional[str] = None) -> Job:
+        """
+        :param kind: Job type reported back to callers, e.g. "train"
+        :param fn: Work to run; receives the Job to report stages on and returns the result artifacts
+        :param coalesce_key: Identical submissions share one job while it is active
+        :return: The new job, or the already active job with the same coalesce_key
+        """
+        with self._lock:
+            if coalesce_key is not None and coalesce_key in self._active_by_key:
+                job = self._jobs[self._active_by_key[coalesce_key]]
+                logger.info(f"Coalesced {kind} submission onto active job {job.job_id}")
+                return job
+
+            job = Job(job_id=uuid.uuid4().hex, kind=kind, coalesce_key=coalesce_key)
+            self._jobs[job.job_id] = job
+            if coalesce_key is not None:
+                self._active_by_key[coalesce_key] = job.job_id
+            self._evict()
+
+        self._executor.submit(self._run, job, fn)
+        logger.info(f"Submitted {kind} job {job.job_id}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn: Callable[[Job], Optional[dict]]) -> None:
+        job.started_at = time.time()
+        job.state = JobState.RUNNING
+        try:
+            job.result = fn(job) or {}
+            job.state = JobState.SUCCEEDED
+        except Exception as e:
+            logger.error(f"Job {job.job_id} ({job.kind}) failed in stage {job.stage}: {str(e)}")
+            job.error = str(e)
+            job.state = JobState.FAILED
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if job.coalesce_key is not None and self._active_by_key.get(job.coalesce_key) == job.job_id:
+                    del self._active_by_key[job.coalesce_key]
+            logger.info(f"Job {job.job_id} ({job.kind}) finished as {job.state} in {job.elapsed_seconds:.2f}s")
+
+    def _evict(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_size)]:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+job_manager = JobManager()
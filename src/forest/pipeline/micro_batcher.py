@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import pandas as pd
+
+from src.forest.constant.application import PREDICT_MAX_BATCH_SIZE, PREDICT_MAX_WAIT_MS
+from src.forest.metrics import STAGE_DURATION, record_batch
+from src.forest.pipeline.model_registry import ModelRegistry, model_registry
+from src.forest.pipeline.prediction_cache import PredictionCache, prediction_cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingRequest:
+    frame: pd.DataFrame
+    future: asyncio.Future
+    enqueued_at: float
+
+
+@dataclass
+class BatchResult:
+    predictions: list
+    model_version: str
+    queue_time_ms: float
+    batch_rows: int
+
+
+class MicroBatcher:
+    """
+    Merges concurrent scoring requests into micro-batches.
+
+    Requests are collected until either `max_batch_size` rows are queued or
+    `max_wait_ms` has passed since the first request of the batch, then the
+    whole batch goes through a single model call off the event loop.
+    """
+
+    def __init__(self, registry: ModelRegistry = model_registry,
+                 max_batch_size: int = PREDICT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = PREDICT_MAX_WAIT_MS,
+                 cache: Optional[PredictionCache] = prediction_cache):
+        self.registry = registry
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+            logger.info(f"Micro-batcher started (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait_ms})")
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, frame: pd.DataFrame) -> BatchResult:
+        """Queue `frame` for scoring and wait for its slice of the batch result"""
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingRequest(frame=frame, future=future, enqueued_at=time.perf_counter()))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            rows = len(batch[0].frame)
+            deadline = loop.time() + self.max_wait_ms / 1000
+            while rows < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(pending)
+                rows += len(pending.frame)
+            await self._score(batch)
+
+    async def _score(self, batch: List[_PendingRequest]) -> None:
+        dispatched_at = time.perf_counter()
+        try:
+            entry = self.registry.get()
+            if entry is None:
+                raise RuntimeError("No trained model is loaded")
+            frame = pd.concat([pending.frame for pending in batch], ignore_index=True)
+            if self.cache is None:
+                predict = entry.predict
+            else:
+                predict = lambda data: self.cache.predict(data, entry.version, entry.predict)
+            predictions = await asyncio.get_running_loop().run_in_executor(None, predict, frame)
+        except Exception as e:
+            logger.error(f"Error scoring micro-batch of {len(batch)} requests: {str(e)}")
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        record_batch("online", len(frame))
+        for pending in batch:
+            STAGE_DURATION.observe(dispatched_at - pending.enqueued_at, pipeline="online", stage="queue")
+        STAGE_DURATION.observe(time.perf_counter() - dispatched_at, pipeline="online", stage="score")
+        logger.info(f"Scored micro-batch of {len(batch)} requests / {len(frame)} rows with model {entry.version}")
+        offset = 0
+        for pending in batch:
+            size = len(pending.frame)
+            if not pending.future.done():
+                pending.future.set_result(BatchResult(
+                    predictions=predictions[offset:offset + size].tolist(),
+                    model_version=entry.version,
+                    queue_time_ms=(dispatched_at - pending.enqueued_at) * 1000,
+                    batch_rows=len(frame),
+                ))
+            offset += size
+
+
+micro_batcher = MicroBatcher()
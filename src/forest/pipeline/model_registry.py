@@ -0,0 +1,309 @@
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.forest.constant.application import (MODEL_FILE_PATH, SCALER_FILE_PATH, MODEL_VERSIONS_DIR,
+                                             CURRENT_MODEL_FILE_PATH, MODEL_REGISTRY_MAX_VERSIONS,
+                                             COMPILED_FOREST_FILE_PATH, COMPILED_FOREST_MAX_ROWS,
+                                             COMPILED_FOREST_BUNDLE_NAME, MODEL_SERVING_FORMAT)
+from src.forest.entity.compiled_forest import CompiledForest
+from src.forest.metrics import set_model_version, stage_timer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LoadedModel:
+    """A model (and optional scaler) held in memory under a content version"""
+    version: str
+    model: object
+    scaler: object = None
+    model_path: Optional[str] = None
+    compiled: Optional[CompiledForest] = None
+    loaded_at: float = field(default_factory=time.time)
+
+    def predict(self, data):
+        """Scale (when a scaler is present) and predict in one call"""
+        if self.scaler is not None:
+            with stage_timer("serving", "transform"):
+                data = self.scaler.transform(data)
+        with stage_timer("serving", "predict"):
+            # The array engine wins on small batches; sklearn's compiled traversal wins on large ones.
+            # Without an unpickled model (mmap serving) the engine handles every batch.
+            if self.compiled is not None and (self.model is None or len(data) <= COMPILED_FOREST_MAX_ROWS):
+                return self.compiled.predict(data)
+            return self.model.predict(data)
+
+    def synthetic_row(self):
+        """Build a single all-zero row shaped like the model's expected input"""
+        fitted = self.scaler if self.scaler is not None else getattr(self.model, "preprocessing_object", self.model)
+        feature_names = getattr(fitted, "feature_names_in_", None)
+        if feature_names is not None:
+            return pd.DataFrame(np.zeros((1, len(feature_names))), columns=list(feature_names))
+        n_features = getattr(fitted, "n_features_in_", None)
+        if n_features is None:
+            return None
+        return np.zeros((1, n_features))
+
+
+def model_version(*contents: bytes) -> str:
+    """
+    Version a model by the hash of its serialized bytes followed by those of the scaler it is
+    served with, so a new scaler next to an unchanged model is a new version
+    """
+    digest = hashlib.sha256()
+    for content in contents:
+        digest.update(content)
+    return digest.hexdigest()[:12]
+
+
+def file_version(file_path: str, *contents: bytes, block_size: int = 1 << 20) -> str:
+    """Same version as `model_version(<file bytes>, *contents)`, the file hashed in blocks without holding it in memory"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    for content in contents:
+        digest.update(content)
+    return digest.hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class ModelArtifacts:
+    """Files saved for one model; `version` and `bundle_path` are only known for a published version directory"""
+    model_path: str
+    scaler_path: str
+    compiled_path: str
+    bundle_path: Optional[str] = None
+    version: Optional[str] = None
+
+    @classmethod
+    def in_dir(cls, version_dir: str, version: Optional[str] = None) -> "ModelArtifacts":
+        """Layout of a version directory, the same file names as the legacy flat layout"""
+        return cls(model_path=os.path.join(version_dir, os.path.basename(MODEL_FILE_PATH)),
+                   scaler_path=os.path.join(version_dir, os.path.basename(SCALER_FILE_PATH)),
+                   compiled_path=os.path.join(version_dir, os.path.basename(COMPILED_FOREST_FILE_PATH)),
+                   bundle_path=os.path.join(version_dir, COMPILED_FOREST_BUNDLE_NAME), version=version)
+
+
+def read_current_version(current_path: Optional[str] = CURRENT_MODEL_FILE_PATH) -> Optional[str]:
+    """Version named by the pointer file, None when no version was published or there is no pointer"""
+    if current_path is None:
+        return None
+    try:
+        with open(current_path) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class ModelRegistry:
+    """
+    Process-wide store of loaded models, keyed by version.
+
+    Routes read the active entry instead of unpickling the model on every request.
+    Swapping the active version is a single reference assignment under a lock,
+    so callers that already hold an entry keep using it until they are done.
+
+    The model served is the version named by the `current_path` pointer file,
+    read from its directory under `versions_dir`; without a pointer (or with
+    `current_path=None`) the legacy flat model, scaler and compiled files are read instead.
+    """
+
+    def __init__(self, model_path: str = MODEL_FILE_PATH, scaler_path: str = SCALER_FILE_PATH,
+                 compiled_path: str = COMPILED_FOREST_FILE_PATH,
+                 current_path: Optional[str] = CURRENT_MODEL_FILE_PATH, versions_dir: str = MODEL_VERSIONS_DIR,
+                 serving_format: str = MODEL_SERVING_FORMAT, max_versions: int = MODEL_REGISTRY_MAX_VERSIONS):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.compiled_path = compiled_path
+        self.current_path = current_path
+        self.versions_dir = versions_dir
+        self.serving_format = serving_format
+        self.max_versions = max(1, max_versions)
+        self._lock = threading.Lock()
+        self._models = OrderedDict()
+        self._active: Optional[LoadedModel] = None
+
+    @property
+    def active_version(self) -> Optional[str]:
+        active = self._active
+        return None if active is None else active.version
+
+    def versions(self) -> List[str]:
+        with self._lock:
+            return list(self._models.keys())
+
+    def get(self, version: Optional[str] = None) -> Optional[LoadedModel]:
+        """Return the entry for `version`, or the active entry when no version is given"""
+        if version is None:
+            return self._active
+        with self._lock:
+            return self._models.get(version)
+
+    @property
+    def watch_path(self) -> str:
+        """File that changes when a new model is published: the pointer, or the legacy model file"""
+        if self.current_path is not None and os.path.exists(self.current_path):
+            return self.current_path
+        return self.model_path
+
+    def artifacts(self) -> ModelArtifacts:
+        """Files of the published version, or the legacy flat files when none was published"""
+        version = read_current_version(self.current_path)
+        if version is None:
+            return ModelArtifacts(model_path=self.model_path, scaler_path=self.scaler_path,
+                                  compiled_path=self.compiled_path)
+        return ModelArtifacts.in_dir(os.path.join(self.versions_dir, version), version=version)
+
+    def load_from_disk(self) -> Optional[LoadedModel]:
+        """Unpickle the model (and scaler, if saved) from disk without registering it"""
+        artifacts = self.artifacts()
+        if not os.path.exists(artifacts.model_path):
+            logger.warning(f"Model file not found at {artifacts.model_path}")
+            return None
+
+        # A published version directory is never rewritten, so its name is the version of its files
+        version = artifacts.version
+        if version is not None:
+            existing = self.get(version)
+            if existing is not None:
+                return existing
+
+        # The scaler is read once, so the version hashes exactly the scaler that is served
+        scaler_content = self._read_scaler(artifacts.scaler_path)
+        if self.serving_format == "mmap":
+            if version is not None and self._compiled_engine(artifacts.bundle_path, version) is not None:
+                return self._load_mmap(artifacts, scaler_content)
+            logger.warning(f"No compiled forest bundle next to {artifacts.model_path}; falling back to the pickle")
+
+        with open(artifacts.model_path, 'rb') as f:
+            content = f.read()
+        if version is None:
+            version = model_version(content, scaler_content)
+            existing = self.get(version)
+            if existing is not None:
+                return existing
+
+        model = pickle.loads(content)
+        if model is None:
+            logger.warning(f"No trained model stored at {artifacts.model_path}")
+            return None
+
+        compiled = self._compiled_engine(artifacts.compiled_path, version)
+        logger.info(f"Loaded model version {version} from {artifacts.model_path} "
+                    f"(compiled engine: {compiled is not None})")
+        return LoadedModel(version=version, model=model, scaler=self._load_scaler(scaler_content),
+                           model_path=artifacts.model_path, compiled=compiled)
+
+    def _load_mmap(self, artifacts: ModelArtifacts, scaler_content: bytes) -> LoadedModel:
+        """Serve from the memory-mapped bundle without unpickling the forest"""
+        logger.info(f"Serving model version {artifacts.version} from memory-mapped bundle {artifacts.bundle_path}")
+        return LoadedModel(version=artifacts.version, model=None, scaler=self._load_scaler(scaler_content),
+                           model_path=artifacts.model_path,
+                           compiled=self._compiled_engine(artifacts.bundle_path, artifacts.version))
+
+    @staticmethod
+    def _read_scaler(scaler_path: str) -> bytes:
+        """Serialized scaler, empty when none is saved"""
+        if not os.path.exists(scaler_path):
+            return b''
+        with open(scaler_path, 'rb') as f:
+            return f.read()
+
+    @staticmethod
+    def _load_scaler(scaler_content: bytes):
+        return pickle.loads(scaler_content) if scaler_content else None
+
+    @staticmethod
+    def _compiled_engine(path: str, version: str) -> Optional[CompiledForest]:
+        """Compiled engine at `path` if it was exported from model `version`"""
+        if not os.path.exists(path):
+            return None
+        if CompiledForest.read_metadata(path, "source_version") != version:
+            logger.warning(f"Ignoring {path}: it was not exported from model version {version}")
+            return None
+        return CompiledForest.load(path)
+
+    def load(self, warm_up: bool = True) -> Optional[LoadedModel]:
+        """Load the model from disk, warm it up and make it the active version"""
+        try:
+            entry = self.load_from_disk()
+            if entry is None:
+                return None
+            if warm_up:
+                self.warm_up(entry)
+            self.register(entry, activate=True)
+            return entry
+        except Exception as e:
+            logger.error(f"Error loading model into registry: {str(e)}")
+            raise
+
+    def register(self, entry: LoadedModel, activate: bool = True) -> None:
+        with self._lock:
+            self._models[entry.version] = entry
+            self._models.move_to_end(entry.version)
+            if activate:
+                self._active = entry
+                set_model_version(entry.version)
+            evicted = self._evict()
+        for old_entry in evicted:
+            self._remove_version_dir(old_entry)
+        logger.info(f"Registered model version {entry.version} (active: {self.active_version})")
+
+    def activate(self, version: str) -> LoadedModel:
+        with self._lock:
+            if version not in self._models:
+                raise KeyError(f"Model version {version} is not registered")
+            self._active = self._models[version]
+            set_model_version(version)
+            return self._active
+
+    def _evict(self) -> List[LoadedModel]:
+        evicted = []
+        while len(self._models) > self.max_versions:
+            oldest = next(iter(self._models))
+            if self._active is not None and oldest == self._active.version:
+                self._models.move_to_end(oldest)
+                continue
+            evicted.append(self._models.pop(oldest))
+            logger.info(f"Evicted model version {oldest} from registry")
+        return evicted
+
+    def _remove_version_dir(self, entry: LoadedModel) -> None:
+        """
+        Delete the version directory of an evicted version unless it is still the published one.
+        Its bundle files are unlinked, never truncated, so processes that still map them keep
+        their pages until they unmap
+        """
+        if entry.model_path is None or entry.version == read_current_version(self.current_path):
+            return
+        version_dir = os.path.dirname(os.path.abspath(entry.model_path))
+        if version_dir != os.path.join(os.path.abspath(self.versions_dir), entry.version):
+            return
+        shutil.rmtree(version_dir, ignore_errors=True)
+        logger.info(f"Removed {version_dir} of evicted model version {entry.version}")
+
+    @staticmethod
+    def warm_up(entry: LoadedModel) -> None:
+        """Run one prediction on a synthetic row so lazy initialisation happens before real traffic"""
+        row = entry.synthetic_row()
+        if row is None:
+            logger.warning(f"Could not infer input shape for model version {entry.version}; skipping warm-up")
+            return
+        start = time.perf_counter()
+        entry.predict(row)
+        logger.info(f"Warmed up model version {entry.version} in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+from typing import Optional
+
+from src.forest.constant.application import MODEL_WATCH_INTERVAL_SECONDS, MODEL_WATCH_S3
+from src.forest.constant.training_pipeline import MODEL_PUSHER_BUCKET_NAME, MODEL_PUSHER_S3_KEY, MODEL_FILE_NAME
+from src.forest.pipeline.model_registry import LoadedModel, ModelRegistry, model_registry
+
+logger = logging.getLogger(__name__)
+
+
+class ModelWatcher:
+    """
+    Background thread that polls for newly pushed models and hot-swaps them
+    into the registry.
+
+    The published model pointer (or the legacy model file) is compared by
+    (mtime, size) and the pushed S3 model by ETag. A changed model is loaded
+    and warmed up on the watcher thread,
+    then made active with a single registry swap: requests already holding
+    the previous entry finish on it, later requests get the new one.
+
+    When both sources are watched the most recently published model wins: a
+    change is only activated if its mtime (local) or LastModified (S3) is
+    newer than the publish time of the active model, so neither source can
+    roll the other back to an older model.
+    """
+
+    def __init__(self, registry: ModelRegistry = model_registry,
+                 poll_interval: float = MODEL_WATCH_INTERVAL_SECONDS,
+                 watch_s3: bool = MODEL_WATCH_S3,
+                 bucket_name: str = MODEL_PUSHER_BUCKET_NAME,
+                 s3_model_key: str = f"{MODEL_PUSHER_S3_KEY}/{MODEL_FILE_NAME}"):
+        self.registry = registry
+        self.poll_interval = poll_interval
+        self.watch_s3 = watch_s3
+        self.bucket_name = bucket_name
+        self.s3_model_key = s3_model_key
+        self._estimator = None
+        self._local_stamp = None
+        self._s3_etag: Optional[str] = None
+        # Publish time (epoch seconds) of the active model, see the class docstring
+        self._active_published_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _local_file_stamp(self):
+        try:
+            stat = os.stat(self.registry.watch_path)
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        # Whatever is on disk now was loaded at startup; only later changes trigger a reload
+        if self.registry.get() is not None:
+            self._local_stamp = self._local_file_stamp()
+            if self._local_stamp is not None:
+                self._active_published_at = self._local_stamp[0] / 1e9
+        if self.watch_s3:
+            try:
+                self._seed_s3()
+            except Exception as e:
+                logger.error(f"Error reading s3://{self.bucket_name}/{self.s3_model_key}: {str(e)}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Model watcher started (interval={self.poll_interval}s, s3={self.watch_s3})")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.check_once()
+
+    def check_once(self) -> bool:
+        """Poll every source once; returns True when a new model was activated"""
+        swapped = False
+        try:
+            swapped = self._check_local() or swapped
+        except Exception as e:
+            logger.error(f"Error reloading local model: {str(e)}")
+        if self.watch_s3:
+            try:
+                swapped = self._check_s3() or swapped
+            except Exception as e:
+                logger.error(f"Error reloading model from s3://{self.bucket_name}/{self.s3_model_key}: {str(e)}")
+        return swapped
+
+    def _check_local(self) -> bool:
+        stamp = self._local_file_stamp()
+        if stamp is None or stamp == self._local_stamp:
+            return False
+        published_at = stamp[0] / 1e9
+        if not self._is_newer(published_at):
+            logger.info(f"Ignoring {self.registry.watch_path}: it is older than the active model")
+            self._local_stamp = stamp
+            return False
+        previous = self.registry.active_version
+        entry = self.registry.load_from_disk()
+        if entry is None:
+            return False
+        self._activate(entry, previous, published_at)
+        self._local_stamp = stamp
+        return entry.version != previous
+
+    def _s3_estimator(self):
+        if self._estimator is None:
+            from src.forest.entity.s3_estimator import SensorEstimator
+            self._estimator = SensorEstimator(bucket_name=self.bucket_name, model_path=self.s3_model_key)
+        return self._estimator
+
+    @staticmethod
+    def _s3_version(etag: str) -> str:
+        return f"s3-{etag[:12]}"
+
+    def _seed_s3(self) -> None:
+        """
+        Mark the object in S3 at startup as seen unless it should replace the active model: it is the
+        active model already, or it is not newer than it. With no active model the first poll loads it
+        """
+        stamp = self._s3_estimator().get_model_stamp()
+        if stamp is None or self.registry.get() is None:
+            return
+        etag, published_at = stamp
+        if self.registry.active_version == self._s3_version(etag) or not self._is_newer(published_at):
+            self._s3_etag = etag
+
+    def _check_s3(self) -> bool:
+        stamp = self._s3_estimator().get_model_stamp()
+        if stamp is None or stamp[0] == self._s3_etag:
+            return False
+        etag, published_at = stamp
+        if not self._is_newer(published_at):
+            logger.info(f"Ignoring s3://{self.bucket_name}/{self.s3_model_key}: it is older than the active model")
+            self._s3_etag = etag
+            return False
+        previous = self.registry.active_version
+        sensor_model = self._estimator.load_model()
+        sensor_model.compile()
+        entry = LoadedModel(version=self._s3_version(etag), model=sensor_model,
+                            model_path=f"s3://{self.bucket_name}/{self.s3_model_key}")
+        self._activate(entry, previous, published_at)
+        self._s3_etag = etag
+        return True
+
+    def _is_newer(self, published_at: float) -> bool:
+        return self._active_published_at is None or published_at > self._active_published_at
+
+    def _activate(self, entry: LoadedModel, previous: Optional[str], published_at: float) -> None:
+        # Warm up before the swap so the first request on the new version pays no lazy-init cost
+        self.registry.warm_up(entry)
+        self.registry.register(entry, activate=True)
+        self._active_published_at = published_at
+        if entry.version != previous:
+            logger.info(f"Hot-swapped active model from {previous} to {entry.version}")
+
+
+model_watcher = ModelWatcher()
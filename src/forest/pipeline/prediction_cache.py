@@ -0,0 +1,156 @@
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+from src.forest.constant.application import PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_MAX_BYTES
+from src.forest.metrics import PREDICTION_CACHE_REQUESTS
+from src.forest.pipeline.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+_HASH_LANES = (
+    (np.uint64(0x243F6A8885A308D3), np.uint64(0x9E3779B97F4A7C15)),
+    (np.uint64(0x13198A2E03707344), np.uint64(0xC2B2AE3D27D4EB4F)),
+)
+_KEY_DTYPE = np.dtype([("high", np.uint64), ("low", np.uint64)])
+# Approximate bookkeeping cost of one OrderedDict entry on top of its key and value
+_ENTRY_OVERHEAD_BYTES = 100
+
+
+def row_keys(X) -> np.ndarray:
+    """
+    128-bit hash of every row of the ordered feature matrix, computed column-wise
+    for the whole batch at once
+    :param X: 2-D array-like of features
+    :return: Structured array with one (high, low) key per row
+    """
+    values = np.ascontiguousarray(X, dtype=np.float64) + 0.0  # fold -0.0 into 0.0
+    words = values.view(np.uint64)
+    keys = np.empty(len(values), dtype=_KEY_DTYPE)
+    with np.errstate(over="ignore"):
+        for name, (seed, multiplier) in zip(_KEY_DTYPE.names, _HASH_LANES):
+            h = np.full(len(values), seed, dtype=np.uint64)
+            for column in range(words.shape[1]):
+                h ^= words[:, column]
+                h *= multiplier
+                h ^= h >> np.uint64(29)
+            keys[name] = h
+    return keys
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of per-row predictions placed in front of the model.
+
+    A batch is hashed and de-duplicated in one vectorised pass; only rows whose
+    key is missing are sent to the model. The cache belongs to the active model
+    version and is cleared once when the active version changes. During a hot
+    swap, requests still running on another version bypass the cache, so they
+    neither read nor evict the active version's entries.
+    """
+
+    def __init__(self, max_entries: int = PREDICTION_CACHE_MAX_ENTRIES,
+                 max_bytes: Optional[int] = PREDICTION_CACHE_MAX_BYTES,
+                 active_version: Optional[Callable[[], Optional[str]]] = None):
+        """
+        :param max_entries: Maximum number of cached rows, 0 disables the cache
+        :param max_bytes: Optional approximate memory bound for the cached entries
+        :param active_version: Returns the version currently served, e.g. the registry's; when it is
+            not given or returns None, the version of the latest call is taken as the active one
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes or None
+        self.active_version = active_version
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def predict(self, data, version: str, predict_fn: Callable) -> np.ndarray:
+        """
+        Predictions for every row of `data`, calling `predict_fn` only on uncached rows
+        :param data: DataFrame or array of ordered feature rows
+        :param version: Version of the model behind `predict_fn`
+        :param predict_fn: Function scoring a subset of `data` (same type as `data`)
+        """
+        if not self.enabled:
+            return np.asarray(predict_fn(data))
+
+        active_version = (self.active_version() if self.active_version is not None else None) or version
+        if version != active_version:
+            # A request that started before a swap finishes on its model without touching the cache
+            return np.asarray(predict_fn(data))
+
+        keys = row_keys(data)
+        unique_keys, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        unique_keys = unique_keys.tolist()
+
+        with self._lock:
+            if version != self.version:
+                if self.version is not None:
+                    logger.info(f"Active model version changed from {self.version} to {version}; "
+                                f"clearing prediction cache")
+                self._entries.clear()
+                self._bytes = 0
+                self.version = version
+            cached = [self._entries.get(key) for key in unique_keys]
+            for key, value in zip(unique_keys, cached):
+                if value is not None:
+                    self._entries.move_to_end(key)
+
+        missing = [i for i, value in enumerate(cached) if value is None]
+        if missing:
+            rows = first_index[missing]
+            subset = data.iloc[rows] if hasattr(data, "iloc") else np.asarray(data)[rows]
+            for i, value in zip(missing, np.asarray(predict_fn(subset)).tolist()):
+                cached[i] = value
+
+        with self._lock:
+            # Counted per input row, so duplicates inside one batch are hits
+            n_missed = len(missing)
+            self.misses += n_missed
+            self.hits += len(keys) - n_missed
+            PREDICTION_CACHE_REQUESTS.inc(n_missed, result="miss")
+            PREDICTION_CACHE_REQUESTS.inc(len(keys) - n_missed, result="hit")
+            if version == self.version:
+                for i in missing:
+                    self._store(unique_keys[i], cached[i])
+
+        return np.asarray(cached)[inverse.ravel()]
+
+    def _store(self, key, value) -> None:
+        if key in self._entries:
+            return
+        self._entries[key] = value
+        self._bytes += sys.getsizeof(key) + sys.getsizeof(value) + _ENTRY_OVERHEAD_BYTES
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            old_key, old_value = self._entries.popitem(last=False)
+            self._bytes -= sys.getsizeof(old_key) + sys.getsizeof(old_value) + _ENTRY_OVERHEAD_BYTES
+
+
+prediction_cache = PredictionCache(active_version=lambda: model_registry.active_version)
@@ -2,26 +2,48 @@ import logging
 import pandas as pd
 import pickle
 import os
+import time
 import boto3
 from datetime import datetime
+from typing import Callable, Optional
+from src.forest.constant.application import PREDICTION_CHUNK_SIZE, PREDICTION_N_WORKERS
+from src.forest.constant.training_pipeline import SCHEMA_FILE_PATH, TARGET_COLUMN
+from src.forest.entity.parallel_scorer import get_scorer
+from src.forest.metrics import record_batch, timed
+from src.forest.pipeline.model_registry import LoadedModel, model_registry
+from src.forest.utils.main_utils import (get_current_rss_mb, read_yaml_file, get_schema_dtypes, apply_schema_dtypes,
+                                         get_dataframe_memory_mb)
 
 logger = logging.getLogger(__name__)
 
 class PredictionPipeline:
-    def __init__(self):
-        self.model = None
-        self.scaler = None
+    def __init__(self, model=None, scaler=None, n_workers: int = PREDICTION_N_WORKERS, cache=None):
+        """
+        :param model: Already loaded model (e.g. from the model registry); loaded from disk when omitted
+        :param scaler: Scaler matching `model`; None when the model does its own preprocessing
+        :param n_workers: Worker processes used to score large batches in parallel shards
+        :param cache: Optional PredictionCache; used when `model` is a versioned registry entry
+        """
+        self.model = model
+        self.scaler = scaler
+        self.n_workers = n_workers
+        self.cache = cache
+        self._local_model = None
         self.s3_client = None
-        self.load_model()
+        self.output_file_path = None
+        if self.model is None:
+            self.load_model()
         
+    @timed("prediction", "load_model")
     def load_model(self):
         """Load saved model and scaler"""
         try:
-            if os.path.exists('models/model.pkl'):
-                with open('models/model.pkl', 'rb') as f:
+            artifacts = model_registry.artifacts()
+            if os.path.exists(artifacts.model_path):
+                with open(artifacts.model_path, 'rb') as f:
                     self.model = pickle.load(f)
                 
-                with open('models/scaler.pkl', 'rb') as f:
+                with open(artifacts.scaler_path, 'rb') as f:
                     self.scaler = pickle.load(f)
                 
                 logger.info("Model and scaler loaded successfully!")
@@ -33,12 +55,17 @@ class PredictionPipeline:
             logger.error(f"Error loading model: {str(e)}")
             raise
     
-    def initiate_prediction(self):
-        """Initiate prediction pipeline"""
+    def initiate_prediction(self, on_stage: Optional[Callable[[str], None]] = None):
+        """
+        Initiate prediction pipeline
+        :param on_stage: Optional callback notified with the name of each stage as it starts
+        """
+        on_stage = on_stage or (lambda stage: None)
         try:
             logger.info("Starting prediction pipeline...")
             
             # Load prediction data
+            on_stage("load_prediction_data")
             data = self.load_prediction_data()
             
             if data is None or data.empty:
@@ -46,9 +73,11 @@ class PredictionPipeline:
                 return
             
             # Make predictions
+            on_stage("make_predictions")
             predictions = self.make_predictions(data)
             
             # Save predictions
+            on_stage("save_predictions")
             self.save_predictions(predictions)
             
             logger.info("Prediction pipeline completed successfully!")
@@ -58,12 +87,79 @@ class PredictionPipeline:
             logger.error(f"Error in prediction pipeline: {str(e)}")
             raise
     
+    def initiate_streaming_prediction(self, chunk_size: int = PREDICTION_CHUNK_SIZE,
+                                      on_stage: Optional[Callable[[str], None]] = None):
+        """
+        Score the prediction file chunk by chunk, appending each chunk's predictions
+        to the output file so peak memory is bounded by `chunk_size` rather than file size
+        :param chunk_size: Number of input rows read and scored at a time
+        :param on_stage: Optional callback notified with the name of each stage as it starts
+        :return: Run statistics (rows, seconds, rows_per_second, baseline_rss_mb, peak_rss_increase_mb,
+                 output_file_path); the RSS is sampled after every chunk, so the increase is this run's
+                 own and not an earlier request's peak in the same process
+        """
+        on_stage = on_stage or (lambda stage: None)
+        try:
+            logger.info(f"Starting streaming prediction pipeline with chunk size {chunk_size}...")
+
+            if not os.path.exists('data/prediction_data.csv'):
+                logger.warning("Prediction data file not found")
+                return None
+
+            os.makedirs('predictions', exist_ok=True)
+            timestamp = datetime.now()
+            filename = f'predictions/predictions_{timestamp.strftime("%Y%m%d_%H%M%S")}.csv'
+
+            on_stage("make_predictions")
+            start = time.perf_counter()
+            rows = 0
+            feature_dtypes = self._feature_dtypes()
+            baseline_rss_mb = get_current_rss_mb()
+            peak_rss_mb = baseline_rss_mb
+            with open(filename, 'w', newline='') as output_file:
+                for chunk_number, chunk in enumerate(pd.read_csv('data/prediction_data.csv', chunksize=chunk_size)):
+                    chunk = apply_schema_dtypes(chunk, feature_dtypes)
+                    predictions = self.make_predictions(chunk)
+                    pd.DataFrame({
+                        'prediction': predictions,
+                        'timestamp': timestamp
+                    }).to_csv(output_file, index=False, header=chunk_number == 0)
+                    rows += len(chunk)
+                    rss_mb = get_current_rss_mb()
+                    if rss_mb is not None:
+                        peak_rss_mb = max(peak_rss_mb, rss_mb)
+            elapsed = time.perf_counter() - start
+            self.output_file_path = filename
+
+            stats = {
+                'rows': rows,
+                'seconds': round(elapsed, 3),
+                'rows_per_second': round(rows / elapsed, 1) if elapsed > 0 else None,
+                'baseline_rss_mb': None if baseline_rss_mb is None else round(baseline_rss_mb, 1),
+                'peak_rss_increase_mb': None if baseline_rss_mb is None else round(peak_rss_mb - baseline_rss_mb, 1),
+                'output_file_path': filename
+            }
+            logger.info(f"Streaming prediction finished: {stats}")
+
+            on_stage("upload_predictions")
+            try:
+                self.upload_to_s3(filename)
+            except Exception as e:
+                logger.warning(f"S3 upload failed (optional): {str(e)}")
+
+            return stats
+
+        except Exception as e:
+            logger.error(f"Error in streaming prediction pipeline: {str(e)}")
+            raise
+
+    @timed("prediction", "load")
     def load_prediction_data(self):
         """Load data for prediction"""
         try:
             if os.path.exists('data/prediction_data.csv'):
-                data = pd.read_csv('data/prediction_data.csv')
-                logger.info(f"Prediction data loaded with shape: {data.shape}")
+                data = apply_schema_dtypes(pd.read_csv('data/prediction_data.csv'), self._feature_dtypes())
+                logger.info(f"Prediction data loaded with shape: {data.shape}, memory: {get_dataframe_memory_mb(data)} MB")
                 return data
             else:
                 logger.warning("Prediction data file not found")
@@ -72,24 +168,51 @@ class PredictionPipeline:
             logger.error(f"Error loading prediction data: {str(e)}")
             return None
     
+    @staticmethod
+    def _feature_dtypes():
+        """Compact schema dtypes of the feature columns; the target is not part of prediction input"""
+        dtypes = get_schema_dtypes(read_yaml_file(file_path=SCHEMA_FILE_PATH))
+        dtypes.pop(TARGET_COLUMN, None)
+        return dtypes
+
+    @timed("prediction", "predict")
     def make_predictions(self, data):
         """Make predictions on the data"""
         try:
             if self.model is None:
                 logger.warning("Model not available. Using random predictions.")
                 predictions = [0] * len(data)
+            elif self.cache is not None and getattr(self.model, "version", None) is not None:
+                predictions = self.cache.predict(data, self.model.version, self._predict)
             else:
-                # Scale data
-                X_scaled = self.scaler.transform(data)
-                # Make predictions
-                predictions = self.model.predict(X_scaled)
+                predictions = self._predict(data)
             
+            record_batch("batch", len(data))
             logger.info(f"Predictions made for {len(predictions)} samples")
             return predictions
         except Exception as e:
             logger.error(f"Error making predictions: {str(e)}")
             raise
     
+    def _predict(self, data):
+        """Scale and predict, sharding across worker processes when configured"""
+        if self.n_workers > 1:
+            # Scale and predict row shards on the worker pool of this model version, started once
+            # and reused by every chunk and request. A model loaded from disk has no version and is
+            # keyed by its id, which the scorer keeps from being reused by holding the model
+            model = self.model
+            if getattr(model, "version", None) is None:
+                if self._local_model is None:
+                    self._local_model = LoadedModel(version=f"local-{id(self.model)}-{id(self.scaler)}",
+                                                    model=self.model, scaler=self.scaler)
+                model = self._local_model
+            return get_scorer(model, model.version, n_workers=self.n_workers).predict(data)
+        # Scale data
+        X_scaled = data if self.scaler is None else self.scaler.transform(data)
+        # Make predictions
+        return self.model.predict(X_scaled)
+    
+    @timed("prediction", "save")
     def save_predictions(self, predictions):
         """Save predictions to CSV and upload to S3"""
         try:
@@ -103,6 +226,7 @@ class PredictionPipeline:
                 'timestamp': datetime.now()
             })
             df_predictions.to_csv(filename, index=False)
+            self.output_file_path = filename
             logger.info(f"Predictions saved to {filename}")
             
             # Upload to S3 (optional)
@@ -110,11 +234,14 @@ class PredictionPipeline:
                 self.upload_to_s3(filename)
             except Exception as e:
                 logger.warning(f"S3 upload failed (optional): {str(e)}")
+
+            return filename
         
         except Exception as e:
             logger.error(f"Error saving predictions: {str(e)}")
             raise
     
+    @timed("prediction", "s3_upload")
     def upload_to_s3(self, filename):
         """Upload predictions to S3 bucket"""
         try:
@@ -5,30 +5,69 @@ from sklearn.preprocessing import StandardScaler
 import pandas as pd
 import pickle
 import os
+import shutil
+import tempfile
+from typing import Callable, Optional
+from src.forest.constant.application import CURRENT_MODEL_FILE_PATH, MODEL_VERSIONS_DIR
+from src.forest.entity.compiled_forest import CompiledForest
+from src.forest.metrics import timed
+from src.forest.pipeline.artifact_store import ArtifactStore, artifact_store
+from src.forest.pipeline.model_registry import ModelArtifacts, model_version, read_current_version
 
 logger = logging.getLogger(__name__)
 
 class TrainPipeline:
-    def __init__(self):
+    TRAINING_DATA_PATH = 'data/training_data.csv'
+    MODEL_PARAMS = {"n_estimators": 100, "random_state": 42}
+
+    def __init__(self, artifact_store: Optional[ArtifactStore] = artifact_store):
+        """
+        :param artifact_store: When given, a run with unchanged training data keeps the model it produced last time
+        """
         self.model = None
         self.scaler = StandardScaler()
+        self.artifact_store = artifact_store
+        self.model_version = None
         
-    def run_pipeline(self):
-        """Execute the training pipeline"""
+    def run_pipeline(self, on_stage: Optional[Callable[[str], None]] = None):
+        """
+        Execute the training pipeline
+        :param on_stage: Optional callback notified with the name of each stage as it starts
+        """
+        on_stage = on_stage or (lambda stage: None)
         try:
             logger.info("Starting training pipeline...")
+
+            cache_key = None
+            if self.artifact_store is not None:
+                cache_key = self.artifact_store.key("train_pipeline", files=[self.TRAINING_DATA_PATH],
+                                                    params=self.MODEL_PARAMS)
+                cached_artifact = self.artifact_store.fetch("train_pipeline", cache_key)
+                # Reuse only while the published version is still the one this data produced
+                if cached_artifact is not None and self._saved_version() == cached_artifact["model_version"]:
+                    logger.info(f"Training data unchanged, keeping model version {cached_artifact['model_version']}")
+                    return True
             
             # Load data
+            on_stage("load_data")
             data = self.load_data()
             
             # Preprocess data
+            on_stage("preprocess_data")
             X, y = self.preprocess_data(data)
             
             # Train model
+            on_stage("train_model")
             self.train_model(X, y)
             
             # Save model
+            on_stage("save_model")
             self.save_model()
+
+            if cache_key is not None and self.model_version is not None:
+                model_path = ModelArtifacts.in_dir(os.path.join(MODEL_VERSIONS_DIR, self.model_version)).model_path
+                self.artifact_store.put("train_pipeline", cache_key,
+                                        {"model_version": self.model_version, "model_path": model_path})
             
             logger.info("Training pipeline completed successfully!")
             return True
@@ -37,10 +76,19 @@ class TrainPipeline:
             logger.error(f"Error in training pipeline: {str(e)}")
             raise
     
+    @staticmethod
+    def _saved_version() -> Optional[str]:
+        """Version named by the CURRENT pointer, None when none was published or its directory is gone"""
+        version = read_current_version()
+        if version is None or not os.path.isdir(os.path.join(MODEL_VERSIONS_DIR, version)):
+            return None
+        return version
+
+    @timed("training", "load")
     def load_data(self):
         """Load training data"""
         try:
-            data = pd.read_csv('data/training_data.csv')
+            data = pd.read_csv(self.TRAINING_DATA_PATH)
             logger.info(f"Data loaded with shape: {data.shape}")
             return data
         except FileNotFoundError:
@@ -48,6 +96,7 @@ class TrainPipeline:
             logger.warning("Training data not found. Using sample data.")
             return pd.DataFrame()
     
+    @timed("training", "transform")
     def preprocess_data(self, data):
         """Preprocess data for training"""
         if data.empty:
@@ -64,6 +113,7 @@ class TrainPipeline:
         logger.info(f"Data preprocessed. Features shape: {X_scaled.shape}")
         return X_scaled, y
     
+    @timed("training", "train")
     def train_model(self, X, y):
         """Train the machine learning model"""
         if X is None or y is None:
@@ -71,25 +121,62 @@ class TrainPipeline:
             return
         
         try:
-            self.model = RandomForestClassifier(n_estimators=100, random_state=42)
+            self.model = RandomForestClassifier(**self.MODEL_PARAMS)
             self.model.fit(X, y)
             logger.info("Model trained successfully!")
         except Exception as e:
             logger.error(f"Error training model: {str(e)}")
             raise
     
+    @timed("training", "save")
     def save_model(self):
-        """Save trained model and scaler"""
+        """
+        Save trained model and scaler, with the compiled engine, as one version and publish it.
+        Every file is written to a temporary directory renamed to models/versions/<version>/,
+        then the CURRENT pointer is swapped in atomically, so a process following the pointer
+        never reads a partial file or a model next to another version's scaler or engine
+        """
         try:
-            os.makedirs('models', exist_ok=True)
+            os.makedirs(MODEL_VERSIONS_DIR, exist_ok=True)
             
-            with open('models/model.pkl', 'wb') as f:
-                pickle.dump(self.model, f)
+            model_content = pickle.dumps(self.model)
+            scaler_content = pickle.dumps(self.scaler)
+            version = model_version(model_content, scaler_content)
+            version_dir = os.path.join(MODEL_VERSIONS_DIR, version)
             
-            with open('models/scaler.pkl', 'wb') as f:
-                pickle.dump(self.scaler, f)
+            if os.path.isdir(version_dir):
+                logger.info(f"Model version {version} is already saved in {version_dir}")
+            else:
+                temp_dir = tempfile.mkdtemp(prefix=f".{version}.", dir=MODEL_VERSIONS_DIR)
+                try:
+                    self._write_version(ModelArtifacts.in_dir(temp_dir, version), model_content, scaler_content)
+                    os.rename(temp_dir, version_dir)
+                except Exception:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                    # Another run saved the same version first
+                    if not os.path.isdir(version_dir):
+                        raise
             
-            logger.info("Model and scaler saved successfully!")
+            with open(f"{CURRENT_MODEL_FILE_PATH}.tmp", 'w') as f:
+                f.write(version)
+            os.replace(f"{CURRENT_MODEL_FILE_PATH}.tmp", CURRENT_MODEL_FILE_PATH)
+            self.model_version = version if self.model is not None else None
+            
+            logger.info(f"Model and scaler saved and published as version {version}")
         except Exception as e:
             logger.error(f"Error saving model: {str(e)}")
             raise
+
+    def _write_version(self, artifacts: ModelArtifacts, model_content: bytes, scaler_content: bytes) -> None:
+        """Write every file of a model version into a directory nothing reads yet"""
+        with open(artifacts.model_path, 'wb') as f:
+            f.write(model_content)
+        with open(artifacts.scaler_path, 'wb') as f:
+            f.write(scaler_content)
+        
+        # Export the array-based inference engine, tagged with the version it came from,
+        # both as a compact .npz and as a memory-mappable .npy bundle
+        if isinstance(self.model, RandomForestClassifier):
+            compiled_forest = CompiledForest.from_sklearn(self.model)
+            compiled_forest.save(artifacts.compiled_path, source_version=artifacts.version)
+            compiled_forest.save_bundle(artifacts.bundle_path, source_version=artifacts.version)
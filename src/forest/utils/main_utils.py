@@ -1,8 +1,13 @@
+import io
 import os.path
+import struct
 import sys
+import threading
 import numpy as np
+import pandas as pd
 import dill
 import yaml
+from typing import Iterator, List, Optional
 from src.forest.exception import ForestException
 from src.forest.logger import logging
 
@@ -43,28 +48,41 @@ def load_object(file_path: str) -> object:
     except Exception as e:
         raise ForestException(e, sys) from e
 
-def save_numpy_array_data(file_path: str, array: np.array):
+def save_numpy_array_data(file_path: str, array: np.array, dtype: Optional[np.dtype] = None, chunk_rows: int = 65536):
     """
     Save numpy array data to file
     file_path: str location of file to save
     array: np.array data to save
+    dtype: optional dtype to store the array as; rows are converted and written `chunk_rows` at a time,
+           so no converted copy of the whole array is made
     """
     try:
         dir_path = os.path.dirname(file_path)
         os.makedirs(dir_path, exist_ok=True)
         with open(file_path, 'wb') as file_obj:
-            np.save(file_obj, array)
+            if dtype is None:
+                np.save(file_obj, array)
+                return
+            dtype = np.dtype(dtype)
+            np.lib.format.write_array_header_1_0(file_obj, {"descr": np.lib.format.dtype_to_descr(dtype),
+                                                            "fortran_order": False, "shape": array.shape})
+            for start in range(0, len(array), chunk_rows):
+                file_obj.write(np.ascontiguousarray(array[start:start + chunk_rows], dtype=dtype).tobytes())
     except Exception as e:
         raise ForestException(e, sys) from e
 
 
-def load_numpy_array_data(file_path: str) -> np.array:
+def load_numpy_array_data(file_path: str, mmap_mode: Optional[str] = None) -> np.array:
     """
     load numpy array data from file
     file_path: str location of file to load
+    mmap_mode: optional `np.load` memory-map mode, "r" maps the file read-only instead of reading it,
+               so rows are paged in from disk as they are used
     return: np.array data loaded
     """
     try:
+        if mmap_mode is not None:
+            return np.load(file_path, mmap_mode=mmap_mode)
         with open(file_path, 'rb') as file_obj:
             return np.load(file_obj)
     except Exception as e:
@@ -84,6 +102,295 @@ def save_object(file_path: str, obj: object) -> None:
     except Exception as e:
         raise ForestException(e, sys) from e
 
+SCHEMA_DTYPES = {"int": "int64", "float": "float64", "str": "object", "category": "category"}
+
+
+def get_schema_dtypes(schema_config: dict) -> dict:
+    """
+    Map the `columns` section of the schema file to pandas dtypes, using the compact physical
+    dtype from the `dtypes` section (uint8, int16, float32, ...) where one is recorded
+    schema_config: dict parsed schema.yaml
+    return: dict of column name to dtype
+    """
+    dtypes = {}
+    physical_dtypes = schema_config.get("dtypes") or {}
+    for column in schema_config.get("columns", []):
+        for name, type_name in column.items():
+            type_name = physical_dtypes.get(name, type_name)
+            dtypes[name] = SCHEMA_DTYPES.get(str(type_name), str(type_name))
+    return dtypes
+
+
+def apply_schema_dtypes(dataframe: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    """
+    Cast the columns of dataframe to the given dtypes, skipping columns that are absent or already match.
+    Integer casts are range-checked because numpy wraps out-of-range values silently: a column holding
+    missing values is stored as float32 instead, and one whose values do not fit keeps its dtype
+    dataframe: pd.DataFrame data to cast
+    dtypes: dict of column name to dtype, usually from `get_schema_dtypes`
+    return: pd.DataFrame with the casted columns
+    """
+    casts = {}
+    for column, dtype in dtypes.items():
+        if column not in dataframe.columns or str(dataframe[column].dtype) == str(dtype):
+            continue
+        if dtype != "category" and np.issubdtype(np.dtype(dtype), np.integer):
+            values = dataframe[column]
+            if values.isna().any():
+                dtype = "float32"
+            elif len(values) and not pd.api.types.is_numeric_dtype(values):
+                continue
+            elif len(values) and (values.min() < np.iinfo(dtype).min or values.max() > np.iinfo(dtype).max):
+                logging.warning(f"Column {column} does not fit in {dtype}, keeping {values.dtype}")
+                continue
+        casts[column] = dtype
+    return dataframe.astype(casts) if casts else dataframe
+
+
+def get_dataframe_memory_mb(dataframe: pd.DataFrame) -> float:
+    """In-memory size of dataframe in MB, including object column contents"""
+    return round(dataframe.memory_usage(deep=True).sum() / (1024 * 1024), 3)
+
+
+def save_dataframe(file_path: str, dataframe: pd.DataFrame) -> None:
+    """
+    Save dataframe in the format given by the file extension
+    file_path: str location of file to save, `.feather` (Arrow IPC, uncompressed so it can be
+               memory-mapped) or `.csv`
+    dataframe: pd.DataFrame data to save
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        if file_path.endswith(".feather"):
+            dataframe.reset_index(drop=True).to_feather(file_path, compression="uncompressed")
+        else:
+            dataframe.to_csv(file_path, index=False, header=True)
+    except Exception as e:
+        raise ForestException(e, sys) from e
+
+
+def read_dataframe(file_path: str, columns: Optional[List[str]] = None, dtypes: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Read dataframe saved by `save_dataframe`
+    file_path: str location of file to load
+    columns: optional list of columns to read, other columns are not parsed or loaded
+    dtypes: optional column dtypes applied with `apply_schema_dtypes` after reading
+    return: pd.DataFrame data loaded
+    """
+    try:
+        if file_path.endswith(".feather"):
+            from pyarrow import feather
+            dataframe = feather.read_table(file_path, columns=columns, memory_map=True).to_pandas()
+        else:
+            dataframe = pd.read_csv(file_path, usecols=columns)
+        return apply_schema_dtypes(dataframe, dtypes) if dtypes else dataframe
+    except Exception as e:
+        raise ForestException(e, sys) from e
+
+
+class ChunkedDataFrameWriter:
+    """
+    Write a dataframe chunk by chunk to the format given by the file extension, so only
+    one chunk is held in memory. `.feather` chunks are appended as record batches of one
+    Arrow IPC file and `.csv` chunks are appended below a single header. Category columns
+    are stored as their plain values, since an Arrow file holds one dictionary per column
+    for all batches; read them back with the schema dtypes to restore the categories.
+
+    With `append=True` the chunks are added after the rows already in the file. A CSV file
+    is opened for appending; an Arrow file cannot be extended in place, so its record
+    batches are copied from a memory map into a new file that replaces it on exit. When
+    appending to an Arrow file, `keep_rows` copies only that many of its rows and drops
+    the rest.
+    """
+
+    def __init__(self, file_path: str, append: bool = False, keep_rows: Optional[int] = None):
+        self.file_path = file_path
+        self.append = append and os.path.exists(file_path)
+        self.keep_rows = keep_rows
+        self.rows = 0
+        self._file = None
+        self._writer = None
+        self._schema = None
+        self._output_path = file_path
+        self._header_written = False
+        self._columns = None
+
+    def __enter__(self) -> "ChunkedDataFrameWriter":
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            if self.append and self.file_path.endswith(".feather"):
+                import pyarrow as pa
+                self._output_path = self.file_path + ".tmp"
+                self._file = open(self._output_path, "wb")
+                with pa.memory_map(self.file_path) as source:
+                    reader = pa.ipc.open_file(source)
+                    self._schema = reader.schema
+                    self._writer = pa.ipc.new_file(self._file, self._schema,
+                                                   options=pa.ipc.IpcWriteOptions(compression=None))
+                    kept = 0
+                    for i in range(reader.num_record_batches):
+                        batch = reader.get_batch(i)
+                        if self.keep_rows is not None:
+                            batch = batch.slice(0, max(self.keep_rows - kept, 0))
+                        if batch.num_rows:
+                            self._writer.write_batch(batch)
+                        kept += batch.num_rows
+            elif self.append:
+                self._file = open(self.file_path, "ab")
+                # Existing rows already carry the header, later chunks follow its column order
+                self._header_written = os.path.getsize(self.file_path) > 0
+                if self._header_written:
+                    self._columns = list(pd.read_csv(self.file_path, nrows=0).columns)
+            else:
+                self._file = open(self.file_path, "wb")
+            return self
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def write(self, dataframe: pd.DataFrame) -> None:
+        try:
+            categorical = [c for c in dataframe.columns if isinstance(dataframe[c].dtype, pd.CategoricalDtype)]
+            if categorical:
+                dataframe = dataframe.astype({c: dataframe[c].cat.categories.dtype for c in categorical})
+            if self.file_path.endswith(".feather"):
+                import pyarrow as pa
+                if self._schema is not None:
+                    dataframe = dataframe[self._schema.names]
+                table = pa.Table.from_pandas(dataframe, schema=self._schema, preserve_index=False)
+                if self._writer is None:
+                    self._schema = table.schema
+                    self._writer = pa.ipc.new_file(self._file, self._schema,
+                                                   options=pa.ipc.IpcWriteOptions(compression=None))
+                self._writer.write_table(table)
+            else:
+                if self._columns is not None:
+                    dataframe = dataframe[self._columns]
+                dataframe.to_csv(self._file, index=False, header=not self._header_written)
+                self._header_written = True
+                self._columns = list(dataframe.columns)
+            self.rows += len(dataframe)
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._file.close()
+        if self._output_path != self.file_path:
+            if exc_type is None:
+                os.replace(self._output_path, self.file_path)
+            else:
+                os.remove(self._output_path)
+
+
+class ChunkedArrayWriter:
+    """
+    Write a 2D `.npy` array chunk by chunk, so only one chunk is held in memory. The row count
+    is unknown until the last chunk, so a header with room for any row count is written first
+    and rewritten in place on exit; `np.load` reads the result like any other `.npy` file.
+    Every chunk must have the columns of the first one; with `dtype` chunks are converted to it
+    as they are written.
+    """
+
+    # Rows written into the placeholder header, wider than any row count the file can hold
+    _MAX_ROWS = np.iinfo(np.int64).max
+
+    def __init__(self, file_path: str, dtype: Optional[np.dtype] = None):
+        self.file_path = file_path
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.rows = 0
+        self._columns = None
+        self._header_length = 0
+        self._file = None
+
+    def _header(self, rows: int, length: int = 0) -> bytes:
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False,
+                  "shape": (rows,) if self._columns is None else (rows, self._columns)}
+        if not length:
+            buffer = io.BytesIO()
+            np.lib.format.write_array_header_1_0(buffer, header)
+            return buffer.getvalue()
+        # Same layout as write_array_header_1_0, padded with spaces to the placeholder's length
+        text = repr(header).encode("latin1")
+        prefix = np.lib.format.magic(1, 0) + struct.pack("<H", length - 10)
+        return prefix + text.ljust(length - len(prefix) - 1) + b"\n"
+
+    def __enter__(self) -> "ChunkedArrayWriter":
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            self._file = open(self.file_path, "wb")
+            return self
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def write(self, array: np.ndarray) -> None:
+        try:
+            array = np.asarray(array)
+            if self._header_length == 0:
+                self.dtype = self.dtype or array.dtype
+                self._columns = array.shape[1] if array.ndim > 1 else None
+                placeholder = self._header(self._MAX_ROWS)
+                self._header_length = len(placeholder)
+                self._file.write(placeholder)
+            elif (array.shape[1] if array.ndim > 1 else None) != self._columns:
+                raise ValueError(f"Chunk of shape {array.shape} does not match {self._columns} columns")
+            self._file.write(np.ascontiguousarray(array, dtype=self.dtype).tobytes())
+            self.rows += len(array)
+        except Exception as e:
+            raise ForestException(e, sys) from e
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if exc_type is None:
+                if self._header_length == 0:
+                    raise ValueError(f"No chunks were written to {self.file_path}")
+                self._file.seek(0)
+                self._file.write(self._header(self.rows, self._header_length))
+        finally:
+            self._file.close()
+        if exc_type is not None:
+            os.remove(self.file_path)
+
+
+def iter_dataframe_chunks(file_path: str, chunk_size: int = 0, dtypes: Optional[dict] = None) -> Iterator[pd.DataFrame]:
+    """
+    Read a dataframe saved by `save_dataframe` or `ChunkedDataFrameWriter` chunk by chunk
+    file_path: str location of file to load
+    chunk_size: rows per chunk, 0 reads a CSV file at once and a feather file one record batch at a time;
+                larger feather record batches are sliced without copying from the memory map
+    dtypes: optional column dtypes applied with `apply_schema_dtypes` to every chunk
+    """
+    try:
+        if file_path.endswith(".feather"):
+            import pyarrow as pa
+            with pa.memory_map(file_path) as source:
+                reader = pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    batch = reader.get_batch(i)
+                    step = chunk_size if chunk_size > 0 else max(batch.num_rows, 1)
+                    for offset in range(0, batch.num_rows, step):
+                        chunk = batch.slice(offset, step).to_pandas()
+                        yield apply_schema_dtypes(chunk, dtypes) if dtypes else chunk
+            return
+        chunks = pd.read_csv(file_path, chunksize=chunk_size) if chunk_size > 0 else [pd.read_csv(file_path)]
+        for chunk in chunks:
+            yield apply_schema_dtypes(chunk, dtypes) if dtypes else chunk
+    except Exception as e:
+        raise ForestException(e, sys) from e
+
+
+def read_dataframe_columns(file_path: str) -> List[str]:
+    """Column names of a dataframe saved by `save_dataframe`, read from the file header only"""
+    try:
+        if file_path.endswith(".feather"):
+            import pyarrow as pa
+            with pa.memory_map(file_path) as source:
+                return list(pa.ipc.open_file(source).schema.names)
+        return list(pd.read_csv(file_path, nrows=0).columns)
+    except Exception as e:
+        raise ForestException(e, sys) from e
+
+
 def create_directories(path_to_directories: list, verbose=True):
     """create list of directories
     Args:
@@ -95,3 +402,62 @@ def create_directories(path_to_directories: list, verbose=True):
         if verbose:
             logging.info(f"created directory at: {path}")
 
+
+def get_current_rss_mb() -> Optional[float]:
+    """
+    Current resident set size of the current process in MB, read from /proc/self/statm, or None where
+    /proc is not available. Unlike the process's lifetime peak (ru_maxrss) it falls as memory is
+    freed, so samples taken during a run measure that run
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class RssSampler:
+    """
+    Sample the current RSS of the process on a background thread between `start` and `stop`, so
+    the peak of a stretch of work is measured from its own starting point. Allocations that live
+    shorter than `interval` seconds can be missed
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.start_mb: Optional[float] = None
+        self.peak_mb: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        rss_mb = get_current_rss_mb()
+        if rss_mb is not None:
+            self.peak_mb = rss_mb if self.peak_mb is None else max(self.peak_mb, rss_mb)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "RssSampler":
+        self.start_mb = self.peak_mb = get_current_rss_mb()
+        if self.start_mb is not None:
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> dict:
+        """
+        return: dict of the RSS at `start`, the largest sample and their difference in MB,
+                all None where the platform does not report the current RSS
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._sample()
+        if self.start_mb is None:
+            return {"start_rss_mb": None, "peak_rss_mb": None, "peak_increase_mb": None}
+        return {"start_rss_mb": round(self.start_mb, 1), "peak_rss_mb": round(self.peak_mb, 1),
+                "peak_increase_mb": round(self.peak_mb - self.start_mb, 1)}
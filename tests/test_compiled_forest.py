@@ -0,0 +1,87 @@
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from src.forest.entity.compiled_forest import CompiledForest
+
+N_FEATURES = 8
+
+
+def feature_array(n_rows: int, seed: int = 0, missing: float = 0.0) -> np.ndarray:
+    """Integer-valued and continuous features, with a share of values blanked"""
+    rng = np.random.default_rng(seed)
+    X = np.hstack([rng.integers(0, 50, size=(n_rows, N_FEATURES // 2)).astype(np.float64),
+                   rng.normal(size=(n_rows, N_FEATURES // 2))])
+    X[rng.random(X.shape) < missing] = np.nan
+    return X
+
+
+def labels(X: np.ndarray) -> np.ndarray:
+    """Seven cover types numbered from 1 like covtype, learnable from the first features"""
+    score = np.nan_to_num(X[:, 0]) / 10 + np.nan_to_num(X[:, N_FEATURES // 2])
+    return np.digitize(score, np.quantile(score, np.linspace(0, 1, 8)[1:-1])) + 1
+
+
+def fitted_forest(fit_missing: bool) -> RandomForestClassifier:
+    X = feature_array(600, missing=0.1 if fit_missing else 0.0)
+    return RandomForestClassifier(n_estimators=12, max_depth=10, random_state=0).fit(X, labels(X))
+
+
+def engine(forest: RandomForestClassifier, source: str, tmp_path) -> CompiledForest:
+    compiled = CompiledForest.from_sklearn(forest)
+    if source == "npz":
+        compiled.save(str(tmp_path / "model.npz"), source_version="v1")
+        return CompiledForest.load(str(tmp_path / "model.npz"))
+    if source == "bundle":
+        compiled.save_bundle(str(tmp_path / "model_arrays"), source_version="v1")
+        return CompiledForest.load(str(tmp_path / "model_arrays"))
+    return compiled
+
+
+@pytest.mark.parametrize("source", ["memory", "npz", "bundle"])
+@pytest.mark.parametrize("fit_missing", [False, True])
+@pytest.mark.parametrize("predict_missing", [False, True])
+def test_matches_sklearn(tmp_path, source, fit_missing, predict_missing):
+    forest = fitted_forest(fit_missing)
+    compiled = engine(forest, source, tmp_path)
+    X = feature_array(500, seed=1, missing=0.15 if predict_missing else 0.0)
+    X[0] = np.nan
+
+    np.testing.assert_array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+    np.testing.assert_array_equal(compiled.predict(X), forest.predict(X))
+
+
+@pytest.mark.parametrize("block_rows, compact_every", [(1, 1), (7, 2), (8192, 4)])
+def test_blocking_does_not_change_results(block_rows, compact_every):
+    forest = fitted_forest(fit_missing=True)
+    compiled = CompiledForest.from_sklearn(forest)
+    compiled.block_rows, compiled.compact_every = block_rows, compact_every
+    X = feature_array(50, seed=2, missing=0.15)
+
+    np.testing.assert_array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+
+
+def test_bundle_is_memory_mapped(tmp_path):
+    forest = fitted_forest(fit_missing=True)
+    compiled = engine(forest, "bundle", tmp_path)
+    X = feature_array(100, seed=3, missing=0.1)
+
+    np.testing.assert_array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+    assert isinstance(compiled.arrays["leaf_values"], np.memmap)
+    assert isinstance(compiled._flat()["children"], np.memmap)
+    assert CompiledForest.read_metadata(str(tmp_path / "model_arrays"), "source_version") == "v1"
+
+
+@pytest.mark.parametrize("source", ["npz", "bundle"])
+def test_pickles_as_its_path(tmp_path, source):
+    # Worker processes receive the path and read or map the arrays themselves
+    forest = fitted_forest(fit_missing=False)
+    compiled = engine(forest, source, tmp_path)
+    X = feature_array(100, seed=4, missing=0.1)
+    compiled.predict(X)
+
+    state = compiled.__getstate__()
+    assert state["_arrays"] is None and state["_flat_arrays"] is None
+    np.testing.assert_array_equal(pickle.loads(pickle.dumps(compiled)).predict_proba(X), forest.predict_proba(X))
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.forest.components.data_transformation import DataTransformation
+from src.forest.entity.artifact_entity import DataIngestionArtifact
+from src.forest.entity.compiled_preprocessor import CompiledPreprocessor
+from src.forest.entity.config_entity import DataTransformationConfig
+from src.forest.utils.main_utils import read_yaml_file, get_schema_dtypes, apply_schema_dtypes
+from src.forest.constant.training_pipeline import SCHEMA_FILE_PATH
+
+SCHEMA = read_yaml_file(SCHEMA_FILE_PATH)
+FEATURES = SCHEMA["numerical_columns"]
+BLOCK_COLUMNS = [column for columns in SCHEMA["one_hot_blocks"].values() for column in columns]
+
+
+def schema_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Feature columns in their schema dtypes: one-hot flags, and integer measurements within their dtype"""
+    rng = np.random.default_rng(seed)
+    dtypes = get_schema_dtypes(SCHEMA)
+    frame = pd.DataFrame(rng.integers(0, 2, size=(n_rows, len(FEATURES))), columns=FEATURES)
+    for column in FEATURES:
+        if column not in BLOCK_COLUMNS:
+            high = 256 if dtypes[column] == "uint8" else 4000
+            frame[column] = rng.integers(0, high, n_rows) - (0 if high == 256 else 200)
+    return apply_schema_dtypes(frame, dtypes)
+
+
+def with_missing(frame: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """Blank a few values of the first columns; the schema cast then stores those columns as float32"""
+    rng = np.random.default_rng(seed)
+    frame = frame.astype({column: "float64" for column in FEATURES[:3]})
+    for column in FEATURES[:3]:
+        frame.loc[rng.random(len(frame)) < 0.1, column] = np.nan
+    return apply_schema_dtypes(frame, get_schema_dtypes(SCHEMA))
+
+
+def fitted_preprocessor(encode_one_hot_blocks: bool, fit_frame: pd.DataFrame):
+    transformation = DataTransformation(DataIngestionArtifact(trained_file_path="", test_file_path=""),
+                                        DataTransformationConfig(encode_one_hot_blocks=encode_one_hot_blocks))
+    return transformation.get_data_transformer_object().fit(fit_frame)
+
+
+INPUTS = {
+    "int": lambda: schema_frame(300, seed=1),
+    "float32": lambda: schema_frame(300, seed=1).astype("float32"),
+    "nan": lambda: with_missing(schema_frame(300, seed=1), seed=1),
+    "float64": lambda: with_missing(schema_frame(300, seed=1), seed=1).astype("float64"),
+    "shuffled columns": lambda: with_missing(schema_frame(300, seed=1), seed=1)[FEATURES[::-1]],
+}
+
+
+@pytest.mark.parametrize("encode_one_hot_blocks", [False, True])
+@pytest.mark.parametrize("fit_missing", [False, True])
+@pytest.mark.parametrize("input_name", list(INPUTS))
+def test_matches_column_transformer(encode_one_hot_blocks, fit_missing, input_name):
+    fit_frame = schema_frame(500)
+    if fit_missing:
+        fit_frame = with_missing(fit_frame)
+    preprocessor = fitted_preprocessor(encode_one_hot_blocks, fit_frame)
+    X = INPUTS[input_name]()
+
+    expected = preprocessor.transform(X)
+    transformed = CompiledPreprocessor.from_sklearn(preprocessor).transform(X)
+
+    assert transformed.dtype == expected.dtype
+    np.testing.assert_array_equal(transformed, expected)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_array_matches_column_transformer(dtype):
+    preprocessor = fitted_preprocessor(True, with_missing(schema_frame(500)))
+    X = with_missing(schema_frame(300, seed=1), seed=1).to_numpy(dtype=dtype)
+
+    expected = preprocessor.transform(pd.DataFrame(X, columns=FEATURES))
+    transformed = CompiledPreprocessor.from_sklearn(preprocessor).transform(X)
+
+    assert transformed.dtype == expected.dtype
+    np.testing.assert_array_equal(transformed, expected)
+
+
+def test_float32_input_stays_float32():
+    preprocessor = fitted_preprocessor(False, schema_frame(500))
+    X = with_missing(schema_frame(100, seed=2), seed=2)
+
+    assert X[FEATURES[0]].dtype == np.float32
+    assert CompiledPreprocessor.from_sklearn(preprocessor).transform(X).dtype == np.float32
+
+
+def test_dtypes_follow_each_batch():
+    # The output dtype is cached per input dtypes, a batch with other dtypes must not reuse it
+    preprocessor = fitted_preprocessor(True, schema_frame(500))
+    compiled = CompiledPreprocessor.from_sklearn(preprocessor)
+
+    for X in (schema_frame(50, seed=3), with_missing(schema_frame(50, seed=3), seed=3), schema_frame(50, seed=4)):
+        expected = preprocessor.transform(X)
+        transformed = compiled.transform(X)
+        assert transformed.dtype == expected.dtype
+        np.testing.assert_array_equal(transformed, expected)
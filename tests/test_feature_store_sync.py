@@ -0,0 +1,121 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.forest.data_access.forest_data import ForestData
+from src.forest.exception import ForestException
+from src.forest.utils.main_utils import read_dataframe
+
+
+class Collection:
+    """Documents with an increasing `_id`, served like `iter_collection_chunks` reads them from MongoDB"""
+
+    def __init__(self, n_documents: int):
+        self.documents = []
+        self.insert(n_documents)
+        self.fail_after_chunks = None
+
+    def insert(self, n_documents: int) -> None:
+        start = len(self.documents)
+        self.documents += [{"_id": i, "Elevation": 2000 + i, "Slope": i % 60} for i in range(start, start + n_documents)]
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.documents).drop(columns=["_id"])
+
+    def iter_chunks(self, collection_name, database_name=None, watermark=None, watermark_field="_id",
+                    chunk_size=10_000):
+        documents = [d for d in self.documents if watermark is None or d[watermark_field] > watermark]
+        for n_chunks, start in enumerate(range(0, len(documents), chunk_size)):
+            if n_chunks == self.fail_after_chunks:
+                raise ConnectionError("Connection lost")
+            chunk = documents[start:start + chunk_size]
+            yield pd.DataFrame(chunk).drop(columns=["_id"]), chunk[-1][watermark_field]
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = Collection(250)
+    monkeypatch.setattr(ForestData, "iter_collection_chunks",
+                        lambda self, *args, **kwargs: collection.iter_chunks(*args, **kwargs))
+    return collection
+
+
+@pytest.fixture
+def forest_data():
+    forest_data = ForestData.__new__(ForestData)
+    forest_data.mongo_client = SimpleNamespace(database_name="forest")
+    return forest_data
+
+
+def stored_frame(file_path: str) -> pd.DataFrame:
+    return read_dataframe(file_path).astype(np.int64)
+
+
+@pytest.mark.parametrize("extension", [".feather", ".csv"])
+def test_appends_new_documents(tmp_path, collection, forest_data, extension):
+    file_path = str(tmp_path / f"forest{extension}")
+
+    assert forest_data.sync_to_feature_store("forest", file_path, chunk_size=100) == 250
+    collection.insert(120)
+    assert forest_data.sync_to_feature_store("forest", file_path, chunk_size=100) == 120
+    assert forest_data.sync_to_feature_store("forest", file_path, chunk_size=100) == 0
+
+    pd.testing.assert_frame_equal(stored_frame(file_path), collection.frame())
+
+
+@pytest.mark.parametrize("extension", [".feather", ".csv"])
+def test_crash_before_watermark_does_not_duplicate_rows(tmp_path, monkeypatch, collection, forest_data, extension):
+    file_path = str(tmp_path / f"forest{extension}")
+    forest_data.sync_to_feature_store("forest", file_path, chunk_size=100)
+    collection.insert(120)
+
+    # The new rows are in the store, the process dies before the watermark is replaced
+    replace = os.replace
+
+    def crash_on_watermark(src, dst):
+        if dst.endswith(".watermark.json"):
+            raise KeyboardInterrupt
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", crash_on_watermark)
+    with pytest.raises(KeyboardInterrupt):
+        forest_data.sync_to_feature_store("forest", file_path, chunk_size=100)
+    monkeypatch.setattr(os, "replace", replace)
+    assert len(read_dataframe(file_path)) == 370
+
+    collection.insert(30)
+    assert forest_data.sync_to_feature_store("forest", file_path, chunk_size=100) == 150
+    pd.testing.assert_frame_equal(stored_frame(file_path), collection.frame())
+
+
+def test_interrupted_csv_append_does_not_duplicate_rows(tmp_path, collection, forest_data):
+    file_path = str(tmp_path / "forest.csv")
+    forest_data.sync_to_feature_store("forest", file_path, chunk_size=100)
+    collection.insert(220)
+
+    # A CSV store is appended in place, so the first new chunk stays behind when the fetch fails
+    collection.fail_after_chunks = 1
+    with pytest.raises(ForestException):
+        forest_data.sync_to_feature_store("forest", file_path, chunk_size=100)
+    assert len(read_dataframe(file_path)) == 350
+
+    collection.fail_after_chunks = None
+    assert forest_data.sync_to_feature_store("forest", file_path, chunk_size=100) == 220
+    pd.testing.assert_frame_equal(stored_frame(file_path), collection.frame())
+
+
+def test_interrupted_rebuild_is_redone(tmp_path, collection, forest_data):
+    file_path = str(tmp_path / "forest.feather")
+    forest_data.sync_to_feature_store("forest", file_path, chunk_size=100)
+
+    collection.fail_after_chunks = 2
+    with pytest.raises(ForestException):
+        forest_data.sync_to_feature_store("forest", file_path, force_full=True, chunk_size=100)
+    assert not os.path.exists(file_path + ".watermark.json")
+
+    collection.fail_after_chunks = None
+    assert forest_data.sync_to_feature_store("forest", file_path, chunk_size=100) == 250
+    pd.testing.assert_frame_equal(stored_frame(file_path), collection.frame())
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.forest.components import data_validation
+from src.forest.components.data_validation import DataValidation
+from src.forest.entity.artifact_entity import DataIngestionArtifact
+from src.forest.entity.config_entity import DataValidationConfig
+from src.forest.entity.quantile_sketch import load_sketches
+from src.forest.pipeline.artifact_store import ArtifactStore
+from src.forest.utils.main_utils import read_yaml_file, save_dataframe
+from src.forest.constant.training_pipeline import SCHEMA_FILE_PATH
+
+FEATURES = read_yaml_file(SCHEMA_FILE_PATH)["numerical_columns"]
+
+
+def split_frame(n_rows: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.normal(size=(n_rows, len(FEATURES))), columns=FEATURES)
+
+
+@pytest.fixture
+def validation(tmp_path):
+    config = DataValidationConfig(sketch_k=200, chunk_size=1000, sketch_workers=1)
+    return DataValidation(DataIngestionArtifact(trained_file_path="", test_file_path=""), config,
+                          artifact_store=ArtifactStore(str(tmp_path / "store"), runs_dir=str(tmp_path)))
+
+
+@pytest.fixture
+def sketched_from(monkeypatch):
+    """Records the first row sketched by each call, to see which rows were rescanned"""
+    calls = []
+    original = data_validation.sketch_file_shard
+
+    def recording(file_path, columns, k, chunk_size, shard=0, n_shards=1, start_row=0):
+        calls.append(start_row)
+        return original(file_path, columns, k, chunk_size, shard, n_shards, start_row)
+
+    monkeypatch.setattr(data_validation, "sketch_file_shard", recording)
+    return calls
+
+
+@pytest.mark.parametrize("extension", [".feather", ".csv"])
+def test_appended_rows_are_sketched_and_merged(tmp_path, validation, sketched_from, extension):
+    history, appended = split_frame(4000, seed=0), split_frame(1000, seed=1)
+    first_run, second_run = tmp_path / "run1", tmp_path / "run2"
+    os.makedirs(first_run), os.makedirs(second_run)
+    save_dataframe(str(first_run / f"train{extension}"), history)
+    save_dataframe(str(second_run / f"train{extension}"), pd.concat([history, appended], ignore_index=True))
+
+    validation.build_sketches(str(first_run / f"train{extension}"), str(first_run / "sketch.json"))
+    sketches = validation.build_sketches(str(second_run / f"train{extension}"), str(second_run / "sketch.json"))
+
+    assert sketched_from == [0, 4000]
+    full = pd.concat([history, appended])
+    saved, metadata = load_sketches(str(second_run / "sketch.json"))
+    assert metadata["rows"] == 5000
+    for column in FEATURES:
+        assert sketches[column].n == saved[column].n == 5000
+        values = np.sort(full[column].to_numpy())
+        rank = np.searchsorted(values, sketches[column].quantile(0.5)) / len(values)
+        assert abs(rank - 0.5) < 0.013
+
+
+def test_rewritten_history_is_sketched_again(tmp_path, validation, sketched_from):
+    first_run, second_run = tmp_path / "run1", tmp_path / "run2"
+    os.makedirs(first_run), os.makedirs(second_run)
+    save_dataframe(str(first_run / "train.feather"), split_frame(4000, seed=0))
+    save_dataframe(str(second_run / "train.feather"), split_frame(5000, seed=2))
+
+    validation.build_sketches(str(first_run / "train.feather"), str(first_run / "sketch.json"))
+    sketches = validation.build_sketches(str(second_run / "train.feather"), str(second_run / "sketch.json"))
+
+    assert sketched_from == [0, 0]
+    assert sketches[FEATURES[0]].n == 5000
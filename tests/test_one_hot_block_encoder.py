@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.forest.components.data_transformation import DataTransformation
+from src.forest.entity.artifact_entity import DataIngestionArtifact
+from src.forest.entity.config_entity import DataTransformationConfig
+from src.forest.entity.one_hot_block_encoder import OneHotBlockEncoder
+from src.forest.utils.main_utils import read_yaml_file
+from src.forest.constant.training_pipeline import SCHEMA_FILE_PATH
+
+SCHEMA = read_yaml_file(SCHEMA_FILE_PATH)
+BLOCKS = SCHEMA["one_hot_blocks"]
+BLOCK_COLUMNS = [column for columns in BLOCKS.values() for column in columns]
+
+
+def one_hot_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Rows with one hot column per block, or none at all every few rows"""
+    rng = np.random.default_rng(seed)
+    blocks = []
+    for columns in BLOCKS.values():
+        block = np.zeros((n_rows, len(columns)), dtype=np.uint8)
+        hot = rng.integers(0, len(columns), n_rows)
+        block[np.arange(n_rows), hot] = 1
+        block[::7] = 0
+        blocks.append(block)
+    return pd.DataFrame(np.hstack(blocks), columns=BLOCK_COLUMNS)
+
+
+def feature_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Numerical columns of the schema, continuous ones drawn at random"""
+    rng = np.random.default_rng(seed)
+    continuous = [column for column in SCHEMA["numerical_columns"] if column not in BLOCK_COLUMNS]
+    frame = pd.DataFrame(rng.normal(size=(n_rows, len(continuous))), columns=continuous)
+    frame = pd.concat([frame, one_hot_frame(n_rows, seed)], axis=1)
+    return frame[SCHEMA["numerical_columns"]]
+
+
+@pytest.mark.parametrize("as_array", [False, True])
+def test_round_trip(as_array):
+    X = one_hot_frame(200)
+    encoder = OneHotBlockEncoder(blocks=BLOCKS).fit(X)
+    codes = encoder.transform(X.to_numpy() if as_array else X)
+
+    assert codes.shape == (200, len(BLOCKS))
+    assert codes.dtype == np.uint8
+    np.testing.assert_array_equal(encoder.inverse_transform(codes), X.to_numpy())
+
+
+def test_all_zero_rows_encode_as_zero():
+    # Soil_Type7, 8, 15 and 36 are dropped by the schema, so rows hot in one of them have no flag set
+    X = pd.DataFrame(np.zeros((3, len(BLOCK_COLUMNS)), dtype=np.uint8), columns=BLOCK_COLUMNS)
+    encoder = OneHotBlockEncoder(blocks=BLOCKS).fit(X)
+    codes = encoder.transform(X)
+
+    np.testing.assert_array_equal(codes, 0)
+    np.testing.assert_array_equal(encoder.inverse_transform(codes), X.to_numpy())
+
+
+def test_codes_follow_block_order():
+    X = pd.DataFrame(np.zeros((1, len(BLOCK_COLUMNS)), dtype=np.uint8), columns=BLOCK_COLUMNS)
+    X.loc[0, [columns[-1] for columns in BLOCKS.values()]] = 1
+    codes = OneHotBlockEncoder(blocks=BLOCKS).fit(X).transform(X)
+
+    np.testing.assert_array_equal(codes, [[len(columns) for columns in BLOCKS.values()]])
+
+
+def test_preprocessor_encodes_blocks():
+    X = feature_frame(300)
+    transformation = DataTransformation(DataIngestionArtifact(trained_file_path="", test_file_path=""),
+                                        DataTransformationConfig(encode_one_hot_blocks=True))
+    transformed = transformation.get_data_transformer_object().fit_transform(X)
+
+    n_continuous = len(SCHEMA["numerical_columns"]) - len(BLOCK_COLUMNS)
+    assert n_continuous + len(BLOCKS) == 12
+    assert transformed.shape == (300, 12)
+    expected = OneHotBlockEncoder(blocks=BLOCKS).fit(X).transform(X)
+    np.testing.assert_array_equal(transformed[:, n_continuous:], expected)
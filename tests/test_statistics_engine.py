@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.forest.entity.statistics_engine import StatisticsEngine
+
+
+def per_column_outlier_report(df: pd.DataFrame) -> dict:
+    """The outlier report as DataValidation.detect_outliers built it, one `Series.quantile` per column"""
+    outlier_report = {}
+    for column in df.columns:
+        Q1 = df[column].quantile(0.25)
+        Q3 = df[column].quantile(0.75)
+        IQR = Q3 - Q1
+        lower_bound = Q1 - 1.5 * IQR
+        upper_bound = Q3 + 1.5 * IQR
+
+        outliers = df[(df[column] < lower_bound) | (df[column] > upper_bound)]
+        outlier_count = len(outliers)
+        outlier_percentage = (outlier_count / len(df)) * 100
+
+        outlier_report[column] = {
+            "lower_bound": float(lower_bound),
+            "upper_bound": float(upper_bound),
+            "outlier_count": int(outlier_count),
+            "outlier_percentage": float(outlier_percentage),
+            "Q1": float(Q1),
+            "Q3": float(Q3),
+            "IQR": float(IQR)
+        }
+    return outlier_report
+
+
+def mixed_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Integer, float32 and float64 columns, with and without missing values, heavy tails for outliers"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "int": rng.integers(-200, 4000, n_rows),
+        "uint8": rng.integers(0, 256, n_rows).astype(np.uint8),
+        "float32": (rng.standard_t(3, n_rows) * 1000).astype(np.float32),
+        "float32 missing": (rng.standard_t(3, n_rows) * 1000 + 0.1).astype(np.float32),
+        "float32 small": (rng.standard_t(3, n_rows) / 3).astype(np.float32),
+        "float64": rng.standard_t(3, n_rows) * 1000,
+        "float64 missing": rng.standard_t(3, n_rows),
+        "all missing": np.full(n_rows, np.nan, dtype=np.float32),
+    })
+    for column in ("float32 missing", "float64 missing"):
+        frame.loc[rng.random(n_rows) < 0.2, column] = np.nan
+    return frame
+
+
+@pytest.mark.parametrize("n_rows", [7, 8, 101, 1000, 20000])
+@pytest.mark.parametrize("block_columns", [1, 16])
+def test_matches_per_column_loop(n_rows, block_columns):
+    frame = mixed_frame(n_rows, seed=n_rows)
+
+    statistics = StatisticsEngine(block_columns=block_columns).compute(frame)
+
+    np.testing.assert_equal(StatisticsEngine.outlier_report(statistics), per_column_outlier_report(frame))
+
+
+def test_float32_quartiles_keep_their_dtype():
+    # Upcasting to float64 moves the quartiles of a float32 column with missing values by about 1e-8
+    frame = mixed_frame(1001, seed=1)[["float32 missing", "float32 small"]]
+    frame.loc[::3, "float32 small"] = np.nan
+
+    report = StatisticsEngine.outlier_report(StatisticsEngine().compute(frame))
+
+    for column in frame.columns:
+        assert report[column]["Q1"] == float(np.float32(report[column]["Q1"]))
+    np.testing.assert_equal(report, per_column_outlier_report(frame))
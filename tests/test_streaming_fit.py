@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.forest.components.data_transformation import DataTransformation, fit_file_shard
+from src.forest.entity.artifact_entity import DataIngestionArtifact
+from src.forest.entity.config_entity import DataTransformationConfig
+from src.forest.entity.streaming_fit import RunningMoments, StreamingFit
+from src.forest.utils.main_utils import read_yaml_file, get_schema_dtypes, apply_schema_dtypes, save_dataframe
+from src.forest.constant.training_pipeline import SCHEMA_FILE_PATH
+
+SCHEMA = read_yaml_file(SCHEMA_FILE_PATH)
+FEATURES = SCHEMA["numerical_columns"]
+DTYPES = get_schema_dtypes(SCHEMA)
+K = 200
+# KLLSketch's rank error at k=200, with 99% confidence
+RANK_ERROR = 0.013
+
+
+def schema_frame(n_rows: int, seed: int = 0, missing: bool = False) -> pd.DataFrame:
+    """Integer features within their schema dtypes, a few values of the first columns blanked"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({column: rng.integers(0, 256 if DTYPES[column] == "uint8" else 4000, n_rows)
+                          for column in FEATURES}, dtype="float64")
+    if missing:
+        for column in FEATURES[:3]:
+            frame.loc[rng.random(n_rows) < 0.1, column] = np.nan
+    return apply_schema_dtypes(frame, DTYPES)
+
+
+def preprocessor(fit_frame: pd.DataFrame):
+    transformation = DataTransformation(DataIngestionArtifact(trained_file_path="", test_file_path=""),
+                                        DataTransformationConfig(encode_one_hot_blocks=False))
+    return transformation.get_data_transformer_object().fit(fit_frame.astype("float32"))
+
+
+def streamed_fits(frame: pd.DataFrame, tmp_path) -> dict:
+    """The same rows fitted at once, in even and uneven chunks, and as shards of a feather file merged"""
+    fits = {"whole": StreamingFit(FEATURES, k=K, seed=0).update(frame.astype("float32"))}
+    for chunk_size in (1000, 777):
+        fit = StreamingFit(FEATURES, k=K, seed=0)
+        for start in range(0, len(frame), chunk_size):
+            fit.update(frame.iloc[start:start + chunk_size].astype("float32"))
+        fits[f"chunks of {chunk_size}"] = fit
+    file_path = str(tmp_path / "train.feather")
+    save_dataframe(file_path, frame)
+    shards = [fit_file_shard(file_path, FEATURES, DTYPES, "float32", K, 500, shard, 3) for shard in range(3)]
+    for shard in shards[1:]:
+        shards[0].merge(shard)
+    fits["3 shards"] = shards[0]
+    return fits
+
+
+def exact_moments(frame: pd.DataFrame, fill_values: np.ndarray):
+    """Mean and population variance of the imputed integer columns, rounded once from exact sums"""
+    means, variances = [], []
+    for column, fill_value in zip(FEATURES, fill_values):
+        values = [int(value) for value in frame[column].fillna(fill_value)]
+        n, total, squares = len(values), sum(values), sum(value * value for value in values)
+        means.append(total / n)
+        variances.append((n * squares - total * total) / (n * n))
+    return np.array(means), np.array(variances)
+
+
+@pytest.mark.parametrize("missing", [False, True])
+def test_scaler_moments_are_exact_in_chunks_and_shards(tmp_path, missing):
+    frame = schema_frame(5000, seed=1, missing=missing)
+
+    for name, fit in streamed_fits(frame, tmp_path).items():
+        pipeline = fit.apply(preprocessor(frame.iloc[:300])).named_transformers_["Numeric_Pipeline"]
+        imputer, scaler = pipeline.named_steps["imputer"], pipeline.named_steps["scaler"]
+        mean, var = exact_moments(frame, imputer.statistics_)
+
+        np.testing.assert_array_equal(scaler.mean_, mean, err_msg=name)
+        np.testing.assert_array_equal(scaler.var_, var, err_msg=name)
+        assert scaler.n_samples_seen_ == len(frame)
+
+
+def test_matches_in_memory_fit(tmp_path):
+    frame = schema_frame(5000, seed=2)
+    in_memory = preprocessor(frame).named_transformers_["Numeric_Pipeline"].named_steps["scaler"]
+
+    for name, fit in streamed_fits(frame, tmp_path).items():
+        scaler = fit.apply(preprocessor(frame.iloc[:300])).named_transformers_["Numeric_Pipeline"] \
+            .named_steps["scaler"]
+        np.testing.assert_array_equal(scaler.mean_, in_memory.mean_, err_msg=name)
+        # StandardScaler's own variance can be an ulp or two from the correctly rounded one
+        np.testing.assert_allclose(scaler.var_, in_memory.var_, rtol=1e-15, atol=0, err_msg=name)
+
+
+def test_medians_within_rank_error(tmp_path):
+    frame = schema_frame(5000, seed=3, missing=True)
+
+    for name, fit in streamed_fits(frame, tmp_path).items():
+        medians = fit.apply(preprocessor(frame.iloc[:300])).named_transformers_["Numeric_Pipeline"] \
+            .named_steps["imputer"].statistics_
+        for column, median in zip(FEATURES, medians):
+            values = frame[column].dropna().to_numpy()
+            # With ties the median covers a range of ranks, one of which must be within the error of 0.5
+            assert (values < median).mean() <= 0.5 + RANK_ERROR, (name, column)
+            assert (values <= median).mean() >= 0.5 - RANK_ERROR, (name, column)
+
+
+def test_non_integer_values_fall_back_to_pairwise_moments():
+    rng = np.random.default_rng(4)
+    values = np.column_stack([rng.integers(0, 4000, 3000).astype(np.float64), rng.normal(1e4, 3, 3000)])
+    values[2000:, 0] += 0.5
+    values[::11, 1] = np.nan
+
+    chunked = RunningMoments(2)
+    for start in range(0, len(values), 700):
+        chunked.update(values[start:start + 700])
+    whole = RunningMoments(2).update(values)
+    # The first shard still sums its integer column exactly, the second does not
+    merged = RunningMoments(2).update(values[:2000]).merge(RunningMoments(2).update(values[2000:]))
+
+    assert not chunked.exact.any() and not whole.exact.any() and not merged.exact.any()
+    for moments in (chunked, whole, merged):
+        np.testing.assert_allclose(moments.mean, np.nanmean(values, axis=0), rtol=1e-14)
+        np.testing.assert_allclose(moments.var, np.nanvar(values, axis=0), rtol=1e-12)